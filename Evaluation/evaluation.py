@@ -2,8 +2,17 @@ import pandas as pd
 import json
 from dotenv import load_dotenv
 from groq import Groq
-import requests
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline.cache import ResponseCache
+from pipeline.ollama_client import OllamaClient
+from pipeline.cells import pending_by_column, is_failed, run_queue, text_columns
+from pipeline.judge_schema import answer_instructions, ollama_request, verdict_columns
+from pipeline.journal import RowJournal, journal_path_for, compact
+from pipeline.excel_stream import read_columns
+from pipeline.telemetry import groq_call, set_defaults
 
 # === OUTPUT FILE ===
 output_dir = "Evaluation"
@@ -12,15 +21,24 @@ final_output_excel = os.path.join(output_dir, "validation_results.xlsx")
 
 # === LOAD DATA (original or previous results) ===
 if os.path.exists(final_output_excel):
-    print("Found previous results, resuming from last processed row...")
+    print("Found previous results, resuming from the missing or failed cells...")
     df = pd.read_excel(final_output_excel)
 else:
-    df = pd.read_excel("Evaluation/Refactroing results GPT.xlsx")
+    # Only the columns the prompt needs, plus the ones that identify each row in the output
+    df = read_columns("Evaluation/Refactroing results GPT.xlsx", columns=["Repository", "File", "Misuse", "Refactored_Code"])
 
 # === Ensure output columns exist ===
 for col in ["Gemma", "Qwen", "Llama3","Mistral","Deepseek","CodeLlama"]:
     if col not in df.columns:
         df[col] = ""
+    # All-blank columns reload as float64; verdict text needs object columns
+    text_columns(df, [col] + [f"{col}_{key}" for key in ["fix", "extent", "reason"]])
+
+# Verdicts journaled by an interrupted run are folded into the workbook, then the journal starts over
+journal_file = journal_path_for(final_output_excel)
+if os.path.exists(journal_file):
+    compact(df, journal_file, final_output_excel)
+journal = RowJournal(journal_file, reset=True)
 
 # === Load environment variables ===
 load_dotenv()
@@ -30,6 +48,7 @@ if not groq_api_key:
 print("Groq API key ✔")
 
 groq = Groq(api_key=groq_api_key)
+set_defaults(stage="evaluation")  # tags every request record of this run
 
 # === Load misuse definitions ===
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -38,7 +57,7 @@ with open(misuse_file, "r", encoding="utf-8") as f:
     misuses = json.load(f)
 
 # === PROMPT TEMPLATE ===
-prompt_template = """
+question_template = """
 You are an expert in cloud ML services (Azure, AWS, Google Cloud) and code quality.
 
 Task:
@@ -55,13 +74,22 @@ Refactored Code:
 
 Question:
 Does the refactored code properly fix the misuse according to the misuse definition?
+"""
 
+prompt_template = question_template + """
 Answer using ONLY this format:
 - Fix: YES / NO / PARTIAL
 - Extent: <0–100>%
 - Why: <one short sentence>
 """
 
+# === STRUCTURED OUTPUT MODE ===
+# True: judges must answer a JSON verdict (Ollama `format` schema, capped
+# num_predict), so each call costs a handful of output tokens.
+# Either way, verdicts are parsed into <Judge>_fix / _extent / _reason columns.
+structured_output = False
+judge_request = ollama_request() if structured_output else {"options": {"temperature": 0}}  # cached, so greedy
+
 
 # === MODELS ===
 #groq_models = {
@@ -77,74 +105,124 @@ ollama_models = {
     "Mistral":"mistral-7b"
 }
 
+# === Response cache (temperature 0, so re-runs reuse earlier answers) ===
+cache = ResponseCache()
+
+# === Pooled keep-alive Ollama session ===
+ollama = OllamaClient(keep_alive="30m")
+
 # === MODEL CALL FUNCTIONS ===
 def call_groq_model(model_name, prompt):
-    try:
-        response = groq.chat.completions.create(
+    def call_model():
+        response = groq_call(
+            groq,
             model=model_name,
             messages=[{"role": "user", "content": prompt}],
             temperature=0
         )
         return response.choices[0].message.content.strip()
+
+    try:
+        return cache.get_or_call("groq", model_name, prompt, {"temperature": 0}, call_model)
     except Exception as e:
         return f"[ERROR] {e}"
 
 def call_ollama_model(model_name, prompt):
+    def call_model():
+        text = ollama.generate(model_name, prompt, **judge_request).get('response')
+        if not text or not text.strip():
+            raise ValueError(f"Empty response from {model_name}")  # raised, so it is never cached
+        return text
+
     try:
-        response = requests.post(
-            'http://localhost:11434/api/generate',
-            json={'model': model_name, 'prompt': prompt, 'stream': False},
-        )
-        result = response.json().get('response', '[No response]')
-        return result
+        return cache.get_or_call("ollama", model_name, prompt, judge_request, call_model)
     except Exception as e:
         return f"[ERROR] {e}"
 
-# === MAIN LOOP ===
-for idx, row in df.iterrows():
-
-    # Skip row if all model columns already have a value
-    if all([
-        pd.notna(row["Gemma"]) and str(row["Gemma"]).strip() != "",
-        pd.notna(row["Qwen"]) and str(row["Qwen"]).strip() != "",
-        pd.notna(row["Llama3"]) and str(row["Llama3"]).strip() != "",
-        pd.notna(row["Mistral"]) and str(row["Mistral"]).strip() != "",
-        pd.notna(row["Deepseek"]) and str(row["Deepseek"]).strip() != "",
-        pd.notna(row["CodeLlama"]) and str(row["CodeLlama"]).strip() != ""
-    ]):
-        print(f"Skipping row {idx+1} (already processed)")
-        continue
+# === PROMPT PER ROW ===
+def build_prompt(row):
+    misuse_name = row["Misuse"]
+    refactored_code = row["Refactored_Code"]
 
-    print(f"Processing row {idx+1}/{len(df)}...")
+    if misuse_name not in misuses:
+        raise ValueError(f"Misuse '{misuse_name}' not found in JSON definitions.")
 
-    try:
-        misuse_name = row["Misuse"]
-        refactored_code = row["Refactored_Code"]
-
-        if misuse_name not in misuses:
-            raise ValueError(f"Misuse '{misuse_name}' not found in JSON definitions.")
-
-        misuse_description = misuses[misuse_name]["description"]
+    misuse_description = misuses[misuse_name]["description"]
 
-        prompt = prompt_template.format(
+    if structured_output:
+        return question_template.format(
             misuse_name=misuse_name,
             misuse_description=misuse_description,
             refactored_code=refactored_code
-        )
-
-        # === CALL MODELS ===
-        #for col, model in groq_models.items():
-#            df.at[idx, col] = call_groq_model(model, prompt)
+        ) + "\n" + answer_instructions() + "\n"
+
+    return prompt_template.format(
+        misuse_name=misuse_name,
+        misuse_description=misuse_description,
+        refactored_code=refactored_code
+    )
+
+
+# === MAIN LOOP (model-major) ===
+# Drain each judge's pending cells while its model is resident, then unload it,
+# so Ollama loads every model once instead of swapping on every row.
+# Pending = blank or [ERROR]; every other verdict is kept as is.
+max_attempts = 3
+pending = pending_by_column(df, ollama_models)
+
+for col, model in ollama_models.items():
+    rows = pending[col]
+    if not rows:
+        print(f"Skipping {col} (all cells already judged)")
+        continue
 
-        for col, model in ollama_models.items():
-            df.at[idx, col] = call_ollama_model(model, prompt)
+    print(f"Judging {len(rows)} rows with {col} ({model})...")
+    try:
+        ollama.warm_up(model)
+    except Exception as e:
+        print(f"⚠️ Could not preload {model}: {e}")
+
+    def judge_cell(idx):
+        try:
+            return call_ollama_model(model, build_prompt(df.loc[idx]))
+        except Exception as e:
+            return f"[ERROR] {e}"
+
+    def save_cell(idx, value):
+        # Raw answer plus its typed verdict columns
+        cells = {col: value, **verdict_columns(col, value)}
+        for key, cell in cells.items():
+            df.at[idx, key] = cell
+        if is_failed(value):
+            print(f"❌ Error in row {idx+1} ({col}): {value}")
+        # === Journal each cell (safe) ===
+        journal.append(idx, **cells)
+
+    # Failed cells go to the back of the queue and are retried while the model is loaded
+    failed = run_queue(rows, judge_cell, save_cell, max_attempts=max_attempts)
+    if failed:
+        print(f"⚠️ {failed} {col} cells still failed after {max_attempts} attempts; re-run to retry them")
 
+    try:
+        ollama.unload(model)
     except Exception as e:
-        for col in ["Gemma", "Qwen", "Llama3","Mistral","Deepseek","CodeLlama"]:
-            df.at[idx, col] = f"[ERROR] {e}"
-        print(f"❌ Error in row {idx+1}: {e}")
+        print(f"⚠️ Could not unload {model}: {e}")
+
+# === CALL GROQ MODELS ===
+#for col, model in groq_models.items():
+#    for idx in pending_by_column(df, [col])[col]:
+#        df.at[idx, col] = call_groq_model(model, build_prompt(df.loc[idx]))
+
+# === Typed verdict columns for every cell, including ones judged by earlier runs ===
+for col in ollama_models:
+    for idx in df.index:
+        for key, cell in verdict_columns(col, df.at[idx, col]).items():
+            df.at[idx, key] = cell
 
-    # === Save continuously (safe) ===
-    df.to_excel(final_output_excel, index=False)
+journal.close()
+compact(df, journal_file, final_output_excel)
+os.remove(journal_file)  # a journal left behind means the run was interrupted
 
+print(f"🗄️ Response cache: {cache.summary()}")
+print(f"🧊 Ollama latency: {ollama.latency_summary()}")
 print(f"📄 Validation results saved to {final_output_excel}")
@@ -4,9 +4,22 @@ import json
 from dotenv import load_dotenv
 from groq import Groq
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline.rate_limit import GroqScheduler
+from pipeline.cache import ResponseCache
+from pipeline.cells import pending_by_column, is_failed, run_queue, text_columns
+from pipeline.judge_schema import answer_instructions, groq_request, verdict_columns
+from pipeline.journal import RowJournal, journal_path_for, compact
+from pipeline.excel_stream import read_columns
+from pipeline.compaction import compact_response
+from pipeline.telemetry import set_defaults
 
 # === Load the data ===
-df = pd.read_excel("ScalableRefactoring/Refactoring_results_GPT.xlsx")
+# Only the columns the prompt needs, plus the ones that identify each row in the output
+df = read_columns("ScalableRefactoring/Refactoring_results_GPT.xlsx",
+                  columns=['Repository', 'File', 'Misuse', 'Refactored_Code'])
 
 # Load environment variables
 load_dotenv()
@@ -16,7 +29,7 @@ if not groq_api_key:
 else:
     print('ok')
 
-groq = Groq(api_key=groq_api_key)
+groq = Groq(api_key=groq_api_key, max_retries=0)  # retries are owned by the scheduler
 
 # === Load misuse definitions ===
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -54,18 +67,52 @@ Does the Refactored Code properly fix the misuse according to the misuse definit
 """
 
 
+# === Structured variant: JSON verdict, a handful of output tokens ===
+structured_prompt_template = """
+You are an expert in cloud ML services (Azure, AWS, Google Cloud) and code quality.
+
+Your task:
+Evaluate whether the provided Refactored Code correctly fixes the misuse described below.
+
+Do NOT rewrite any code.
+
+Misuse Name:
+{misuse_name}
+
+Misuse Definition:
+{misuse_description}
+
+
+Refactored Code:
+{refactored_code}
+
+Question:
+Does the Refactored Code properly fix the misuse according to the misuse definition?
+"""
+
+
 # === Model settings ===
 model_name = 'openai/gpt-oss-120b'
 
-# Add output column
-df['Refactoring_Valid'] = ""
+# True: JSON-mode verdict with a small output cap. gpt-oss counts its
+# reasoning against max_tokens, so reasoning effort is kept low and the cap
+# leaves room for it (judge_max_tokens).
+# Either way, verdicts are parsed into Valid_fix / Valid_reason columns.
+structured_output = False
+judge_request = {**groq_request(model_name), 'reasoning_effort': 'low'} if structured_output else {}
+compact_prompts = True  # drop comments/docstrings/long literals from the answer's code block; prose is kept
+prompt_savings = {}  # row -> code tokens removed by compaction
 
+# Groq quota for this model; 429s are retried instead of becoming [ERROR] cells
+scheduler = GroqScheduler(groq, requests_per_minute=30, tokens_per_minute=8000)
+cache = ResponseCache()
 
 # Ensure output folder exists
 output_dir = "ScalableRefactoring"
 os.makedirs(output_dir, exist_ok=True)
 
 misuse_name = df['Misuse'].iloc[0]  # needed for file name
+set_defaults(stage="judge", misuse=misuse_name)  # tags every request record of this run
 
 safe_model_name = model_name.replace("/", "_")
 
@@ -75,13 +122,30 @@ final_output_excel = os.path.join(
     f"validation_results_{safe_model_name}.xlsx"
 )
 
+# === Resume: keep verdicts from a previous run and its journal ===
+if os.path.exists(final_output_excel):
+    print("Found previous results, resuming from the missing or failed rows...")
+    df = pd.read_excel(final_output_excel)
 
-# === Loop through examples ===
-for idx, row in df.iterrows():
-
+# Add output column
+if 'Refactoring_Valid' not in df.columns:
+    df['Refactoring_Valid'] = ""
+if 'Prompt_Tokens_Saved' not in df.columns:
+    df['Prompt_Tokens_Saved'] = None
+# All-blank columns reload as float64; verdict text needs object columns
+text_columns(df, ['Refactoring_Valid', 'Valid_fix', 'Valid_reason'])
+
+# Verdicts journaled by an interrupted run are folded into the workbook, then the journal starts over
+journal_file = journal_path_for(final_output_excel)
+if os.path.exists(journal_file):
+    compact(df, journal_file, final_output_excel)
+journal = RowJournal(journal_file, reset=True)
+
+
+# === Validate one row ===
+def judge_cell(idx):
+    row = df.loc[idx]
     try:
-        repo = row['Repository']
-        file = row['File']
         misuse_name = row['Misuse']
         refactored_code = row['Refactored_Code']
 
@@ -90,29 +154,70 @@ for idx, row in df.iterrows():
 
         misuse_description = misuses[misuse_name]['description']
 
+        if compact_prompts and isinstance(refactored_code, str):
+            refactored_code, prompt_savings[idx] = compact_response(refactored_code)
+
         # Prepare validation prompt
-        prompt = prompt_template.format(
+        template = structured_prompt_template if structured_output else prompt_template
+        prompt = template.format(
             misuse_name=misuse_name,
             misuse_description=misuse_description,
             refactored_code=refactored_code
         )
+        if structured_output:
+            prompt += "\n" + answer_instructions(("YES", "NO"), with_extent=False) + "\n"
 
-        response = groq.chat.completions.create(
-            model=model_name,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0
-        )
-
-        result = response.choices[0].message.content.strip()
+        def call_model():
+            response = scheduler.create(
+                model=model_name,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0,
+                **judge_request
+            )
+            return response.choices[0].message.content.strip()
 
-        # Save results
-        df.at[idx, 'Refactoring_Valid'] = result
+        return cache.get_or_call('groq', model_name, prompt, {'temperature': 0, **judge_request}, call_model)
 
     except Exception as e:
-        df.at[idx, 'Refactoring_Valid'] = f"[ERROR] {str(e)}"
-        print(f"❌ Error in row {idx+1}: {str(e)} (continuing...)")
+        return f"[ERROR] {str(e)}"
+
+
+def typed_verdict(value):
+    verdict = verdict_columns('Valid', value)
+    return {'Valid_fix': verdict['Valid_fix'], 'Valid_reason': verdict['Valid_reason']}
+
+
+def save_cell(idx, value):
+    # Raw answer plus its typed verdict columns
+    cells = {'Refactoring_Valid': value, **typed_verdict(value), 'Prompt_Tokens_Saved': prompt_savings.get(idx, 0)}
+    for key, cell in cells.items():
+        df.at[idx, key] = cell
+    if is_failed(value):
+        print(f"❌ Error in row {idx+1}: {value} (continuing...)")
+
+    # Journal incrementally
+    journal.append(idx, **cells)
+
+
+# === Loop through the rows still missing a verdict (blank or [ERROR]) ===
+pending = pending_by_column(df, ['Refactoring_Valid'])['Refactoring_Valid']
+print(f"{len(df) - len(pending)} rows already validated, {len(pending)} to go")
+
+# Failed rows are re-queued at the back and retried up to max_attempts times
+max_attempts = 3
+failed = run_queue(pending, judge_cell, save_cell, max_attempts=max_attempts)
+if failed:
+    print(f"⚠️ {failed} rows still failed after {max_attempts} attempts; re-run to retry them")
+
+# Typed verdict columns for every row, including ones validated by earlier runs
+for idx in df.index:
+    for key, cell in typed_verdict(df.at[idx, 'Refactoring_Valid']).items():
+        df.at[idx, key] = cell
 
-    # Save incrementally
-    df.to_excel(final_output_excel, index=False)
+journal.close()
+compact(df, journal.path, final_output_excel)
+os.remove(journal.path)  # a journal left behind means the run was interrupted
 
+print(f"🗄️ Response cache: {cache.summary()}")
+print(f"✂️ Prompt compaction saved {sum(prompt_savings.values())} code tokens this run")
 print(f"📄 Validation results saved to {final_output_excel}")
@@ -1,11 +1,27 @@
-import pandas as pd
-import time
 import json
 from dotenv import load_dotenv
 from groq import Groq
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline.rate_limit import GroqScheduler
+from pipeline.cache import ResponseCache
+from pipeline.journal import RowJournal, journal_path_for, compact, read_journal
+from pipeline.engine import run_rows
+from pipeline.generation_policy import GenerationPolicy, stream_groq
+from pipeline.diff_apply import SEARCH_REPLACE_FORMAT, HunkError, rebuild_refactored
+from pipeline.excel_stream import read_columns
+from pipeline.near_dup import MinHashIndex, plan_representatives
+from pipeline.cells import is_failed, is_missing
+from pipeline.token_budget import BudgetError, expected_output_tokens, plan
+from pipeline.compaction import compact_code
+from pipeline.telemetry import set_defaults
+
 # === Load the data ===
-df = pd.read_excel("preprocessing/split_files/1_Ignoring Monitoring Data Drift.xlsx")
+# Only the columns the prompt needs, plus the ones that identify each row in the output
+df = read_columns("preprocessing/split_files/1_Ignoring Monitoring Data Drift.xlsx",
+                  columns=['Repository', 'File', 'Misuse', 'Cleaned Code'])
 
 # Load environment variables
 load_dotenv()
@@ -15,7 +31,7 @@ if not groq_api_key:
 else:
     print('ok')
 
-groq = Groq(api_key=groq_api_key)
+groq = Groq(api_key=groq_api_key, max_retries=0)  # retries are owned by the scheduler
 
 # === Load misuse definitions ===
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -87,13 +103,32 @@ Summary of Changes:
 [Bullet-point list describing exactly what was changed]
 """
 
+# === Diff-output variant: the model returns SEARCH/REPLACE hunks that are
+# applied to `Cleaned Code` locally, instead of re-emitting the whole file ===
+diff_prompt_template = prompt_template.split("Response Format:")[0] + SEARCH_REPLACE_FORMAT
+
 # === Model settings ===
 model_name = 'qwen/qwen3-32b'
 cumulative_time = 0
+concurrency = 4  # max requests in flight; 1 reproduces the old serial run
+policy = GenerationPolicy(max_output_tokens=4096)  # qwen3: reasoning_effort=none + early stop
+output_mode = 'full'  # 'diff' asks for edit hunks and falls back to 'full' if they don't apply
+near_dup_threshold = None  # e.g. 0.95: rows this similar to an earlier row reuse its refactoring; None runs every row
+compact_prompts = True  # drop comments/docstrings/long literals from the prompt; answers are re-expanded
+
+# Groq quota for this model; the scheduler paces every thread against it
+tokens_per_minute = 6000
+max_request_tokens = None  # largest single request of your account tier (e.g. 6000 on the free tier); None checks the context window only
+scheduler = GroqScheduler(groq, requests_per_minute=60, tokens_per_minute=tokens_per_minute)
+cache = ResponseCache()
 
 # Add new columns to store results
 df['Refactored_Code'] = ""
 df['Row_Duration_sec'] = 0.0
+df['Output_Mode'] = output_mode
+df['Near_Dup_Of'] = None  # row number whose refactoring was reused
+df['Near_Dup_Similarity'] = None  # estimated Jaccard similarity to that row
+df['Prompt_Tokens_Saved'] = 0  # code tokens removed by prompt compaction
 
 # Ensure output folder exists
 output_dir = "ScalableRefactoring"
@@ -101,6 +136,7 @@ os.makedirs(output_dir, exist_ok=True)
 
 # === Final output file ===
 misuse_name = df['Misuse'].iloc[0]  # first row's misuse
+set_defaults(stage="refactor", misuse=misuse_name)  # tags every request record of this run
 
 
 # Sanitize model name for file naming
@@ -113,54 +149,159 @@ final_output_excel = os.path.join(
 )
 
 
-# === Loop through examples ===
-for idx, row in df.iterrows():
-    row_start_time = time.time()
-    try:
-        code = row['Cleaned Code']
-        repo = row['Repository']
-        file = row['File']
-        misuse_name = row['Misuse']
-
-        if misuse_name not in misuses:
-            raise ValueError(f"Misuse '{misuse_name}' not found in JSON definitions.")
-
-        misuse_description = misuses[misuse_name]['description']
-
+# Finished rows go to an append-only journal; the workbook is written once at the end.
+# A journal left by an interrupted run is folded into the workbook first, and its rows are not sent again.
+journal_file = journal_path_for(final_output_excel)
+recovered = set()
+carried = {}
+if os.path.exists(journal_file):
+    carried = read_journal(journal_file)
+    compact(df, journal_file, final_output_excel)
+    recovered = {idx for idx, code in df['Refactored_Code'].items() if not is_missing(code) and not is_failed(code)}
+    print(f"♻️ Recovered {len(recovered)} finished rows from an interrupted run")
+journal = RowJournal(journal_file, reset=True)
+# Recovered rows are journaled again, so a second interruption does not lose them
+for idx in recovered:
+    journal.append(idx, **carried[idx])
+
+# === Per-row worker (runs on the pool threads) ===
+def refactor_row(idx, row):
+    code = row['Cleaned Code']
+    misuse_name = row['Misuse']
+
+    if misuse_name not in misuses:
+        raise ValueError(f"Misuse '{misuse_name}' not found in JSON definitions.")
+
+    misuse_description = misuses[misuse_name]['description']
+
+    # Compact the code for the prompt; the answer is mapped back onto the original source
+    compacted = compact_code(code) if compact_prompts else None
+    prompt_code = compacted.text if compacted else code
+    restore = compacted.expand_response if compacted else (lambda text: text)
+    saved = compacted.saved_tokens if compacted else 0
+
+    def ask(template):
         # Prepare prompt
-        prompt = prompt_template.format(
+        prompt = template.format(
             misuse_name=misuse_name,
             misuse_description=misuse_description,
-            code_snippet=code
+            code_snippet=prompt_code
         )
 
-        response = groq.chat.completions.create(
-            model=model_name,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0
-        )
-
-        result = response.choices[0].message.content.strip()
-
-        # Save results in DataFrame
-        df.at[idx, 'Refactored_Code'] = result
-        row_end_time = time.time()
-        row_duration = round(row_end_time - row_start_time, 2)
-        df.at[idx, 'Row_Duration_sec'] = row_duration
-        cumulative_time += row_duration
-
-        print(f"✅ Processed row {idx+1}/{len(df)} ({misuse_name}) - Duration: {row_duration} sec")
-
-    except Exception as e:
-        df.at[idx, 'Refactored_Code'] = f"[ERROR] Could not process this row: {str(e)}"
-        row_end_time = time.time()
-        row_duration = round(row_end_time - row_start_time, 2)
-        df.at[idx, 'Row_Duration_sec'] = row_duration
-        cumulative_time += row_duration
-        print(f"❌ Error in row {idx+1}: {str(e)} (continuing...)")
-
-    # === Save after each iteration using the final filename ===
-    df.to_excel(final_output_excel, index=False)
+        # Output ceiling (and Ollama num_ctx) sized to this prompt instead of a fixed limit
+        budget = plan(model_name, prompt, expected_output_tokens('refactor', prompt_code),
+                      ceiling=policy.max_output_tokens, quota=max_request_tokens)
+        row_policy = policy.for_budget(budget)
+
+        def call_model():
+            # Streamed with reasoning off; cut once the summary is complete
+            text, output_tokens, aborted = stream_groq(
+                scheduler.create, row_policy,
+                model=model_name,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0
+            )
+            return text
+
+        # Identical temperature-0 prompts are answered from the on-disk cache
+        return cache.get_or_call('groq', model_name, prompt, {'temperature': 0, **row_policy.cache_options()}, call_model)
+
+    mode = output_mode
+    if output_mode == 'diff':
+        try:
+            refactored = restore(rebuild_refactored(prompt_code, ask(diff_prompt_template)))
+            return {'Refactored_Code': refactored, 'Output_Mode': 'diff', 'Prompt_Tokens_Saved': saved}
+        except HunkError as e:
+            print(f"↩️ Row {idx+1}: diff did not apply ({e}); falling back to full output")
+            mode = 'full (diff fallback)'
+
+    return {'Refactored_Code': restore(ask(prompt_template)), 'Output_Mode': mode, 'Prompt_Tokens_Saved': saved}
+
+
+# === Collect results (runs on the main thread, in completion order) ===
+def save_row(idx, values, row_duration):
+    global cumulative_time
+
+    if 'error' in values:
+        df.at[idx, 'Refactored_Code'] = f"[ERROR] Could not process this row: {str(values['error'])}"
+        print(f"❌ Error in row {idx+1}: {str(values['error'])} (continuing...)")
+    else:
+        df.at[idx, 'Refactored_Code'] = values['Refactored_Code']
+        print(f"✅ Processed row {idx+1}/{len(df)} ({df.at[idx, 'Misuse']}) - Duration: {row_duration} sec")
+
+    df.at[idx, 'Row_Duration_sec'] = row_duration
+    df.at[idx, 'Output_Mode'] = values.get('Output_Mode', output_mode)
+    df.at[idx, 'Prompt_Tokens_Saved'] = values.get('Prompt_Tokens_Saved', 0)
+    cumulative_time += row_duration
+
+    # === Journal the row (crash-safe, no workbook rewrite) ===
+    journal.append(idx, Refactored_Code=df.at[idx, 'Refactored_Code'], Row_Duration_sec=row_duration,
+                   Output_Mode=df.at[idx, 'Output_Mode'], Prompt_Tokens_Saved=df.at[idx, 'Prompt_Tokens_Saved'])
+
+
+# === Rows whose prompt cannot fit the model's context are rejected before any call ===
+def oversized(row):
+    if row['Misuse'] not in misuses:
+        return None  # reported by the worker
+    code = compact_code(row['Cleaned Code']).text if compact_prompts else row['Cleaned Code']
+    prompt = prompt_template.format(misuse_name=row['Misuse'], code_snippet=code,
+                                    misuse_description=misuses[row['Misuse']]['description'])
+    try:
+        plan(model_name, prompt, 0, quota=max_request_tokens)
+    except BudgetError as e:
+        return str(e)
+    return None
+
+rejected = {idx: reason for idx, row in df.iterrows() if (reason := oversized(row))}
+for idx, reason in rejected.items():
+    df.at[idx, 'Refactored_Code'] = f"[ERROR] Could not process this row: {reason}"
+    journal.append(idx, Refactored_Code=df.at[idx, 'Refactored_Code'])
+    print(f"⛔ Row {idx+1} rejected: {reason}")
+
+# === Near-duplicate rows are not sent; they reuse their cluster representative ===
+near_dups = {}
+if near_dup_threshold:
+    # Clustered per misuse; signatures persist under .llm_cache, so unchanged rows are not hashed again
+    near_dup_index = MinHashIndex()
+    near_dups = plan_representatives(df['Cleaned Code'].tolist(), near_dup_threshold, index=near_dup_index,
+                                     namespace=final_output_excel, misuses=df['Misuse'].tolist())
+    near_dup_index.close()
+if near_dups:
+    print(f"🔁 {len(near_dups)} near-duplicate rows will reuse a representative's refactoring")
+
+# === Run all rows with at most `concurrency` requests in flight ===
+representatives = ((idx, row) for idx, row in df.iterrows()
+                   if idx not in near_dups and idx not in rejected and idx not in recovered)
+stats = run_rows(representatives, refactor_row, concurrency=concurrency, on_result=save_row)
+
+# A failed or rejected representative is never copied; those rows are refactored on their own
+unshared = [idx for idx, (rep, _) in near_dups.items() if is_failed(df.at[rep, 'Refactored_Code'])]
+for idx, (rep, score) in near_dups.items():
+    if idx in rejected or idx in unshared:
+        continue
+    df.at[idx, 'Refactored_Code'] = df.at[rep, 'Refactored_Code']
+    df.at[idx, 'Output_Mode'] = 'near-duplicate'
+    df.at[idx, 'Near_Dup_Of'] = rep + 1
+    df.at[idx, 'Near_Dup_Similarity'] = score
+    journal.append(idx, Refactored_Code=df.at[idx, 'Refactored_Code'], Output_Mode='near-duplicate',
+                   Near_Dup_Of=rep + 1, Near_Dup_Similarity=score)
+
+unshared = [idx for idx in unshared if idx not in rejected and idx not in recovered]
+if unshared:
+    print(f"🔁 {len(unshared)} near-duplicates of failed rows are refactored on their own")
+    retry = run_rows(((idx, df.loc[idx]) for idx in unshared), refactor_row,
+                     concurrency=concurrency, on_result=save_row)
+    stats.latencies += retry.latencies
+    stats.errors += retry.errors
+    stats.wall_time += retry.wall_time
+
+journal.close()
+compact(df, journal.path, final_output_excel)
+os.remove(journal.path)  # a journal left behind means the run was interrupted
 
 print(f"\n⏱️ Total time for model '{model_name}': {cumulative_time} seconds")
+print(f"🚀 Throughput (concurrency={concurrency}): {stats.summary()}")
+print(f"🗄️ Response cache: {cache.summary()}")
+print(f"✂️ Prompt compaction saved {int(df['Prompt_Tokens_Saved'].sum())} code tokens")
+print(f"🚦 Rate limiting: {scheduler.throttled} throttled calls, {scheduler.retries} retries")
 print(f"📄 Refactored results saved to {final_output_excel}")
\ No newline at end of file
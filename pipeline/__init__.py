@@ -0,0 +1,5 @@
+"""Shared helpers for the refactoring, judging and preprocessing runners.
+
+Scripts in the misuse folders run from the repository root and add it to
+``sys.path`` before importing from this package.
+"""
@@ -0,0 +1,150 @@
+"""End-to-end throughput benchmark of the runners against the mock server.
+
+Each runner is started as it is in production, as a script from the repo
+root, but inside a throwaway copy of the tree. The copy has the script, its
+``misuses.json`` and its input workbook cut to ``--rows`` rows, plus a link to
+``pipeline``. Caches, journals, telemetry and result workbooks land in the
+copy and never touch the real ones. ``GROQ_BASE_URL`` and ``OLLAMA_HOST``
+point at ``pipeline.mock_server``, so no key, quota or local model is needed:
+
+    python -m pipeline.benchmark --rows 20
+    python -m pipeline.benchmark --scripts refactoring_groq judge --latency 0.2 --tokens-per-sec 200
+
+With the default instant mock, everything measured is the pipeline itself:
+prompt rendering, scheduling, caching, persistence and parsing. Per script
+the report gives:
+
+- rows per second;
+- the start-up time before the first request;
+- the overhead per row, i.e. wall time after start-up with no request in
+  flight at the mock, divided by the rows.
+"""
+
+import argparse
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from pipeline.cache import REPO_ROOT
+from pipeline.mock_server import Behavior, busy_seconds, serve
+
+
+SCRIPTS = {
+    "refactoring_groq": "ScalableRefactoring/refactoring_groq.py",
+    "refactoring_ollama": "ScalableRefactoring/refactoring_ollama.py",
+    "judge": "ScalableRefactoring/Judge.py",
+    "evaluation": "Evaluation/evaluation.py",
+}
+
+_INPUT = re.compile(r"""read_columns\(\s*["']([^"']+)["']""")
+
+
+def input_workbook(script: str) -> str:
+    """Relative path of the workbook ``script`` reads (its first ``read_columns`` call)."""
+    with open(os.path.join(REPO_ROOT, script), encoding="utf-8") as f:
+        match = _INPUT.search(f.read())
+    if not match:
+        raise ValueError(f"❌ No read_columns(...) input found in {script}")
+    return match.group(1)
+
+
+def make_sandbox(script: str, rows: int) -> tuple:
+    """Throwaway tree for ``script``; return ``(directory, input rows)``."""
+    sandbox = tempfile.mkdtemp(prefix="llm-bench-")
+    os.symlink(os.path.join(REPO_ROOT, "pipeline"), os.path.join(sandbox, "pipeline"))
+
+    script_dir = os.path.dirname(script)
+    os.makedirs(os.path.join(sandbox, script_dir), exist_ok=True)
+    shutil.copy(os.path.join(REPO_ROOT, script), os.path.join(sandbox, script))
+    shutil.copy(os.path.join(REPO_ROOT, script_dir, "misuses.json"), os.path.join(sandbox, script_dir))
+
+    source = input_workbook(script)
+    df = pd.read_excel(os.path.join(REPO_ROOT, source)).head(rows)
+    os.makedirs(os.path.dirname(os.path.join(sandbox, source)), exist_ok=True)
+    df.to_excel(os.path.join(sandbox, source), index=False)
+    return sandbox, len(df)
+
+
+def run_script(name: str, server, rows: int, keep: bool = False) -> dict:
+    """Run one runner against ``server`` in its own sandbox and measure it."""
+    script = SCRIPTS[name]
+    sandbox, input_rows = make_sandbox(script, rows)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    env = {**os.environ, "GROQ_API_KEY": "mock-key", "GROQ_BASE_URL": url, "OLLAMA_HOST": url,
+           "PYTHONDONTWRITEBYTECODE": "1"}
+
+    before = server.stats.snapshot()
+    launched = time.monotonic()
+    result = subprocess.run([sys.executable, script], cwd=sandbox, env=env, capture_output=True, text=True)
+    wall = time.monotonic() - launched
+    stats = server.stats.snapshot()
+
+    intervals = [(start, end) for start, end in stats["intervals"] if start >= launched]
+    first_request = min((start for start, _ in intervals), default=launched + wall)
+    startup = first_request - launched
+    busy = busy_seconds(intervals, since=first_request)
+    if keep:
+        print(f"📁 {name} sandbox kept at {sandbox}")
+    else:
+        shutil.rmtree(sandbox, ignore_errors=True)
+
+    if result.returncode != 0:
+        error = (result.stderr.strip().splitlines() or ["exit code " + str(result.returncode)])[-1]
+        print(f"❌ {name} failed: {error}")
+    return {
+        "script": name,
+        "status": "ok" if result.returncode == 0 else "failed",
+        "rows": input_rows,
+        "requests": stats["requests"] - before["requests"],
+        "http_errors": stats["errors"] - before["errors"],
+        "wall_sec": round(wall, 2),
+        "startup_sec": round(startup, 2),
+        "busy_sec": round(busy, 2),
+        "rows_per_sec": round(input_rows / wall, 2) if wall else None,
+        "overhead_ms_per_row": round(1000 * max(0.0, wall - startup - busy) / input_rows, 1) if input_rows else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the runners end to end against the mock LLM server.")
+    parser.add_argument("--scripts", nargs="+", choices=list(SCRIPTS), default=list(SCRIPTS))
+    parser.add_argument("--rows", type=int, default=20, help="input rows per script")
+    parser.add_argument("--latency", type=float, default=0.0, help="mock seconds before the first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=0.0, help="mock generation speed (0: instant)")
+    parser.add_argument("--load-sec", type=float, default=0.0, help="mock Ollama cold-start load time")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="mock random 429 probability")
+    parser.add_argument("--server-error-rate", type=float, default=0.0, help="mock random 500 probability")
+    parser.add_argument("--rpm", type=int, default=100000, help="mock Groq requests per minute")
+    parser.add_argument("--tpm", type=int, default=100000000, help="mock Groq tokens per minute")
+    parser.add_argument("--output", help="also write the results to this .xlsx/.csv file")
+    parser.add_argument("--keep", action="store_true", help="keep the sandboxes for inspection")
+    args = parser.parse_args()
+
+    behavior = Behavior(args.latency, args.tokens_per_sec, args.load_sec, args.error_rate, args.server_error_rate)
+    server = serve(0, args.rpm, args.tpm, behavior=behavior)
+    print(f"🧪 Mock server on port {server.server_address[1]}, {args.rows} rows per script")
+
+    results = []
+    try:
+        for name in args.scripts:
+            print(f"⏱️ Running {name}...")
+            results.append(run_script(name, server, args.rows, args.keep))
+    finally:
+        server.shutdown()
+
+    report = pd.DataFrame(results)
+    with pd.option_context("display.max_columns", None, "display.width", 200):
+        print(report.to_string(index=False))
+    if args.output:
+        (report.to_csv if args.output.endswith(".csv") else report.to_excel)(args.output, index=False)
+        print(f"📄 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
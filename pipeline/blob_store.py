@@ -0,0 +1,101 @@
+"""Content-hashed store for repository code shared across misuse partitions.
+
+The same repository shows up under several misuses (276 preprocessing rows
+hold only 116 distinct ``Cleaned Code`` blobs), so each blob is stored once,
+keyed by the SHA-256 of its normalized text, and per-blob results are kept
+as named artifacts next to it. Partitions carry the ``Blob_ID`` and any stage
+can ask for an artifact instead of recomputing it:
+
+    store = BlobStore()
+    blob = store.put(row["Cleaned Code"])
+    sliced = store.get_or_compute(blob, f"static_slice:{misuse}", lambda: slice_code(code, misuse))
+    print(store.summary())
+
+Artifacts are text; a ``compute`` returning ``None`` is not stored, so
+failures are retried on the next run.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from pipeline.cache import REPO_ROOT
+
+
+DEFAULT_STORE_PATH = os.path.join(REPO_ROOT, ".llm_cache", "blobs.sqlite")
+
+
+def normalize_code(code) -> str:
+    if not isinstance(code, str):
+        return ""
+    return code.replace("\r\n", "\n").replace("\r", "\n").strip("\n")
+
+
+def blob_id(code) -> str:
+    """SHA-256 of the normalized code, the key shared by every partition."""
+    return hashlib.sha256(normalize_code(code).encode("utf-8")).hexdigest()
+
+
+class BlobStore:
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        self.path = path
+        self.computed = 0
+        self.reused = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS blobs (id TEXT PRIMARY KEY, code TEXT, size INTEGER, created REAL)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS artifacts ("
+            " blob_id TEXT, name TEXT, value TEXT, created REAL, PRIMARY KEY (blob_id, name))"
+        )
+
+    def put(self, code) -> str:
+        """Store ``code`` once and return its blob id."""
+        key = blob_id(code)
+        text = normalize_code(code)
+        with self._lock:
+            self._db.execute("INSERT OR IGNORE INTO blobs VALUES (?, ?, ?, ?)",
+                             (key, text, len(text.encode("utf-8")), time.time()))
+        return key
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._db.execute("SELECT code FROM blobs WHERE id = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def get_artifact(self, key: str, name: str):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM artifacts WHERE blob_id = ? AND name = ?",
+                                   (key, name)).fetchone()
+        return row[0] if row else None
+
+    def put_artifact(self, key: str, name: str, value: str) -> None:
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?, ?)", (key, name, value, time.time()))
+
+    def get_or_compute(self, key: str, name: str, compute):
+        """Return the stored artifact, or run ``compute()`` and store a non-``None`` result."""
+        value = self.get_artifact(key, name)
+        if value is not None:
+            self.reused += 1
+            return value
+        value = compute()
+        if value is not None:
+            self.put_artifact(key, name, value)
+        self.computed += 1
+        return value
+
+    def summary(self) -> str:
+        with self._lock:
+            blobs, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        return (f"{blobs} unique blobs ({size / 1e6:.1f} MB), "
+                f"{self.reused} artifacts reused, {self.computed} computed")
+
+    def close(self) -> None:
+        self._db.close()
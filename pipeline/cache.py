@@ -0,0 +1,144 @@
+"""Content-addressed on-disk cache for LLM responses.
+
+Every stage calls its models with ``temperature=0`` (Ollama defaults to 0.8,
+so its calls send it in ``options``), and the options sent are part of the
+key, so the same (backend, model, prompt, options) always deserves the same
+answer. Responses are stored
+in a SQLite file (WAL mode) keyed by the SHA-256 of that tuple, evicted
+least-recently-used once the stored text exceeds ``max_bytes``. Identical
+prompts issued concurrently are sent once; the other callers wait for that
+result. Only successful calls are cached, errors always go back to the model.
+
+    cache = ResponseCache()
+    text = cache.get_or_call("groq", model_name, prompt, {"temperature": 0},
+                             lambda: call_model(prompt))
+    print(cache.summary())
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from pipeline.telemetry import emit
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CACHE_PATH = os.path.join(REPO_ROOT, ".llm_cache", "responses.sqlite")
+
+
+def cache_key(backend: str, model: str, prompt: str, options: dict = None) -> str:
+    """Stable hash of everything that determines a temperature-0 response."""
+    payload = json.dumps(
+        {"backend": backend, "model": model, "prompt": prompt, "options": options or {}},
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = 512 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.deduplicated = 0
+        self._lock = threading.Lock()
+        self._pending = {}
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, backend TEXT, model TEXT, value TEXT,"
+            " size INTEGER, created REAL, last_access REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses(last_access)")
+
+    def get(self, key: str):
+        """Return the cached text for ``key`` (refreshing its LRU stamp) or ``None``."""
+        with self._lock:
+            return self._get(key)
+
+    def put(self, key: str, value: str, backend: str = "", model: str = "") -> None:
+        with self._lock:
+            self._put(key, value, backend, model)
+
+    def get_or_call(self, backend: str, model: str, prompt: str, options: dict, call):
+        """Return the cached response, or run ``call()`` once and cache its result."""
+        key = cache_key(backend, model, prompt, options)
+        with self._lock:
+            value = self._get(key)
+            if value is not None:
+                self.hits += 1
+            else:
+                pending = self._pending.get(key)
+                owner = pending is None
+                if owner:
+                    pending = self._pending[key] = Future()
+                    self.misses += 1
+                else:
+                    self.deduplicated += 1
+        if value is not None:
+            emit(backend=backend, model=model, latency_sec=0.0, cache_hit=True)
+            return value
+
+        if not owner:
+            start = time.time()
+            value = pending.result()
+            emit(backend=backend, model=model, latency_sec=round(time.time() - start, 3), cache_hit=True)
+            return value
+
+        try:
+            value = call()
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        else:
+            with self._lock:
+                self._put(key, value, backend, model)
+            pending.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def summary(self) -> str:
+        lookups = self.hits + self.misses
+        rate = 100 * self.hits / lookups if lookups else 0.0
+        return (f"{self.hits} hits, {self.misses} misses ({rate:.0f}% hit rate), "
+                f"{self.deduplicated} deduplicated in-flight")
+
+    def close(self) -> None:
+        self._db.close()
+
+    def _get(self, key: str):
+        row = self._db.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def _put(self, key: str, value: str, backend: str, model: str) -> None:
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        self._db.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, backend, model, value, size, now, now),
+        )
+        self._evict()
+
+    def _evict(self) -> None:
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall():
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
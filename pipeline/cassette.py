@@ -0,0 +1,263 @@
+"""Record/replay cassettes of Groq and Ollama responses.
+
+Every stage calls its models with ``temperature=0``, so a recorded run can be
+played back. A cassette is a SQLite file holding one zlib-compressed response
+body per request, keyed by the SHA-256 of the method, the path and the
+canonical JSON body. The body is stored as it went over the wire, whether
+plain JSON, SSE or NDJSON. API keys and other request headers are never
+stored.
+
+The recorder and the player are the same loopback server. The runners find
+it through ``GROQ_BASE_URL`` and ``OLLAMA_HOST``, exactly as they find
+``pipeline.mock_server``:
+
+    # record: forward to Groq / Ollama and keep every successful response
+    python -m pipeline.cassette record --cassette judge -- python ScalableRefactoring/Judge.py
+
+    # replay: answer from the cassette, no network and no model load
+    python -m pipeline.cassette replay --cassette judge -- python ScalableRefactoring/Judge.py
+
+A cassette name without a path goes to ``.llm_cache/cassettes/<name>.sqlite``.
+In replay, a request missing from the cassette (e.g. a prompt that changed)
+gets a 404 and shows up as an ``[ERROR]`` cell, and the run ends with the
+hit/miss count. Prompts answered from the ``ResponseCache`` never reach the
+server, so record with an empty cache to capture the whole run.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from pipeline.cache import DEFAULT_CACHE_PATH, REPO_ROOT
+from pipeline.ollama_client import ollama_base_url
+
+
+CASSETTE_DIR = os.path.join(REPO_ROOT, ".llm_cache", "cassettes")
+GROQ_URL = "https://api.groq.com"
+
+# Response headers kept in a recording; the rest are per-connection.
+KEPT_HEADERS = ("content-type", "retry-after")
+
+# Sent with replayed Groq answers so GroqScheduler stops pacing calls.
+OPEN_QUOTA_HEADERS = {
+    "x-ratelimit-limit-requests": "1000000",
+    "x-ratelimit-remaining-requests": "1000000",
+    "x-ratelimit-reset-requests": "0s",
+    "x-ratelimit-limit-tokens": "1000000000",
+    "x-ratelimit-remaining-tokens": "1000000000",
+    "x-ratelimit-reset-tokens": "0s",
+}
+
+
+def cassette_path(name: str) -> str:
+    if os.sep in name or name.endswith(".sqlite"):
+        return name
+    return os.path.join(CASSETTE_DIR, f"{name}.sqlite")
+
+
+def request_key(method: str, path: str, body: bytes) -> str:
+    """Stable hash of a request; JSON bodies are compared by content, not key order."""
+    try:
+        canonical = json.dumps(json.loads(body or b"{}"), sort_keys=True, ensure_ascii=False)
+    except ValueError:
+        canonical = body.decode("utf-8", "replace")
+    return hashlib.sha256(f"{method} {path}\n{canonical}".encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    def __init__(self, path: str):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS interactions ("
+            " key TEXT PRIMARY KEY, method TEXT, path TEXT, request BLOB,"
+            " status INTEGER, headers TEXT, body BLOB, size INTEGER, recorded REAL)"
+        )
+
+    def put(self, method: str, path: str, request: bytes, status: int, headers: dict, body: bytes) -> None:
+        key = request_key(method, path, request)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO interactions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, method, path, zlib.compress(request, 9), status, json.dumps(headers),
+                 zlib.compress(body, 9), len(body), time.time()),
+            )
+            self.recorded += 1
+
+    def get(self, method: str, path: str, request: bytes):
+        """``(status, headers, body)`` recorded for this request, or ``None``."""
+        key = request_key(method, path, request)
+        with self._lock:
+            row = self._db.execute("SELECT status, headers, body FROM interactions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0], json.loads(row[1]), zlib.decompress(row[2])
+
+    def summary(self) -> str:
+        with self._lock:
+            count, raw = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM interactions").fetchone()
+        stored = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return (f"{count} responses ({raw / 1e6:.1f} MB raw, {stored / 1e6:.1f} MB on disk) | "
+                f"this run: {self.recorded} recorded, {self.hits} replayed, {self.misses} missing")
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def is_groq(path: str) -> bool:
+    return path.endswith("/chat/completions") or path.startswith("/openai/")
+
+
+def make_handler(cassette: Cassette, mode: str, groq_url: str = GROQ_URL, ollama_url: str = None):
+    ollama_url = ollama_url or ollama_base_url()
+    session = requests.Session()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            request = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            try:
+                if mode == "replay":
+                    self._replay(request)
+                else:
+                    self._record(request)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the client stopped reading
+
+        def _replay(self, request: bytes) -> None:
+            recorded = cassette.get("POST", self.path, request)
+            if recorded is None:
+                body = json.dumps({"error": {"message": f"no recorded response for this {self.path} request"}})
+                self._send(404, {"content-type": "application/json"}, body.encode("utf-8"))
+                return
+            status, headers, body = recorded
+            if is_groq(self.path):
+                headers = {**headers, **OPEN_QUOTA_HEADERS}
+            self._send(status, headers, body)
+
+        def _record(self, request: bytes) -> None:
+            upstream = (groq_url if is_groq(self.path) else ollama_url).rstrip("/") + self.path
+            forwarded = {k: v for k, v in self.headers.items()
+                         if k.lower() in ("authorization", "content-type", "accept", "user-agent")
+                         or k.lower().startswith("x-stainless")}
+            try:
+                response = session.post(upstream, data=request, headers=forwarded, stream=True, timeout=(5, 900))
+            except requests.RequestException as e:
+                body = json.dumps({"error": {"message": f"upstream unreachable: {e}"}})
+                self._send(502, {"content-type": "application/json"}, body.encode("utf-8"))
+                return
+
+            with response:
+                headers = {k.lower(): v for k, v in response.headers.items()
+                           if k.lower() in KEPT_HEADERS or k.lower().startswith("x-ratelimit")}
+                self.send_response(response.status_code)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Connection", "close")
+                self.end_headers()
+
+                # Relay as it arrives, so streamed answers stay streamed while recording
+                body = []
+                try:
+                    for chunk in response.iter_content(chunk_size=None):
+                        body.append(chunk)
+                        self.wfile.write(chunk)
+                        self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # an early-stopped stream is kept as far as it got; replay stops at the same point
+
+            if response.status_code == 200:
+                kept = {k: v for k, v in headers.items() if k in KEPT_HEADERS}
+                cassette.put("POST", self.path, request, 200, kept, b"".join(body))
+
+        def _send(self, status: int, headers: dict, body: bytes) -> None:
+            self.send_response(status)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def serve(cassette: Cassette, mode: str, port: int = 0, groq_url: str = GROQ_URL,
+          ollama_url: str = None) -> ThreadingHTTPServer:
+    """Start the recorder/player on a background thread; ``port=0`` picks a free port."""
+    if mode not in ("record", "replay"):
+        raise ValueError(f"❌ mode must be 'record' or 'replay', got {mode!r}")
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(cassette, mode, groq_url, ollama_url))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record or replay Groq/Ollama responses for a command.")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("--cassette", required=True, help="cassette name or .sqlite path")
+    parser.add_argument("--port", type=int, default=0, help="server port (default: any free port)")
+    parser.add_argument("--groq-url", default=os.getenv("GROQ_BASE_URL") or GROQ_URL, help="Groq upstream (record)")
+    parser.add_argument("--ollama-url", default=ollama_base_url(), help="Ollama upstream (record)")
+    parser.usage = "%(prog)s {record,replay} --cassette NAME [options] [-- command ...]"
+
+    # Everything after "--" is the command to run against the server
+    argv = sys.argv[1:]
+    split = argv.index("--") if "--" in argv else len(argv)
+    args = parser.parse_args(argv[:split])
+    command = argv[split + 1:]
+    path = cassette_path(args.cassette)
+    if args.mode == "replay" and not os.path.exists(path):
+        raise ValueError(f"❌ Cassette not found: {path}")
+    if args.mode == "record" and os.path.exists(DEFAULT_CACHE_PATH):
+        print(f"⚠️ Prompts already in {DEFAULT_CACHE_PATH} are answered from the cache and will not be recorded")
+
+    cassette = Cassette(path)
+    server = serve(cassette, args.mode, args.port, args.groq_url, args.ollama_url)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"📼 {args.mode.capitalize()}ing {path} on {url}")
+
+    try:
+        if command:
+            env = {**os.environ, "GROQ_BASE_URL": url, "OLLAMA_HOST": url}
+            if args.mode == "replay":
+                env.setdefault("GROQ_API_KEY", "replay")
+            returncode = subprocess.run(command, env=env).returncode
+        else:
+            print(f"   GROQ_BASE_URL={url} OLLAMA_HOST={url} <command>   (Ctrl-C to stop)")
+            returncode = 0
+            while True:
+                time.sleep(3600)
+    except KeyboardInterrupt:
+        returncode = 0
+    finally:
+        server.shutdown()
+        print(f"📼 {cassette.summary()}")
+        cassette.close()
+    sys.exit(returncode)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Cell-level bookkeeping for the judge runs.
+
+A judge run is a grid of (row, judge column) cells. A cell is pending while it
+is blank or holds an ``[ERROR]`` placeholder, so a restarted run re-issues
+exactly those cells and keeps every verdict it already has. Grouping the
+pending cells by judge lets a runner drain one model's queue while it is
+resident instead of swapping models on every row.
+"""
+
+from collections import deque
+
+import pandas as pd
+
+from pipeline.telemetry import context
+
+
+def is_missing(value) -> bool:
+    """True for NaN, ``None`` and blank cells."""
+    return pd.isna(value) or str(value).strip() == ""
+
+
+def is_failed(value) -> bool:
+    """True for cells holding an ``[ERROR] ...`` placeholder."""
+    return not is_missing(value) and str(value).lstrip().startswith("[ERROR]")
+
+
+def needs_verdict(value) -> bool:
+    return is_missing(value) or is_failed(value)
+
+
+def text_columns(df: pd.DataFrame, columns) -> pd.DataFrame:
+    """Add any missing ``columns`` and make them ``object`` so verdict text fits.
+
+    A reloaded workbook column whose cells are all blank comes back as
+    float64, and pandas refuses to store a string in it.
+    """
+    for col in columns:
+        if col not in df.columns:
+            df[col] = None
+        df[col] = df[col].astype(object)
+    return df
+
+
+def pending_by_column(df: pd.DataFrame, columns) -> dict:
+    """Map each judge column to the row indices that still need a verdict."""
+    return {col: [idx for idx in df.index if needs_verdict(df.at[idx, col])] for col in columns}
+
+
+def run_queue(rows, judge_cell, on_result, max_attempts: int = 3) -> int:
+    """Judge ``rows`` one cell at a time, re-queueing failed cells at the back.
+
+    ``judge_cell(idx)`` returns the cell text (``[ERROR] ...`` on failure). A
+    failed cell is retried after the rest of the queue, up to ``max_attempts``
+    times, and only its final value is passed to ``on_result(idx, value)``.
+    Returns the number of cells that still failed.
+    """
+    queue = deque((idx, 1) for idx in rows)
+    failed = 0
+    while queue:
+        idx, attempt = queue.popleft()
+        with context(row=idx + 1):
+            value = judge_cell(idx)
+        if is_failed(value) and attempt < max_attempts:
+            queue.append((idx, attempt + 1))
+            continue
+        failed += is_failed(value)
+        on_result(idx, value)
+    return failed
@@ -0,0 +1,258 @@
+"""Compaction of code snippets before prompt rendering.
+
+Comments, blank lines, docstrings and long string literals make up a large
+share of each ``Cleaned Code`` cell and do not help a misuse prompt.
+``compact_code`` drops full-line comments and blank lines, collapses each
+docstring to a ``__D1__`` placeholder and replaces long literals with
+``"__S1__"``, keeping a line map from every compact line to its span of the
+original source. ``expand`` re-applies model output onto the original:
+unchanged compact lines come back as their original span, the comments and
+blank lines between original lines are kept around edited lines too, and
+placeholders in new lines are restored to their literals.
+
+    compacted = compact_code(code)
+    prompt = template.format(code_snippet=compacted.text)
+    restored = compacted.expand(refactored_code_from_the_model)
+    saved = compacted.saved_tokens
+
+``expand(compacted.text)`` always equals the original code; lines the model
+rewrote come back as it wrote them. ``compact_response`` compacts only the
+code of an answer (its ``Refactored Code:`` section or first fenced block),
+leaving the prose and markdown alone. ``python -m pipeline.compaction``
+checks the round-trip over the corpus and reports the token savings.
+"""
+
+import argparse
+import difflib
+import glob
+import os
+import re
+from dataclasses import dataclass, field
+
+from pipeline.token_budget import count_tokens
+
+
+# Literals longer than this are replaced by a placeholder.
+LONG_STRING_CHARS = 60
+
+_MARKER = re.compile(r"^# ===== File: .* =====\s*$")
+_TRIPLE = re.compile(r"'''|\"\"\"")
+_DOCSTRING_START = re.compile(r"^(\s*)[rRuUbB]{0,2}('''|\"\"\")")
+_LONG_STRING = re.compile(r"(?<![\w'\"])[rRuUbBfF]{0,2}('[^'\\\n]{%d,}'|\"[^\"\\\n]{%d,}\")" % (LONG_STRING_CHARS, LONG_STRING_CHARS))
+_PLACEHOLDER = re.compile(r"([rRuUbBfF]{0,2}(?:'''|\"\"\"|'|\"))?__([SD]\d+)__(?:'''|\"\"\"|'|\")?")
+_CODE_BLOCK = re.compile(r"(Refactored Code:\s*\n)(.*?)(\n\s*[#*]*\s*Summary of Changes)", re.DOTALL | re.IGNORECASE)
+_OPENING_FENCE = re.compile(r"\s*```[\w-]*[ \t]*\n")
+_CLOSING_FENCE = re.compile(r"\n[ \t]*```\s*$")
+_FENCED_BLOCK = re.compile(r"^[ \t]*```[\w-]*[ \t]*\n(.*?)\n[ \t]*```[ \t]*$", re.DOTALL | re.M)
+
+
+@dataclass
+class Compacted:
+    original: str
+    text: str
+    spans: list = field(default_factory=list)         # compact line -> (start, end) original lines
+    placeholders: dict = field(default_factory=dict)  # "S1"/"D1" -> original literal
+
+    @property
+    def original_tokens(self) -> int:
+        return count_tokens(self.original)
+
+    @property
+    def compact_tokens(self) -> int:
+        return count_tokens(self.text)
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.original_tokens - self.compact_tokens
+
+    def restore_placeholders(self, text: str) -> str:
+        """Put the original literals back in place of ``__S1__``/``__D1__`` placeholders."""
+        def restore(match):
+            key = match.group(2)
+            return self.placeholders.get(key, match.group(0))
+        return _PLACEHOLDER.sub(restore, text)
+
+    def expand(self, new_text: str) -> str:
+        """Map ``new_text`` (an edited copy of ``self.text``) back onto the original source."""
+        original = self.original.split("\n")
+        compact = self.text.split("\n") if self.spans else []
+        new = new_text.split("\n") if new_text else []
+
+        out = []
+        for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, compact, new, autojunk=False).get_opcodes():
+            for i in range(i1, i2 if tag == "equal" else min(i1 + 1, i2)):
+                previous_end = self.spans[i - 1][1] if i else 0
+                out.extend(original[previous_end:self.spans[i][0]])  # comments and blank lines before the line
+                if tag == "equal":
+                    out.extend(original[self.spans[i][0]:self.spans[i][1]])
+            if tag != "equal":
+                out.extend(self.restore_placeholders(line) for line in new[j1:j2])
+        out.extend(original[self.spans[-1][1] if self.spans else 0:])  # trailing comments and blank lines
+        return "\n".join(out)
+
+    def expand_response(self, response: str) -> str:
+        """``expand`` the code of a ``Refactored Code: ... Summary of Changes`` answer; fences are kept."""
+        span = _code_span(response or "")
+        if span is None:
+            return self.restore_placeholders(response or "")
+        start, end = span
+        return response[:start] + self.expand(response[start:end]) + response[end:]
+
+
+def compact_response(response) -> tuple:
+    """``(text, saved_tokens)`` of ``response`` with only its code compacted.
+
+    The code is the ``Refactored Code:`` section, or else the first fenced
+    block; answers with neither are returned unchanged.
+    """
+    span = (_code_span(response) or _fenced_span(response)) if isinstance(response, str) else None
+    if span is None:
+        return response, 0
+    start, end = span
+    compacted = compact_code(response[start:end])
+    return response[:start] + compacted.text + response[end:], compacted.saved_tokens
+
+
+def _code_span(response: str):
+    """``(start, end)`` of the code in the ``Refactored Code:`` section, without fences or edge newlines."""
+    match = _CODE_BLOCK.search(response)
+    if not match:
+        return None
+    start, end = match.start(2), match.end(2)
+    section = response[start:end]
+    opening = _OPENING_FENCE.match(section)
+    closing = _CLOSING_FENCE.search(section)
+    if opening and closing and closing.start() >= opening.end():
+        start, end = start + opening.end(), start + closing.start()
+    body = response[start:end]
+    if body.strip("\n"):
+        start += len(body) - len(body.lstrip("\n"))
+        end -= len(body) - len(body.rstrip("\n"))
+    return start, end
+
+
+def _fenced_span(response: str):
+    """``(start, end)`` of the body of the first fenced block, or ``None``."""
+    match = _FENCED_BLOCK.search(response)
+    return match.span(1) if match else None
+
+
+def compact_code(code) -> Compacted:
+    """Compact ``code``; see the module docstring for what is dropped or shortened."""
+    code = code if isinstance(code, str) else ""
+    lines = code.split("\n")
+    result = Compacted(code, "")
+    compact_lines = []
+
+    i = 0
+    previous_code = None
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+
+        # Docstring: first statement of a module, file, class or function
+        start = _DOCSTRING_START.match(line)
+        if start and (previous_code is None or _MARKER.match(previous_code)
+                      or re.match(r"\s*(async\s+def|def|class)\b.*:\s*$", previous_code)):
+            end = _string_end(lines, i, start.group(2), start.end())
+            if end is not None:
+                key = f"D{len(result.placeholders) + 1}"
+                result.placeholders[key] = "\n".join(lines[i:end + 1]).strip()
+                compact_lines.append(f'{start.group(1)}"""__{key}__"""')
+                result.spans.append((i, end + 1))
+                previous_code = compact_lines[-1]
+                i = end + 1
+                continue
+
+        # Blank lines and full-line comments (file markers are kept)
+        if not stripped or (stripped.startswith("#") and not _MARKER.match(line)):
+            i += 1
+            continue
+
+        # A statement opening a multi-line string keeps all of its lines verbatim
+        end = i
+        opener = _open_triple(line)
+        if opener:
+            closing = _string_end(lines, i, opener[0], opener[1])
+            end = closing if closing is not None else len(lines) - 1
+        for j in range(i, end + 1):
+            compact_lines.append(_shorten_strings(lines[j], result.placeholders) if j == i == end else lines[j])
+            result.spans.append((j, j + 1))
+        previous_code = lines[end]
+        i = end + 1
+
+    result.text = "\n".join(compact_lines)
+    return result
+
+
+def _shorten_strings(line: str, placeholders: dict) -> str:
+    def shorten(match):
+        key = f"S{len(placeholders) + 1}"
+        placeholders[key] = match.group(0)
+        quote = match.group(1)[0]
+        return f"{quote}__{key}__{quote}"
+    return _LONG_STRING.sub(shorten, line)
+
+
+def _open_triple(line: str):
+    """``(delimiter, position after it)`` if ``line`` leaves a triple-quoted string open."""
+    position = 0
+    while True:
+        match = _TRIPLE.search(line, position)
+        if not match:
+            return None
+        delimiter = match.group(0)
+        close = line.find(delimiter, match.end())
+        if close == -1:
+            return delimiter, match.end()
+        position = close + 3
+
+
+def _string_end(lines, first: int, delimiter: str, offset: int):
+    """Index of the line that closes a triple-quoted string opened at ``lines[first][offset:]``."""
+    close = lines[first].find(delimiter, offset)
+    if close != -1:
+        return first if _open_triple(lines[first][close + 3:]) is None else None
+    for j in range(first + 1, len(lines)):
+        close = lines[j].find(delimiter)
+        if close != -1:
+            return j if _open_triple(lines[j][close + 3:]) is None else None
+    return None
+
+
+def main():
+    import pandas as pd
+
+    from pipeline.cache import REPO_ROOT
+
+    parser = argparse.ArgumentParser(description="Round-trip the corpus through prompt compaction.")
+    parser.add_argument("files", nargs="*", help="workbooks to check (default: the preprocessing input and split files)")
+    args = parser.parse_args()
+
+    files = args.files or [os.path.join(REPO_ROOT, "preprocessing", "cleaned_code_python(colab).xlsx")] + \
+        sorted(glob.glob(os.path.join(REPO_ROOT, "*", "instances_*.xlsx")))
+    failures = rows = 0
+    before = after = 0
+    for path in files:
+        df = pd.read_excel(path)
+        for column in [c for c in ("Cleaned Code", "Code snippet", "Refactored_Code") if c in df.columns]:
+            for idx, code in df[column].items():
+                if not isinstance(code, str):
+                    continue
+                compacted = compact_code(code)
+                rows += 1
+                before += compacted.original_tokens
+                after += compacted.compact_tokens
+                if compacted.expand(compacted.text) != code:
+                    failures += 1
+                    print(f"❌ {os.path.basename(path)} [{column}] row {idx + 1} does not round-trip")
+
+    saved = 100 * (before - after) / before if before else 0.0
+    print(f"🔁 {rows} snippets round-tripped, {failures} failures")
+    print(f"✂️ Prompt tokens: {before} → {after} ({saved:.1f}% saved)")
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Diff-output refactoring: let the model return edits, rebuild the code locally.
+
+Re-emitting a whole merged repository costs thousands of output tokens when a
+fix touches a few lines. In diff mode the model answers with search/replace
+hunks (or a unified diff), which are applied to the row's ``Cleaned Code`` to
+rebuild the same ``Refactored Code: ... Summary of Changes: ...`` text the
+full-output mode stores. ``HunkError`` means the edits could not be applied
+and the caller should fall back to a full-output call.
+"""
+
+import re
+
+
+# Response format for the diff-mode prompt. It is appended to templates that
+# go through str.format, so it must not contain braces.
+SEARCH_REPLACE_FORMAT = """Response Format:
+
+Return ONLY the edits needed to fix the misuse, as one or more blocks of this exact form:
+
+<<<<<<< SEARCH
+[lines copied exactly from the original code, including indentation, with enough context to be unique]
+=======
+[the same lines after your change]
+>>>>>>> REPLACE
+
+To add new lines, put the line just above the insertion point in SEARCH and repeat it at the top of REPLACE.
+Do NOT output the full code.
+
+Summary of Changes:
+[Provide a concise bullet-point list describing exactly what was changed to fix the misuse]
+"""
+
+_BLOCK = re.compile(
+    r"<{5,9} ?SEARCH[^\n]*\n(.*?)\n?={5,9}[^\n]*\n(.*?)\n?>{5,9} ?REPLACE",
+    re.DOTALL,
+)
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+# "Summary of Changes:", "**Summary of Changes:**" or a Markdown "### Summary of Changes" heading
+_SUMMARY = re.compile(r"\n\s*(?:#+\s*)?\**\s*Summary of Changes\s*:?\**", re.IGNORECASE)
+
+
+class HunkError(ValueError):
+    """Raised when model edits do not apply cleanly to the original code."""
+
+
+def parse_search_replace(text: str) -> list:
+    """Return ``[(search, replace), ...]`` from SEARCH/REPLACE blocks."""
+    return [(search, replace) for search, replace in _BLOCK.findall(text or "")]
+
+
+def apply_search_replace(source: str, hunks) -> str:
+    """Apply each hunk once; exact match first, then ignoring trailing whitespace."""
+    for number, (search, replace) in enumerate(hunks, start=1):
+        if not search.strip():
+            raise HunkError(f"hunk {number} has an empty SEARCH block")
+        count = source.count(search)
+        if count == 1:
+            source = source.replace(search, replace, 1)
+            continue
+        if count > 1:
+            raise HunkError(f"hunk {number} matches {count} places")
+        source = _replace_loose(source, search, replace, number)
+    return source
+
+
+def apply_unified_diff(source: str, diff_text: str) -> str:
+    """Apply a unified diff to ``source``, locating hunks by their context lines."""
+    lines = source.split("\n")
+    hunks = _parse_unified(diff_text)
+    if not hunks:
+        raise HunkError("no @@ hunks found")
+
+    offset = 0
+    for number, (start, old, new) in enumerate(hunks, start=1):
+        position = _find_block(lines, old, max(0, start - 1 + offset))
+        if position is None:
+            raise HunkError(f"diff hunk {number} does not match the original code")
+        lines[position:position + len(old)] = new
+        offset = position + len(new) - (start - 1 + len(old))
+    return "\n".join(lines)
+
+
+def rebuild_refactored(source: str, response: str) -> str:
+    """Rebuild the full-output cell text from a diff-mode response.
+
+    Raises ``HunkError`` when the response holds no applicable edits.
+    """
+    summary = ""
+    body = response
+    match = _SUMMARY.search(response)
+    if match:
+        body, summary = response[:match.start()], response[match.end():].strip()
+
+    hunks = parse_search_replace(body)
+    if hunks:
+        code = apply_search_replace(source, hunks)
+    elif "@@" in body:
+        code = apply_unified_diff(source, _strip_fences(body))
+    else:
+        raise HunkError("response contains no SEARCH/REPLACE blocks or diff hunks")
+
+    return f"Refactored Code:\n{code}\n\nSummary of Changes:\n{summary}"
+
+
+def _replace_loose(source: str, search: str, replace: str, number: int) -> str:
+    lines = source.split("\n")
+    wanted = [line.rstrip() for line in search.split("\n")]
+    stripped = [line.rstrip() for line in lines]
+    matches = [i for i in range(len(lines) - len(wanted) + 1) if stripped[i:i + len(wanted)] == wanted]
+    if not matches:
+        raise HunkError(f"hunk {number} SEARCH text not found in the original code")
+    if len(matches) > 1:
+        raise HunkError(f"hunk {number} matches {len(matches)} places")
+    i = matches[0]
+    lines[i:i + len(wanted)] = replace.split("\n")
+    return "\n".join(lines)
+
+
+def _parse_unified(diff_text: str) -> list:
+    """Return ``[(old_start, old_lines, new_lines), ...]``."""
+    hunks = []
+    current = None
+    for line in diff_text.split("\n"):
+        header = _HUNK_HEADER.match(line)
+        if header:
+            current = (int(header.group(1)), [], [])
+            hunks.append(current)
+            continue
+        if current is None or line.startswith(("---", "+++")):
+            continue
+        if line.startswith("+"):
+            current[2].append(line[1:])
+        elif line.startswith("-"):
+            current[1].append(line[1:])
+        elif line.startswith(" ") or line == "":
+            current[1].append(line[1:])
+            current[2].append(line[1:])
+
+    # Blank lines after the last real hunk line are prose spacing, not context
+    for _, old, new in hunks:
+        while old and new and old[-1] == "" and new[-1] == "":
+            old.pop()
+            new.pop()
+    return hunks
+
+
+def _find_block(lines: list, block: list, hint: int):
+    """Index where ``block`` occurs in ``lines``, searching outward from ``hint``."""
+    if not block:
+        return min(hint, len(lines))
+    wanted = [line.rstrip() for line in block]
+    size = len(block)
+    last = len(lines) - size
+    for distance in range(0, max(hint, last - hint) + 1):
+        for i in (hint - distance, hint + distance):
+            if 0 <= i <= last and [line.rstrip() for line in lines[i:i + size]] == wanted:
+                return i
+    return None
+
+
+def _strip_fences(text: str) -> str:
+    return re.sub(r"^```[a-z]*\s*$", "", text, flags=re.MULTILINE)
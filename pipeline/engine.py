@@ -0,0 +1,97 @@
+"""Bounded-concurrency row engine for the refactoring runners.
+
+The model calls are blocking (``requests`` / the Groq SDK), so rows are fanned
+out over a thread pool with at most ``concurrency`` calls in flight. Results
+are handed back to the caller's thread as they complete; callers write them by
+row index, so the output keeps the input row order.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+
+from pipeline.telemetry import context
+
+
+@dataclass
+class RunStats:
+    """Per-request latencies and overall throughput of one run."""
+
+    latencies: list = field(default_factory=list)
+    errors: int = 0
+    wall_time: float = 0.0
+
+    @property
+    def rows(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def throughput(self) -> float:
+        """Rows per minute of wall-clock time."""
+        return 60 * self.rows / self.wall_time if self.wall_time else 0.0
+
+    def percentile(self, q: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+    def summary(self) -> str:
+        return (
+            f"{self.rows} rows in {self.wall_time:.1f} sec "
+            f"({self.throughput:.1f} rows/min, {self.errors} errors) | "
+            f"latency p50 {self.percentile(50):.2f} sec, p95 {self.percentile(95):.2f} sec, "
+            f"sum {sum(self.latencies):.2f} sec"
+        )
+
+
+def run_rows(rows, worker, concurrency: int = 4, on_result=None) -> RunStats:
+    """Run ``worker(idx, row)`` over ``rows`` with bounded in-flight calls.
+
+    ``rows`` yields ``(idx, row)`` pairs (e.g. ``df.iterrows()``); it is consumed
+    lazily so at most ``concurrency`` rows are materialized at once. ``worker``
+    must return a dict of column values; a raised exception is reported as
+    ``{"error": e}``. ``on_result(idx, values, duration)`` runs in the calling
+    thread, so it may touch the DataFrame and journal without locking.
+    """
+    if concurrency < 1:
+        raise ValueError(f"❌ concurrency must be >= 1, got {concurrency}")
+
+    stats = RunStats()
+    run_start = time.time()
+    rows = iter(rows)
+
+    def timed(idx, row):
+        start = time.time()
+        try:
+            with context(row=idx + 1):
+                values = worker(idx, row)
+        except Exception as e:
+            values = {"error": e}
+        return idx, values, round(time.time() - start, 2)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        in_flight = set()
+        exhausted = False
+        while in_flight or not exhausted:
+            while not exhausted and len(in_flight) < concurrency:
+                try:
+                    idx, row = next(rows)
+                except StopIteration:
+                    exhausted = True
+                    break
+                in_flight.add(pool.submit(timed, idx, row))
+
+            if not in_flight:
+                break
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                idx, values, duration = future.result()
+                stats.latencies.append(duration)
+                if "error" in values:
+                    stats.errors += 1
+                if on_result is not None:
+                    on_result(idx, values, duration)
+
+    stats.wall_time = time.time() - run_start
+    return stats
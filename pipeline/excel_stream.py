@@ -0,0 +1,101 @@
+"""Streaming, column-projected reads of the source workbooks.
+
+``pd.read_excel`` parses every column and every code string of a workbook
+before the first request goes out. The runners here need three or four
+columns, so this module offers two cheaper paths:
+
+    total = count_rows(path)
+    for idx, row in iter_rows(path, columns=["Repository", "File", "Code snippet"]):
+        ...  # first request goes out after the first row is parsed
+
+    df = read_columns(path, columns=["Misuse", "Cleaned Code"])  # Parquet cache
+
+``iter_rows`` walks the sheet with openpyxl in read-only mode, so memory stays
+flat however large the workbook grows. ``read_columns`` converts a workbook to
+Parquet once (under ``.llm_cache/parquet``, keyed by path, size and mtime) and
+then reads only the requested columns from it; without pyarrow it falls back
+to a streamed, projected read.
+"""
+
+import hashlib
+import os
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from pipeline.cache import REPO_ROOT
+
+
+PARQUET_CACHE_DIR = os.path.join(REPO_ROOT, ".llm_cache", "parquet")
+
+
+def iter_rows(path: str, columns=None, sheet: str = None):
+    """Yield ``(index, {column: value})`` per data row, reading only ``columns``.
+
+    ``index`` is the 0-based row position, as in ``df.iterrows()`` on a fresh
+    ``read_excel`` frame; empty cells come back as ``None``.
+    """
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.worksheets[0]
+        rows = worksheet.iter_rows(values_only=True)
+        header = [str(name) if name is not None else f"Unnamed: {i}" for i, name in enumerate(next(rows, ()))]
+        wanted = list(columns) if columns is not None else header
+        missing = [name for name in wanted if name not in header]
+        if missing:
+            raise ValueError(f"❌ Columns {missing} not found in {path}")
+        positions = [header.index(name) for name in wanted]
+
+        idx = 0
+        blank = 0  # empty rows are only yielded if a non-empty row follows, like read_excel
+        for values in rows:
+            if values is None or all(value is None for value in values):
+                blank += 1
+                continue
+            for _ in range(blank):
+                yield idx, dict.fromkeys(wanted)
+                idx += 1
+            blank = 0
+            yield idx, {name: (values[i] if i < len(values) else None) for name, i in zip(wanted, positions)}
+            idx += 1
+    finally:
+        workbook.close()
+
+
+def count_rows(path: str, sheet: str = None) -> int:
+    """Number of data rows, from the sheet dimensions when the file records them."""
+    workbook = load_workbook(path, read_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.worksheets[0]
+        if worksheet.max_row is not None:
+            return max(worksheet.max_row - 1, 0)
+    finally:
+        workbook.close()
+    return sum(1 for _ in iter_rows(path, columns=[], sheet=sheet))
+
+
+def read_columns(path: str, columns=None) -> pd.DataFrame:
+    """DataFrame of ``columns`` (all when ``None``), through the Parquet cache when available."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return pd.DataFrame([row for _, row in iter_rows(path, columns)], columns=columns)
+
+    cache_path = parquet_cache_path(path)
+    if not os.path.exists(cache_path):
+        os.makedirs(PARQUET_CACHE_DIR, exist_ok=True)
+        frame = pd.read_excel(path)
+        tmp_path = cache_path + ".tmp"
+        frame.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, cache_path)
+        if columns is None:
+            return frame
+        return frame[list(columns)]
+    return pd.read_parquet(cache_path, columns=list(columns) if columns is not None else None)
+
+
+def parquet_cache_path(path: str) -> str:
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(PARQUET_CACHE_DIR, f"{stem}-{hashlib.sha256(key.encode()).hexdigest()[:16]}.parquet")
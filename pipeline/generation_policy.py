@@ -0,0 +1,194 @@
+"""Generation policy for reasoning models (DeepSeek-R1, Qwen3, gpt-oss).
+
+Most of what ``deepseek-r1-distill-llama-70b`` and ``qwen/qwen3-32b`` emit is
+a ``<think>`` trace that is thrown away. This module turns reasoning off or
+hides it where the provider supports it, streams the answer so it can be cut
+as soon as the "Summary of Changes" list is complete or a token ceiling is
+hit, and strips any remaining reasoning before the text is stored.
+
+    policy = GenerationPolicy(max_output_tokens=4096)
+    text, tokens, aborted = stream_groq(scheduler.create, policy,
+                                        model=model_name, messages=[...], temperature=0)
+    text, tokens, aborted, load_sec = stream_ollama(ollama_client, policy, model_name, prompt)
+"""
+
+import re
+import time
+from dataclasses import dataclass, replace
+
+from pipeline.rate_limit import estimate_tokens
+from pipeline.telemetry import current_context, emit, groq_usage_fields
+
+
+# Groq request fields that disable or hide reasoning, by model family.
+GROQ_REASONING_KWARGS = {
+    "qwen3": {"reasoning_effort": "none"},
+    "deepseek-r1": {"reasoning_format": "hidden"},
+    "gpt-oss": {"reasoning_effort": "low", "include_reasoning": False},
+}
+
+# Ollama model families that accept ``"think": false``.
+OLLAMA_THINKING_MODELS = ("deepseek-r1", "qwen3", "gpt-oss")
+
+_THINK_BLOCK = re.compile(r"<think>.*?(</think>|$)", re.DOTALL | re.IGNORECASE)
+_SUMMARY_HEADER = re.compile(r"^\W*Summary of Changes\W*$", re.IGNORECASE | re.MULTILINE)
+_LIST_ITEM = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+
+
+def groq_reasoning_kwargs(model: str) -> dict:
+    for family, kwargs in GROQ_REASONING_KWARGS.items():
+        if family in model.lower():
+            return dict(kwargs)
+    return {}
+
+
+def ollama_reasoning_kwargs(model: str) -> dict:
+    if any(family in model.lower() for family in OLLAMA_THINKING_MODELS):
+        return {"think": False}
+    return {}
+
+
+def strip_reasoning(text: str) -> str:
+    """Drop ``<think>...</think>`` blocks (and an unterminated trailing one)."""
+    return _THINK_BLOCK.sub("", text or "").strip()
+
+
+def summary_complete(text: str) -> bool:
+    """True once the "Summary of Changes" list has items and prose follows it."""
+    visible = strip_reasoning(text)
+    headers = list(_SUMMARY_HEADER.finditer(visible))
+    if not headers:
+        return False
+    if "```" not in visible[:headers[-1].start()] and "Refactored Code" not in visible[:headers[-1].start()]:
+        return False  # the code has not been written yet
+    lines = visible[headers[-1].end():].split("\n")
+    seen_item = False
+    previous_blank = False
+    for line in lines[:-1]:  # the last line may still be streaming in
+        if _LIST_ITEM.match(line):
+            seen_item = True
+        elif seen_item and previous_blank and line.strip() and not line.startswith((" ", "\t")):
+            return True
+        previous_blank = not line.strip()
+    return False
+
+
+@dataclass
+class GenerationPolicy:
+    max_output_tokens: int = 4096
+    stop_at_summary: bool = True
+    disable_reasoning: bool = True
+    num_ctx: int = None  # Ollama context size; None keeps the model default
+    temperature: float = 0.0  # greedy decoding, so cached answers match what a new call would return
+
+    def should_stop(self, text: str, tokens: int) -> bool:
+        if tokens >= self.max_output_tokens:
+            return True
+        return self.stop_at_summary and summary_complete(text)
+
+    def groq_kwargs(self, model: str) -> dict:
+        kwargs = {"max_tokens": self.max_output_tokens}
+        if self.disable_reasoning:
+            kwargs.update(groq_reasoning_kwargs(model))
+        return kwargs
+
+    def ollama_kwargs(self, model: str) -> dict:
+        kwargs = {"options": {"num_predict": self.max_output_tokens, "temperature": self.temperature}}
+        if self.num_ctx:
+            kwargs["options"]["num_ctx"] = self.num_ctx
+        if self.disable_reasoning:
+            kwargs.update(ollama_reasoning_kwargs(model))
+        return kwargs
+
+    def cache_options(self) -> dict:
+        """Policy fields that change the stored answer, for the response-cache key."""
+        options = {"max_output_tokens": self.max_output_tokens, "stop_at_summary": self.stop_at_summary,
+                   "disable_reasoning": self.disable_reasoning, "temperature": self.temperature}
+        if self.num_ctx:
+            options["num_ctx"] = self.num_ctx
+        return options
+
+    def for_budget(self, budget) -> "GenerationPolicy":
+        """Copy with ``max_output_tokens`` from a ``token_budget.Budget``.
+
+        The budget can only lower the policy's runaway ceiling, never raise it.
+        ``num_ctx`` is left alone: it is set once per run (``run_num_ctx``),
+        since Ollama reloads the model whenever it changes.
+        """
+        return replace(self, max_output_tokens=min(self.max_output_tokens, budget.max_tokens))
+
+
+def stream_groq(create, policy: GenerationPolicy, **kwargs):
+    """Stream a chat completion and stop early per ``policy``.
+
+    ``create`` is ``GroqScheduler.create`` or ``client.chat.completions.create``.
+    Returns ``(text, completion_tokens, aborted)`` with reasoning stripped.
+    """
+    kwargs = {**kwargs, **policy.groq_kwargs(kwargs["model"]), "stream": True}
+    start = time.time()
+    # GroqScheduler.create reports its retries and quota waits per thread
+    scheduler = getattr(create, "__self__", None)
+    try:
+        stream = create(**kwargs)
+    except Exception as e:
+        _record_stream(scheduler, kwargs["model"], start, error=str(e))
+        raise
+    text = ""
+    tokens = 0
+    aborted = False
+    first_token = None
+    final_usage = None
+    try:
+        for chunk in stream:
+            usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+            if usage is not None:
+                final_usage = usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content or ""
+            if delta and first_token is None:
+                first_token = time.time() - start
+            text += delta
+            tokens += estimate_tokens(delta) if delta else 0
+            if usage is not None and getattr(usage, "completion_tokens", None):
+                tokens = usage.completion_tokens
+            # The summary can only complete at a line break; skip the scan otherwise
+            if tokens >= policy.max_output_tokens or ("\n" in delta and policy.should_stop(text, tokens)):
+                aborted = chunk.choices[0].finish_reason is None
+                break
+    except Exception as e:
+        _record_stream(scheduler, kwargs["model"], start, first_token, final_usage, tokens, error=str(e))
+        raise
+    finally:
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+    if aborted:
+        text = _drop_partial_line(text)
+    _record_stream(scheduler, kwargs["model"], start, first_token, final_usage, tokens)
+    return strip_reasoning(text), tokens, aborted
+
+
+def _record_stream(scheduler, model, start, first_token=None, usage=None, tokens=None, error=None) -> None:
+    call = getattr(scheduler, "last_call", None) or {"retries": 0, "wait_sec": 0.0}
+    waited = call["wait_sec"]
+    queue_wait = (current_context().get("queue_wait_sec") or 0) + waited + (getattr(usage, "queue_time", None) or 0)
+    fields = {"tokens_out": tokens, **groq_usage_fields(usage)}
+    emit(backend="groq", model=model, latency_sec=round(time.time() - start - waited, 3),
+         ttft_sec=round(first_token - waited, 3) if first_token is not None else None,
+         queue_wait_sec=round(queue_wait, 3), retries=call["retries"], cache_hit=False, error=error, **fields)
+
+
+def stream_ollama(client, policy: GenerationPolicy, model: str, prompt: str):
+    """Ollama counterpart of ``stream_groq`` built on ``OllamaClient.generate_stream``.
+
+    Returns ``(text, completion_tokens, aborted, load_sec)``.
+    """
+    result = client.generate_stream(model, prompt, should_stop=policy.should_stop, **policy.ollama_kwargs(model))
+    text = _drop_partial_line(result["response"]) if result["aborted"] else result["response"]
+    return strip_reasoning(text), result["eval_count"], result["aborted"], result["load_sec"]
+
+
+def _drop_partial_line(text: str) -> str:
+    """Cut a stream stopped mid-line back to its last complete line."""
+    return text[:text.rfind("\n") + 1] if "\n" in text else text
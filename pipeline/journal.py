@@ -0,0 +1,174 @@
+"""Append-only row journal for the result workbooks.
+
+The runners used to call ``df.to_excel`` after every processed row, which
+re-serializes the whole workbook N times over a run. Instead, each finished
+row is appended as one JSON line to a journal next to the output workbook.
+A background thread writes and fsyncs the lines, so a crash loses at most the
+row that was in flight. The journal is compacted into the xlsx deliverable at
+the end of the run, or on demand:
+
+    python -m pipeline.journal <base.xlsx> <output.xlsx> [journal.jsonl]
+"""
+
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
+
+import pandas as pd
+
+
+def journal_path_for(output_excel: str) -> str:
+    """Return the journal file that belongs to an output workbook."""
+    return os.path.splitext(output_excel)[0] + ".journal.jsonl"
+
+
+class RowJournal:
+    """Durable, append-only log of ``{"row": idx, "values": {...}}`` records."""
+
+    def __init__(self, path: str, reset: bool = False):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if reset and os.path.exists(path):
+            os.remove(path)
+
+        self._queue = queue.Queue()
+        self._closed = False
+        self._error = None
+        self._thread = threading.Thread(target=self._writer, name="row-journal", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def append(self, row, **values) -> None:
+        """Queue one row's column values for writing."""
+        if self._closed:
+            raise RuntimeError(f"❌ Journal {self.path} is already closed.")
+        if self._error is not None:
+            raise RuntimeError(f"❌ Journal writer failed: {self._error}")
+        self._queue.put({"row": _json_key(row), "values": values})
+
+    def flush(self) -> None:
+        """Block until every queued record is on disk."""
+        self._queue.join()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _writer(self) -> None:
+        torn = _ends_mid_line(self.path)
+        with open(self.path, "a", encoding="utf-8") as f:
+            if torn:
+                # Terminate a record torn by a crash so the next one starts cleanly
+                f.write("\n")
+            while True:
+                records = [self._queue.get()]
+                # Group-commit whatever else is already waiting: one fsync per batch.
+                while True:
+                    try:
+                        records.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                stop = None in records
+                try:
+                    for record in records:
+                        if record is not None:
+                            f.write(json.dumps(record, ensure_ascii=False, default=_json_default) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                except Exception as e:
+                    self._error = e
+                finally:
+                    for _ in records:
+                        self._queue.task_done()
+                if stop:
+                    return
+
+
+def read_journal(path: str) -> dict:
+    """Replay a journal into ``{row: {column: value}}``; later records win.
+
+    A torn last line (crash mid-write) is ignored.
+    """
+    rows = {}
+    if not os.path.exists(path):
+        return rows
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            rows.setdefault(record["row"], {}).update(record["values"])
+    return rows
+
+
+def apply_journal(df: pd.DataFrame, path: str) -> pd.DataFrame:
+    """Write the journaled values into ``df`` in place and return it."""
+    for row, values in read_journal(path).items():
+        if row not in df.index:
+            continue
+        for col, value in values.items():
+            if col not in df.columns:
+                df[col] = None
+            elif isinstance(value, str) and df[col].dtype != object:
+                df[col] = df[col].astype(object)  # an all-blank column reloads as float64
+            df.at[row, col] = value
+    return df
+
+
+def save_excel_atomic(df: pd.DataFrame, output_excel: str) -> None:
+    """Write ``df`` to a temporary workbook and rename it over the target."""
+    base, ext = os.path.splitext(output_excel)
+    tmp_path = f"{base}.tmp{ext}"
+    df.to_excel(tmp_path, index=False)
+    os.replace(tmp_path, output_excel)
+
+
+def compact(df: pd.DataFrame, journal_path: str, output_excel: str) -> pd.DataFrame:
+    """Fold the journal into ``df`` and write the xlsx deliverable."""
+    apply_journal(df, journal_path)
+    save_excel_atomic(df, output_excel)
+    return df
+
+
+def _ends_mid_line(path: str) -> bool:
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return False
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b"\n"
+
+
+def _json_key(row):
+    return row.item() if hasattr(row, "item") else row
+
+
+def _json_default(value):
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4):
+        print("Usage: python -m pipeline.journal <base.xlsx> <output.xlsx> [journal.jsonl]")
+        sys.exit(1)
+    base_excel, output_excel = sys.argv[1], sys.argv[2]
+    journal = sys.argv[3] if len(sys.argv) == 4 else journal_path_for(output_excel)
+    compact(pd.read_excel(base_excel), journal, output_excel)
+    print(f"📄 Compacted {journal} into {output_excel}")
@@ -0,0 +1,124 @@
+"""Structured, length-capped judge verdicts.
+
+Instead of free text ("Fix: YES / Extent: 80% / Why: ..." or "No: <reason>")
+the judge is constrained to a small JSON object: Ollama gets the JSON schema
+as its ``format`` and Groq runs in JSON mode. Both are capped at a handful of
+output tokens (plus room for the reasoning of models that cannot turn it
+off), and ``parse_verdict`` turns the answer into typed
+``fix`` / ``extent`` / ``reason`` values. The legacy free-text formats are
+still understood so old result workbooks can be parsed the same way.
+"""
+
+import json
+import re
+
+
+# Enough for {"fix": "PARTIAL", "extent": 100, "reason": "<one sentence>"}.
+JUDGE_MAX_TOKENS = 96
+
+# Groq counts the reasoning of these model families against max_tokens and
+# they cannot turn it off; room for a low-effort trace before the verdict.
+REASONING_HEADROOM = {
+    "gpt-oss": 1024,
+}
+
+# Hard cap on the stored reason, in characters.
+MAX_REASON_CHARS = 200
+
+FIX_VALUES = ("YES", "NO", "PARTIAL")
+
+
+def verdict_schema(fix_values=FIX_VALUES, with_extent: bool = True) -> dict:
+    """JSON schema for one verdict object."""
+    properties = {"fix": {"type": "string", "enum": list(fix_values)}}
+    if with_extent:
+        properties["extent"] = {"type": "integer", "minimum": 0, "maximum": 100}
+    properties["reason"] = {"type": "string", "maxLength": MAX_REASON_CHARS}
+    return {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+
+
+def answer_instructions(fix_values=FIX_VALUES, with_extent: bool = True) -> str:
+    """Prompt tail asking for the verdict JSON (Groq JSON mode needs the word JSON)."""
+    fields = ['"fix": ' + " | ".join(f'"{v}"' for v in fix_values)]
+    if with_extent:
+        fields.append('"extent": <integer 0-100>')
+    fields.append('"reason": "<one short sentence>"')
+    return "Answer with ONLY this JSON object and nothing else:\n{" + ", ".join(fields) + "}"
+
+
+def ollama_request(fix_values=FIX_VALUES, with_extent: bool = True) -> dict:
+    """Extra ``/api/generate`` fields for a schema-constrained, capped verdict."""
+    return {
+        "format": verdict_schema(fix_values, with_extent),
+        "options": {"num_predict": JUDGE_MAX_TOKENS, "temperature": 0},
+    }
+
+
+def judge_max_tokens(model: str = "") -> int:
+    """Output cap for one verdict from ``model``, reasoning included."""
+    for family, headroom in REASONING_HEADROOM.items():
+        if family in model.lower():
+            return JUDGE_MAX_TOKENS + headroom
+    return JUDGE_MAX_TOKENS
+
+
+def groq_request(model: str = "") -> dict:
+    """Extra ``chat.completions.create`` arguments for a JSON-mode, capped verdict."""
+    return {"response_format": {"type": "json_object"}, "max_tokens": judge_max_tokens(model)}
+
+
+def parse_verdict(text) -> dict:
+    """Parse a judge answer into ``{"fix": str|None, "extent": int|None, "reason": str}``.
+
+    Accepts the JSON verdict as well as the legacy free-text formats.
+    """
+    verdict = {"fix": None, "extent": None, "reason": ""}
+    if not isinstance(text, str) or not text.strip() or text.lstrip().startswith("[ERROR]"):
+        return verdict
+
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    if match:
+        try:
+            data = json.loads(match.group(0))
+        except json.JSONDecodeError:
+            data = None
+        if isinstance(data, dict):
+            verdict["fix"] = _normalize_fix(data.get("fix"))
+            verdict["extent"] = _to_extent(data.get("extent"))
+            verdict["reason"] = str(data.get("reason", ""))[:MAX_REASON_CHARS]
+            return verdict
+
+    # Legacy evaluation.py format: "- Fix: YES", "- Extent: 80%", "- Why: ..."
+    fix = re.search(r"Fix\s*:\s*\**\s*(YES|NO|PARTIAL)", text, re.IGNORECASE)
+    if fix:
+        verdict["fix"] = fix.group(1).upper()
+        extent = re.search(r"Extent\s*:\s*\**\s*(\d{1,3})", text, re.IGNORECASE)
+        verdict["extent"] = _to_extent(extent.group(1)) if extent else None
+        why = re.search(r"Why\s*:\s*\**\s*(.+)", text, re.IGNORECASE)
+        verdict["reason"] = why.group(1).strip()[:MAX_REASON_CHARS] if why else ""
+        return verdict
+
+    # Legacy Judge.py format: "Yes" or "No: <reason>"
+    yes_no = re.match(r"\s*\**\s*(Yes|No)\b\W*(.*)", text, re.IGNORECASE | re.DOTALL)
+    if yes_no:
+        verdict["fix"] = yes_no.group(1).upper()
+        verdict["reason"] = yes_no.group(2).strip()[:MAX_REASON_CHARS]
+    return verdict
+
+
+def verdict_columns(prefix: str, text) -> dict:
+    """Typed ``<prefix>_fix`` / ``<prefix>_extent`` / ``<prefix>_reason`` cells for a verdict."""
+    verdict = parse_verdict(text)
+    return {f"{prefix}_{key}": value for key, value in verdict.items()}
+
+
+def _normalize_fix(value):
+    value = str(value or "").strip().upper()
+    return value if value in FIX_VALUES else None
+
+
+def _to_extent(value):
+    try:
+        return max(0, min(100, int(float(str(value).rstrip("%")))))
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,236 @@
+"""Latency and throughput report over the historical timing logs.
+
+Two kinds of logs hold per-row durations:
+
+- ``<misuse>/model_timings*.txt`` from the per-misuse runners, one
+  ``Row: N, Repo: ..., File: ..., Duration: X sec[, Load: Y sec | , Tokens: N]``
+  entry per row;
+- ``ScalableRefactoring/refactored_results_*.xlsx`` with a ``Row_Duration_sec``
+  column.
+
+``load_timings`` brings both into one table (source, model, misuse, row,
+duration, model load, output tokens, snippet size, error flag). Snippet sizes
+come from the code each row sent: the dataset's ``Code snippet`` for the text
+logs, ``Cleaned Code`` for the workbooks. ``report`` then gives, per model and
+misuse, the p50/p95/p99 latency and total compute time, and fits latency
+against snippet tokens (seconds per 1k tokens, intercept, r²):
+
+    python -m pipeline.latency_report --output latency_report.xlsx
+
+Rows answered with ``[ERROR]`` fail fast and would flatter a model, so they
+are counted but left out of the latency figures. Workbook rows with no
+answer were never sent and are skipped.
+"""
+
+import argparse
+import glob
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from pipeline.cache import REPO_ROOT
+from pipeline.excel_stream import read_columns
+from pipeline.matrix import DATASETS, GROQ_MODELS, output_paths
+from pipeline.row_index import RowIndex
+from pipeline.token_budget import count_tokens
+
+
+_TIMING_ENTRY = re.compile(
+    r"^Row: (?P<row>\d+), Repo: (?P<repo>.*?), File: (?P<file>.*?), Duration: (?P<duration>[\d.]+) sec"
+    r"(?:, Load: (?P<load>[\d.]+) sec)?(?:, Tokens: (?P<tokens>\d+))?\s*$",
+    re.M,
+)
+_TIMING_FILE = re.compile(r"^model_timings(?P<ollama>1)?_(?P<tag>.+)\.txt$")
+
+COLUMNS = ["source", "backend", "model", "misuse", "row", "duration_sec", "load_sec", "output_tokens",
+           "snippet_chars", "snippet_tokens", "error"]
+
+
+def normalize_misuse(misuse) -> str:
+    return " ".join(str(misuse).split()).lower()
+
+
+def model_from_timing_file(folder: str, name: str):
+    """``(backend, model)`` of a ``model_timings*.txt`` file, undoing ``matrix.output_paths``."""
+    match = _TIMING_FILE.match(name)
+    if not match:
+        return None
+    tag = match.group("tag")
+    if match.group("ollama"):
+        dataset = DATASETS.get(folder)
+        tags = {v: k for k, v in dataset.model_tags.items()} if dataset else {}
+        return "ollama", tags.get(tag, tag)
+    return "groq", _groq_model(tag)
+
+
+def _groq_model(tag: str) -> str:
+    if tag == "deepseek":
+        return "deepseek-r1-distill-llama-70b"
+    for model in GROQ_MODELS:
+        if re.sub(r"[^\w.-]+", "_", model) == tag:
+            return model
+    return tag
+
+
+def read_timing_file(path: str) -> pd.DataFrame:
+    """Entries of one timing log; a row timed more than once keeps its last entry."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    entries = {}
+    for match in _TIMING_ENTRY.finditer(text):
+        entries[int(match.group("row"))] = {
+            "row": int(match.group("row")),
+            "duration_sec": float(match.group("duration")),
+            "load_sec": float(match.group("load")) if match.group("load") else None,
+            "output_tokens": int(match.group("tokens")) if match.group("tokens") else None,
+        }
+    return pd.DataFrame(list(entries.values()), columns=["row", "duration_sec", "load_sec", "output_tokens"])
+
+
+def load_text_timings(root: str = REPO_ROOT) -> pd.DataFrame:
+    frames = []
+    for path in sorted(glob.glob(os.path.join(root, "*", "model_timings*.txt"))):
+        folder = os.path.basename(os.path.dirname(path))
+        parsed = model_from_timing_file(folder, os.path.basename(path))
+        if folder not in DATASETS or parsed is None:
+            continue
+        backend, model = parsed
+        frame = read_timing_file(path)
+        if frame.empty:
+            continue
+
+        dataset = DATASETS[folder]
+        snippets = read_columns(os.path.join(root, folder, dataset.instances), ["Misuse", "Code snippet"])
+        positions = frame["row"] - 1
+        in_range = positions < len(snippets)
+        codes = snippets["Code snippet"].reindex(positions).tolist()
+        frame["misuse"] = [normalize_misuse(m) for m in snippets["Misuse"].reindex(positions).fillna(folder)]
+        frame["snippet_chars"] = [len(c) if isinstance(c, str) else None for c in codes]
+        frame["snippet_tokens"] = [count_tokens(c) if isinstance(c, str) else None for c in codes]
+        frame.loc[~in_range.values, ["snippet_chars", "snippet_tokens"]] = None
+
+        output_file = os.path.join(root, folder, os.path.basename(output_paths(dataset, backend, model)[0]))
+        frame["error"] = _error_rows(output_file, frame["row"])
+        frame["source"] = os.path.relpath(path, root)
+        frame["backend"], frame["model"] = backend, model
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)[COLUMNS] if frames else pd.DataFrame(columns=COLUMNS)
+
+
+def _error_rows(output_file: str, rows) -> list:
+    if not os.path.exists(output_file):
+        return [False] * len(rows)
+    with RowIndex(output_file) as index:
+        return [bool(index.get(row) and index.get(row).is_error) for row in rows]
+
+
+def load_workbook_timings(root: str = REPO_ROOT) -> pd.DataFrame:
+    frames = []
+    for path in sorted(glob.glob(os.path.join(root, "ScalableRefactoring", "refactored_results_*.xlsx"))):
+        df = read_columns(path)
+        if "Row_Duration_sec" not in df.columns or df.empty:
+            continue
+        df["row"] = np.arange(1, len(df) + 1)
+        if "Refactored_Code" in df.columns:
+            df = df[df["Refactored_Code"].notna()]  # never sent: no answer and a 0 sec duration
+        misuse = str(df["Misuse"].iloc[0]).strip()
+        stem = os.path.splitext(os.path.basename(path))[0][len("refactored_results_"):]
+        stem = stem[len("final_changed_prompt_"):] if stem.startswith("final_changed_prompt_") else stem
+        tag = stem[:-len(misuse) - 1] if stem.endswith("_" + misuse) else stem
+        model = _groq_model(tag)
+        codes = df["Cleaned Code"] if "Cleaned Code" in df.columns else df["Code snippet"]
+        answers = df["Refactored_Code"] if "Refactored_Code" in df.columns else [""] * len(df)
+
+        frames.append(pd.DataFrame({
+            "source": os.path.relpath(path, root),
+            "backend": "groq" if model in GROQ_MODELS else "ollama",
+            "model": model,
+            "misuse": [normalize_misuse(m) for m in df["Misuse"]],
+            "row": df["row"].to_numpy(),
+            "duration_sec": pd.to_numeric(df["Row_Duration_sec"], errors="coerce"),
+            "load_sec": None,
+            "output_tokens": None,
+            "snippet_chars": [len(c) if isinstance(c, str) else None for c in codes],
+            "snippet_tokens": [count_tokens(c) if isinstance(c, str) else None for c in codes],
+            "error": [str(a).lstrip().startswith("[ERROR]") for a in answers],
+        }))
+    return pd.concat(frames, ignore_index=True)[COLUMNS] if frames else pd.DataFrame(columns=COLUMNS)
+
+
+def load_timings(root: str = REPO_ROOT) -> pd.DataFrame:
+    """Every timed row of the text logs and result workbooks, in one table."""
+    frames = [frame for frame in (load_text_timings(root), load_workbook_timings(root)) if not frame.empty]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=COLUMNS)
+
+
+def fit_latency(frame: pd.DataFrame) -> dict:
+    """Least-squares ``duration = intercept + slope * snippet_tokens``; slope per 1k tokens."""
+    points = frame.dropna(subset=["duration_sec", "snippet_tokens"])
+    if len(points) < 3 or points["snippet_tokens"].nunique() < 2:
+        return {"sec_per_1k_tokens": None, "intercept_sec": None, "r2": None}
+    x = points["snippet_tokens"].astype(float).to_numpy()
+    y = points["duration_sec"].astype(float).to_numpy()
+    slope, intercept = np.polyfit(x, y, 1)
+    residual = y - (intercept + slope * x)
+    total = ((y - y.mean()) ** 2).sum()
+    r2 = 1 - (residual ** 2).sum() / total if total else None
+    return {"sec_per_1k_tokens": round(slope * 1000, 3), "intercept_sec": round(intercept, 2),
+            "r2": round(r2, 3) if r2 is not None else None}
+
+
+def report(timings: pd.DataFrame, by=("model", "misuse")) -> pd.DataFrame:
+    """Per-group rows, errors, p50/p95/p99 latency, total compute and the size regression."""
+    rows = []
+    for key, group in timings.groupby(list(by), dropna=False):
+        ok = group[~group["error"].astype(bool)].dropna(subset=["duration_sec"])
+        durations = ok["duration_sec"].astype(float).to_numpy()
+        percentiles = np.percentile(durations, [50, 95, 99]) if len(durations) else [None] * 3
+        key = key if isinstance(key, tuple) else (key,)
+        rows.append({
+            **dict(zip(by, key)),
+            "rows": len(group),
+            "errors": int(group["error"].astype(bool).sum()),
+            "p50_sec": _round(percentiles[0]),
+            "p95_sec": _round(percentiles[1]),
+            "p99_sec": _round(percentiles[2]),
+            "mean_sec": _round(durations.mean() if len(durations) else None),
+            "total_compute_h": round(group["duration_sec"].astype(float).sum() / 3600, 3),
+            "mean_snippet_tokens": _round(ok["snippet_tokens"].astype(float).mean()),
+            **fit_latency(ok),
+        })
+    return pd.DataFrame(rows).sort_values(list(by)).reset_index(drop=True)
+
+
+def _round(value, digits: int = 2):
+    return None if value is None or pd.isna(value) else round(float(value), digits)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency percentiles and size regressions over the timing logs.")
+    parser.add_argument("--output", default=os.path.join(REPO_ROOT, "latency_report.xlsx"),
+                        help="workbook with the rows, per model/misuse and per model sheets")
+    args = parser.parse_args()
+
+    timings = load_timings()
+    if timings.empty:
+        print("❌ No timing logs found")
+        return
+    by_misuse = report(timings, ("model", "misuse"))
+    by_model = report(timings, ("model",)).sort_values("p50_sec").reset_index(drop=True)
+
+    with pd.ExcelWriter(args.output) as writer:
+        by_model.to_excel(writer, sheet_name="by_model", index=False)
+        by_misuse.to_excel(writer, sheet_name="by_model_misuse", index=False)
+        timings.to_excel(writer, sheet_name="rows", index=False)
+
+    with pd.option_context("display.max_columns", None, "display.width", 200):
+        print(by_model.to_string(index=False))
+    print(f"\n📊 {len(timings)} timed rows from {timings['source'].nunique()} logs, "
+          f"{timings['duration_sec'].sum() / 3600:.1f} h of compute")
+    print(f"📄 Report saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
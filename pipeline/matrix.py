@@ -0,0 +1,379 @@
+"""One engine for the (misuse × model) refactoring matrix.
+
+Each misuse folder used to carry a copy-pasted Ollama script and a Groq
+script that read its own ``instances_*.xlsx`` and ran serially. ``run_matrix``
+takes a set of datasets and a set of models, streams the rows of every
+(dataset, model) pair into one shared thread pool, and caps the calls in
+flight per backend, so a full matrix keeps the local Ollama server and the
+Groq quota busy at the same time:
+
+    run_matrix(["batch_api", "data_drift"], ["codellama", "deepseek-r1-distill-llama-70b"])
+
+    python -m pipeline.matrix --misuses batch_api data_drift --models codellama deepseek-r1-distill-llama-70b
+
+Datasets of the same backend take turns, so no dataset waits for another to
+finish; Ollama models run one after the other, so the server never swaps
+models between rows, while Groq models each pace against their own quota.
+Every pair still writes the legacy ``### Row:`` output and timing
+files in its folder, in input row order, under the names the old scripts used.
+A rerun continues from those files: finished rows are skipped, errored or
+missing ones run again, and duplicate blocks are compacted away.
+"""
+
+import argparse
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+
+from pipeline.cache import REPO_ROOT
+from pipeline.engine import RunStats
+from pipeline.excel_stream import iter_rows, count_rows
+from pipeline.generation_policy import GenerationPolicy, stream_groq
+from pipeline.refactoring_prompts import GROQ_PROMPTS, PROMPTS
+from pipeline.resume import finish, prepare
+from pipeline.telemetry import context
+from pipeline.token_budget import expected_output_tokens, plan, run_num_ctx
+
+
+# Calls in flight per backend; the pool is as large as their sum.
+BACKEND_CONCURRENCY = {"ollama": 2, "groq": 4}
+
+# Models served by Groq; any other name goes to Ollama unless prefixed "groq:".
+GROQ_MODELS = {
+    "deepseek-r1-distill-llama-70b",
+    "llama-3.3-70b-versatile",
+    "llama-3.1-8b-instant",
+    "openai/gpt-oss-120b",
+    "openai/gpt-oss-20b",
+    "qwen/qwen3-32b",
+}
+
+# Groq quota per model; the scheduler paces every thread against it
+GROQ_REQUESTS_PER_MINUTE = 60
+GROQ_TOKENS_PER_MINUTE = 6000
+GROQ_MAX_REQUEST_TOKENS = None  # largest single request of the account tier (e.g. 6000 on the free tier); None: context window only
+GROQ_MAX_OUTPUT_TOKENS = 4096
+
+
+@dataclass
+class Dataset:
+    folder: str
+    instances: str
+    output_stem: str = "refactored_code_outputs"
+    model_tags: dict = field(default_factory=dict)  # Ollama model -> tag used in the file names
+
+    def prompt_template(self, backend: str) -> str:
+        """The prompt the old script of ``backend`` used for this dataset."""
+        return (GROQ_PROMPTS if backend == "groq" else PROMPTS)[self.folder]
+
+
+DATASETS = {
+    "batch_api": Dataset("batch_api", "instances_batch_api.xlsx"),
+    "data_drift": Dataset("data_drift", "instances_data_drift.xlsx",
+                          output_stem="refactored_code_data_drift_outputs"),
+    "early_stopping": Dataset("early_stopping", "instances_early_stopping.xlsx"),
+    "improper_ml_api_limit": Dataset("improper_ml_api_limit", "instances_Improper_handling_ML_API_limits.xlsx"),
+    "misinterpreting_output": Dataset("misinterpreting_output", "instances_Misinterpreting_output.xlsx",
+                                      model_tags={"llama3": "codellama3"}),
+    "schema_mismatch": Dataset("schema_mismatch", "instances_schema_mismatch.xlsx",
+                               output_stem="refactored_code_schema_mismatch_outputs"),
+    "training_checkpoint": Dataset("training_checkpoint", "instances_training_checkpoint.xlsx"),
+}
+
+
+def resolve_model(name: str):
+    """``(backend, model)`` for ``name``; ``ollama:``/``groq:`` prefixes force the backend."""
+    backend, _, model = name.partition(":")
+    if backend in BACKEND_CONCURRENCY and model:
+        return backend, model
+    return ("groq" if name in GROQ_MODELS else "ollama"), name
+
+
+def output_paths(dataset: Dataset, backend: str, model: str):
+    """``(output_file, timing_file)`` of a (dataset, model) pair, as the old scripts named them."""
+    folder = os.path.join(REPO_ROOT, dataset.folder)
+    if backend == "groq":
+        tag = "deepseek" if model.startswith("deepseek") else re.sub(r"[^\w.-]+", "_", model)
+        return (os.path.join(folder, f"refactored_code_outputs_{tag}.txt"),
+                os.path.join(folder, f"model_timings_{tag}.txt"))
+    tag = dataset.model_tags.get(model, re.sub(r"[^\w.-]+", "-", model))
+    return (os.path.join(folder, f"{dataset.output_stem}1_{tag}.txt"),
+            os.path.join(folder, f"model_timings1_{tag}.txt"))
+
+
+@dataclass
+class Job:
+    """One (dataset, model) pair: its row stream and its in-order output writer."""
+
+    dataset: Dataset
+    backend: str
+    model: str
+    rows: object = None
+    total_rows: int = 0
+    next_row: int = 0
+    done: dict = field(default_factory=dict)  # finished rows waiting for earlier ones
+    cumulative_time: float = 0.0
+    exhausted: bool = False
+    skip: set = field(default_factory=set)  # 0-based rows already done by an earlier run
+
+    @property
+    def name(self) -> str:
+        return f"{self.dataset.folder} × {self.model}"
+
+    @property
+    def paths(self):
+        return output_paths(self.dataset, self.backend, self.model)
+
+    def open(self, resume: bool = True) -> None:
+        path = os.path.join(REPO_ROOT, self.dataset.folder, self.dataset.instances)
+        self.total_rows = count_rows(path)
+        self.rows = iter_rows(path, columns=["Repository", "File", "Code snippet"])
+        if resume:
+            # Continue from the first missing or errored row of an earlier run
+            done, self.cumulative_time = prepare(*self.paths)
+            self.skip = {row - 1 for row in done}
+            if self.skip:
+                print(f"⏩ {self.name}: {len(self.skip)}/{self.total_rows} rows already done")
+
+    def prompts(self):
+        """``(code, prompt)`` of every row this job will still run."""
+        path = os.path.join(REPO_ROOT, self.dataset.folder, self.dataset.instances)
+        template = self.dataset.prompt_template(self.backend)
+        for idx, row in iter_rows(path, columns=["Code snippet"]):
+            if idx not in self.skip:
+                yield row["Code snippet"], template.format(code_snippet=row["Code snippet"])
+
+    def pull(self):
+        """Next ``(idx, row)`` still to run, or ``None`` once the workbook is exhausted."""
+        item = next(self.rows, None)
+        while item is not None and item[0] in self.skip:
+            item = next(self.rows, None)
+        if item is None:
+            self.exhausted = True
+        return item
+
+    def write(self, idx: int, row: dict, result: dict) -> None:
+        """Buffer ``result`` and flush every row that is now next in order."""
+        self.done[idx] = (row, result)
+        output_file, timing_file = self.paths
+        while self.next_row in self.skip or self.next_row in self.done:
+            if self.next_row in self.skip:
+                self.next_row += 1
+                continue
+            row, result = self.done.pop(self.next_row)
+            idx = self.next_row
+            repo, file = row["Repository"], row["File"]
+            with open(output_file, "a", encoding="utf-8") as f:
+                f.write(f"### Row: {idx+1}\n")
+                f.write(f"### Repository: {repo}\n")
+                f.write(f"### File: {file}\n")
+                if result.get("error") is not None:
+                    f.write(f"[ERROR] Could not process this row: {str(result['error'])}\n\n")
+                else:
+                    f.write(result["text"] + "\n\n")
+
+            self.cumulative_time = round(self.cumulative_time + result["duration"], 2)
+            suffix = (f", Load: {result.get('load_sec', 0.0)} sec" if self.backend == "ollama"
+                      else f", Tokens: {result.get('tokens', 0)}")
+            with open(timing_file, "a", encoding="utf-8") as f:
+                f.write(f"Row: {idx+1}, Repo: {repo}, File: {file}, Duration: {result['duration']} sec{suffix}\n")
+                f.write(f"  → Cumulative Time: {self.cumulative_time} sec\n\n")
+            self.next_row += 1
+
+
+class Backends:
+    """Clients shared by every job of a run, created only for the backends in use."""
+
+    def __init__(self, backends, limits: dict):
+        self.ollama = None
+        self.groq = None
+        self.schedulers = {}
+        self.num_ctx = {}  # Ollama model -> one context size for all its rows
+        self.policy = GenerationPolicy(max_output_tokens=GROQ_MAX_OUTPUT_TOKENS)
+        if "ollama" in backends:
+            from pipeline.ollama_client import OllamaClient
+
+            self.ollama = OllamaClient(keep_alive="30m", pool_size=max(limits["ollama"], 1))
+        if "groq" in backends:
+            from dotenv import load_dotenv
+            from groq import Groq
+
+            load_dotenv()
+            groq_api_key = os.getenv("GROQ_API_KEY")
+            if not groq_api_key:
+                raise ValueError("❌ GROQ_API_KEY not found. Update your .env file with a valid key.")
+            self.groq = Groq(api_key=groq_api_key, max_retries=0)  # retries are owned by the scheduler
+
+    def scheduler(self, model: str):
+        from pipeline.rate_limit import GroqScheduler
+
+        if model not in self.schedulers:
+            self.schedulers[model] = GroqScheduler(self.groq, requests_per_minute=GROQ_REQUESTS_PER_MINUTE,
+                                                   tokens_per_minute=GROQ_TOKENS_PER_MINUTE)
+        return self.schedulers[model]
+
+    def refactor(self, job: Job, idx: int, row: dict, submitted: float) -> dict:
+        """Run one row; errors come back as ``{"error": e}`` so the job keeps going."""
+        start = time.time()
+        result = {}
+        tags = {"stage": "refactor", "misuse": job.dataset.folder, "row": idx + 1,
+                "queue_wait_sec": round(start - submitted, 3)}
+        try:
+            with context(**tags):
+                code = row["Code snippet"]
+                prompt = job.dataset.prompt_template(job.backend).format(code_snippet=code)
+                # Output sized to this prompt (the Ollama context is shared per model); a prompt that cannot fit is rejected unsent
+                budget = plan(job.model, prompt, expected_output_tokens("refactor", code),
+                              ceiling=self.policy.max_output_tokens,
+                              quota=GROQ_MAX_REQUEST_TOKENS if job.backend == "groq" else None)
+                if job.backend == "ollama":
+                    response = self.ollama.generate(job.model, prompt, options=budget.ollama_options(self.num_ctx.get(job.model)))
+                    result["load_sec"] = response["load_sec"]
+                    result["text"] = (response.get("response") or "").strip()
+                    if not result["text"]:
+                        raise ValueError(f"Empty response from {job.model}")
+                else:
+                    # Streamed; <think> traces are hidden/stripped before storage
+                    text, tokens, _ = stream_groq(
+                        self.scheduler(job.model).create, self.policy.for_budget(budget),
+                        model=job.model,
+                        messages=[{"role": "user", "content": prompt}],
+                        temperature=0
+                    )
+                    result["text"], result["tokens"] = text, tokens
+        except Exception as e:
+            result["error"] = e
+        result["duration"] = round(time.time() - start, 2)
+        return result
+
+
+def build_jobs(misuses, models) -> list:
+    unknown = [m for m in misuses if m not in DATASETS]
+    if unknown:
+        raise ValueError(f"❌ Unknown misuse datasets {unknown}; choose from {sorted(DATASETS)}")
+    jobs = []
+    for name in models:
+        backend, model = resolve_model(name)
+        for misuse in misuses:
+            jobs.append(Job(DATASETS[misuse], backend, model))
+    return jobs
+
+
+def run_matrix(misuses=None, models=("codellama",), concurrency: dict = None, resume: bool = True) -> dict:
+    """Refactor every row of ``misuses`` × ``models`` and return ``{backend: RunStats}``.
+
+    ``concurrency`` overrides ``BACKEND_CONCURRENCY`` per backend. With
+    ``resume`` rows already answered in the output files are skipped and
+    duplicate blocks are compacted away; without it every row runs again.
+    """
+    limits = {**BACKEND_CONCURRENCY, **(concurrency or {})}
+    jobs = build_jobs(list(misuses or DATASETS), list(models))
+    if any(limits[job.backend] < 1 for job in jobs):
+        raise ValueError(f"❌ concurrency must be >= 1 for every backend in use, got {limits}")
+
+    backends = Backends({job.backend for job in jobs}, limits)
+    for job in jobs:
+        job.open(resume)
+    for model in dict.fromkeys(job.model for job in jobs if job.backend == "groq"):
+        backends.scheduler(model)  # one quota per model, shared by its jobs
+    if backends.ollama is not None:
+        for model in dict.fromkeys(job.model for job in jobs if job.backend == "ollama"):
+            # Sized for its largest row up front: Ollama reloads the model whenever num_ctx changes
+            backends.num_ctx[model] = run_num_ctx(
+                model, ((prompt, expected_output_tokens("refactor", code))
+                        for job in jobs if job.model == model and job.backend == "ollama"
+                        for code, prompt in job.prompts()),
+                ceiling=backends.policy.max_output_tokens)
+            try:
+                backends.ollama.warm_up(model, num_ctx=backends.num_ctx[model])
+            except Exception as e:
+                print(f"⚠️ Could not preload {model}: {e}")  # its rows fail one by one as [ERROR]
+
+    # Jobs of one backend take turns, so every dataset advances at once. Ollama
+    # runs one model at a time so the server does not swap models between rows.
+    queues = {backend: deque() for backend in limits}
+    for job in jobs:
+        group = job.model if job.backend == "ollama" else None
+        groups = queues[job.backend]
+        if not groups or groups[-1][0] != group:
+            groups.append((group, deque()))
+        groups[-1][1].append(job)
+    in_flight = dict.fromkeys(limits, 0)
+    stats = {backend: RunStats() for backend in {job.backend for job in jobs}}
+    pool_size = sum(limits[backend] for backend in stats)
+    print(f"🧮 {len(jobs)} (misuse × model) jobs, {sum(job.total_rows for job in jobs)} rows, "
+          f"concurrency {', '.join(f'{b}={limits[b]}' for b in sorted(stats))}")
+
+    run_start = time.time()
+    pending = {}
+    with ThreadPoolExecutor(max_workers=pool_size) as pool:
+        def fill(backend):
+            groups = queues[backend]
+            while groups and in_flight[backend] < limits[backend]:
+                queue = groups[0][1]
+                if not queue:
+                    groups.popleft()
+                    continue
+                job = queue.popleft()
+                item = job.pull()
+                if item is None:
+                    continue
+                queue.append(job)
+                idx, row = item
+                pending[pool.submit(backends.refactor, job, idx, row, time.time())] = (job, idx, row)
+                in_flight[backend] += 1
+
+        for backend in stats:
+            fill(backend)
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                job, idx, row = pending.pop(future)
+                result = future.result()
+                in_flight[job.backend] -= 1
+                stats[job.backend].latencies.append(result["duration"])
+                if result.get("error") is not None:
+                    stats[job.backend].errors += 1
+                    print(f"❌ Error in {job.name} row {idx+1}: {str(result['error'])} (continuing...)")
+                else:
+                    print(f"✅ Processed {job.name} row {idx+1}/{job.total_rows}")
+                job.write(idx, row, result)
+                fill(job.backend)
+
+    wall_time = time.time() - run_start
+    for job in jobs:
+        if resume:
+            job.cumulative_time = finish(*job.paths)  # re-run rows were appended after later ones
+        print(f"⏱️ Final total time for '{job.name}': {job.cumulative_time} seconds "
+              f"(timings in {os.path.relpath(job.paths[1], REPO_ROOT)})")
+    for backend, backend_stats in sorted(stats.items()):
+        backend_stats.wall_time = wall_time
+        print(f"📊 {backend}: {backend_stats.summary()}")
+    if backends.ollama is not None:
+        print(f"🧊 Ollama latency: {backends.ollama.latency_summary()}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refactor the misuse datasets with a set of models.")
+    parser.add_argument("--misuses", nargs="+", default=list(DATASETS), choices=sorted(DATASETS),
+                        help="dataset folders (default: all seven)")
+    parser.add_argument("--models", nargs="+", required=True,
+                        help="Ollama or Groq models; prefix with ollama: or groq: to force the backend")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="run every row again instead of continuing from the output files")
+    for backend, limit in BACKEND_CONCURRENCY.items():
+        parser.add_argument(f"--{backend}-concurrency", type=int, default=limit,
+                            help=f"{backend} calls in flight (default {limit})")
+    args = parser.parse_args()
+
+    run_matrix(args.misuses, args.models,
+               {backend: getattr(args, f"{backend}_concurrency") for backend in BACKEND_CONCURRENCY},
+               resume=not args.no_resume)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+"""Local stand-in for the Groq chat-completions and Ollama generate APIs.
+
+One server answers both protocols, so every runner can be driven offline:
+
+- ``POST .../chat/completions`` (Groq / OpenAI), plain JSON or an SSE stream
+  with ``x_groq.usage`` on the last chunk. Requests over the per-minute
+  request/token budget get a 429 with ``retry-after`` and ``x-ratelimit-*``
+  headers shaped like Groq's, so ``pipeline.rate_limit`` can be exercised.
+- ``POST /api/generate`` (Ollama), plain JSON or NDJSON chunks, with the
+  ``eval_count``/``load_duration``/``eval_duration`` fields Ollama reports.
+  Calls without a prompt load or unload the model.
+
+Answers are shaped like the real ones: refactoring prompts get a
+"Refactored Code" block echoing the snippet plus a "Summary of Changes" list,
+judge prompts get a verdict (JSON when JSON output was requested). Latency
+before the first token, tokens per second, cold-start load time and random
+429 / 500 rates are configurable:
+
+    python -m pipeline.mock_server --port 8000 --rpm 10 --tpm 4000
+    python -m pipeline.mock_server --latency 0.5 --tokens-per-sec 80 --error-rate 0.05
+    GROQ_BASE_URL=http://127.0.0.1:8000 OLLAMA_HOST=127.0.0.1:8000 python ScalableRefactoring/refactoring_groq.py
+"""
+
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from pipeline.rate_limit import estimate_tokens
+
+
+class QuotaWindow:
+    """Sliding 60-second window of (timestamp, tokens) charges."""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.events = deque()
+        self.lock = threading.Lock()
+
+    def charge(self, tokens: int):
+        """Record a call and return ``(allowed, headers)``."""
+        with self.lock:
+            now = time.monotonic()
+            while self.events and now - self.events[0][0] >= 60:
+                self.events.popleft()
+            used_requests = len(self.events)
+            used_tokens = sum(t for _, t in self.events)
+            allowed = used_requests < self.rpm and used_tokens + tokens <= self.tpm
+            if allowed:
+                self.events.append((now, tokens))
+                used_requests += 1
+                used_tokens += tokens
+            reset = 60 - (now - self.events[0][0]) if self.events else 0.0
+            headers = {
+                "x-ratelimit-limit-requests": str(self.rpm),
+                "x-ratelimit-remaining-requests": str(max(0, self.rpm - used_requests)),
+                "x-ratelimit-reset-requests": f"{reset:.2f}s",
+                "x-ratelimit-limit-tokens": str(self.tpm),
+                "x-ratelimit-remaining-tokens": str(max(0, self.tpm - used_tokens)),
+                "x-ratelimit-reset-tokens": f"{reset:.2f}s",
+            }
+            if not allowed:
+                headers["retry-after"] = str(max(1, int(reset + 0.5)))
+            return allowed, headers
+
+
+@dataclass
+class Behavior:
+    """How the mock model behaves; every field maps to a command-line flag."""
+
+    latency: float = 0.0  # seconds before the first token
+    tokens_per_sec: float = 0.0  # generation speed; 0 answers at once
+    load_sec: float = 0.0  # Ollama cold start, paid once per (model, num_ctx) until it is unloaded
+    error_rate: float = 0.0  # extra random 429 probability (Groq)
+    server_error_rate: float = 0.0  # random 500 probability (both APIs)
+    reasoning_tokens: int = 0  # hidden reasoning of gpt-oss models, spent out of max_tokens before the answer
+    fail_requests: int = 0  # the first N prompts (warm-ups included) answer 500, for deterministic failures
+
+
+class ServerStats:
+    """Requests served and the intervals they were in flight, for the benchmarks."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.loads = 0  # Ollama model loads, counting reloads for a new num_ctx
+        self.intervals = []  # (start, end) in time.monotonic()
+        self.lock = threading.Lock()
+
+    def record(self, start: float, end: float, failed: bool) -> None:
+        with self.lock:
+            self.requests += 1
+            self.errors += failed
+            self.intervals.append((start, end))
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {"requests": self.requests, "errors": self.errors, "loads": self.loads,
+                    "intervals": list(self.intervals)}
+
+
+def busy_seconds(intervals, since: float = 0.0) -> float:
+    """Wall-clock time with at least one request in flight (overlaps counted once)."""
+    busy = 0.0
+    covered = since
+    for start, end in sorted(intervals):
+        start = max(start, covered)
+        if end > start:
+            busy += end - start
+            covered = end
+    return busy
+
+
+def mock_answer(prompt: str, json_mode: bool = False) -> str:
+    """A reply in the shape the runners parse, built from the prompt."""
+    if json_mode:
+        return json.dumps({"fix": "YES", "extent": 100, "reason": "mock verdict"})
+    if "Fix: YES / NO / PARTIAL" in prompt:
+        return "- Fix: YES\n- Extent: 100%\n- Why: mock verdict"
+    if "Refactored Code:" in prompt and "Code Snippet:" not in prompt and "Code snippet:" not in prompt:
+        return "Yes"
+    match = re.search(r"Code Snippet:\s*\n(.*?)\n\s*(?:Response Format:|Please structure|$)", prompt,
+                      re.DOTALL | re.IGNORECASE)
+    code = match.group(1).strip() if match else ""
+    return (f"Refactored Code:\n```python\n{code}\n```\n\nSummary of Changes:\n"
+            f"- mock refactoring ({estimate_tokens(prompt)} prompt tokens)\n\n"
+            "The rest of the code is unchanged.\nLet me know if you need further changes.\n")
+
+
+def _pieces(text: str, max_tokens: int = None):
+    """Split ``text`` into stream deltas (about one token each), capped at ``max_tokens``."""
+    pieces = re.findall(r"\S+\s*|\s+", text)
+    return pieces[:max_tokens] if max_tokens else pieces
+
+
+def make_handler(quota: QuotaWindow, error_rate: float = 0.0, behavior: Behavior = None, stats: ServerStats = None):
+    behavior = behavior or Behavior(error_rate=error_rate)
+    loaded = {}  # model -> num_ctx it was loaded with; Ollama reloads when a request asks for another
+    loaded_lock = threading.Lock()
+    prompts_seen = itertools.count()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body: dict, headers: dict) -> None:
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(payload)
+            self.status = status
+
+        def _start_stream(self, content_type: str, headers: dict) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Connection", "close")
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.status = 200
+
+        def _generate(self, pieces, on_piece) -> float:
+            """Pace ``pieces`` at the configured speed; return the generation time."""
+            time.sleep(behavior.latency)
+            start = time.monotonic()
+            for i, piece in enumerate(pieces, 1):
+                if behavior.tokens_per_sec:
+                    delay = start + i / behavior.tokens_per_sec - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                if on_piece is not None:
+                    on_piece(piece)
+            return time.monotonic() - start
+
+        def do_POST(self):
+            start = time.monotonic()
+            self.status = 200
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path.endswith("/chat/completions"):
+                    self._chat(body)
+                elif self.path.rstrip("/").endswith("/api/generate"):
+                    self._ollama(body)
+                else:
+                    self._send(404, {"error": {"message": f"unknown path {self.path}"}}, {})
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the client stopped reading (early stop on a streamed answer)
+            finally:
+                if stats is not None:
+                    stats.record(start, time.monotonic(), self.status >= 400)
+
+        # === Groq / OpenAI chat completions ===
+        def _chat(self, body: dict) -> None:
+            prompt = "".join(str(m.get("content", "")) for m in body.get("messages", []))
+            prompt_tokens = estimate_tokens(prompt)
+            allowed, headers = quota.charge(prompt_tokens)
+            if not allowed or random.random() < behavior.error_rate:
+                headers.setdefault("retry-after", "1")
+                self._send(429, {"error": {"message": "Rate limit reached", "type": "tokens",
+                                           "code": "rate_limit_exceeded"}}, headers)
+                return
+            if random.random() < behavior.server_error_rate or next(prompts_seen) < behavior.fail_requests:
+                self._send(500, {"error": {"message": "mock internal error", "type": "internal_server_error"}}, headers)
+                return
+
+            json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+            model = body.get("model", "mock")
+            max_tokens = body.get("max_tokens")
+            reasoning = behavior.reasoning_tokens if "gpt-oss" in model else 0
+            if max_tokens and reasoning:
+                reasoning = min(reasoning, max_tokens)
+                pieces = _pieces(mock_answer(prompt, json_mode))[:max_tokens - reasoning]
+            else:
+                pieces = _pieces(mock_answer(prompt, json_mode), max_tokens)
+            response_id = f"chatcmpl-mock-{time.time_ns()}"
+            created = int(time.time())
+
+            if not body.get("stream"):
+                generation = self._generate(pieces, None)
+                content = "".join(pieces)
+                self._send(200, {
+                    "id": response_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}],
+                    "usage": {**self._usage(prompt_tokens, reasoning + len(pieces), generation), "queue_time": 0.0},
+                }, headers)
+                return
+
+            self._start_stream("text/event-stream", headers)
+
+            def chunk(delta: dict, finish_reason=None, **extra) -> None:
+                payload = {"id": response_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                           "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}], **extra}
+                self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            chunk({"role": "assistant", "content": ""})
+            generation = self._generate(pieces, lambda piece: chunk({"content": piece}))
+            chunk({}, "stop", x_groq={"id": response_id, "usage": self._usage(prompt_tokens, reasoning + len(pieces), generation)})
+            self.wfile.write(b"data: [DONE]\n\n")
+
+        @staticmethod
+        def _usage(prompt_tokens: int, completion_tokens: int, generation: float) -> dict:
+            return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                    "prompt_time": 0.0, "completion_time": round(generation, 4) or None}
+
+        # === Ollama /api/generate ===
+        def _ollama(self, body: dict) -> None:
+            model = body.get("model", "mock")
+            failing = "prompt" in body and next(prompts_seen) < behavior.fail_requests
+            if random.random() < behavior.server_error_rate or failing:
+                self._send(500, {"error": "mock internal error"}, {})
+                return
+
+            with loaded_lock:
+                if body.get("keep_alive") in (0, "0", "0s"):
+                    loaded.pop(model, None)
+                    self._send(200, {"model": model, "response": "", "done": True, "done_reason": "unload"}, {})
+                    return
+                num_ctx = (body.get("options") or {}).get("num_ctx")
+                cold = model not in loaded or loaded[model] != num_ctx
+                loaded[model] = num_ctx
+                if cold and stats is not None:
+                    with stats.lock:
+                        stats.loads += 1
+            load = behavior.load_sec if cold else 0.0
+            time.sleep(load)
+
+            if "prompt" not in body:
+                self._send(200, {"model": model, "response": "", "done": True, "done_reason": "load",
+                                 "load_duration": int(load * 1e9)}, {})
+                return
+
+            prompt = body.get("prompt", "")
+            options = body.get("options") or {}
+            pieces = _pieces(mock_answer(prompt, bool(body.get("format"))), options.get("num_predict"))
+
+            def final(generation: float) -> dict:
+                return {"model": model, "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                        "done": True, "done_reason": "stop",
+                        "total_duration": int((load + behavior.latency + generation) * 1e9),
+                        "load_duration": int(load * 1e9),
+                        "prompt_eval_count": estimate_tokens(prompt),
+                        "prompt_eval_duration": int(behavior.latency * 1e9),
+                        "eval_count": len(pieces), "eval_duration": int(generation * 1e9)}
+
+            if not body.get("stream", True):
+                generation = self._generate(pieces, None)
+                self._send(200, {**final(generation), "response": "".join(pieces)}, {})
+                return
+
+            self._start_stream("application/x-ndjson", {})
+
+            def line(payload: dict) -> None:
+                self.wfile.write((json.dumps(payload) + "\n").encode("utf-8"))
+                self.wfile.flush()
+
+            generation = self._generate(pieces, lambda piece: line({"model": model, "response": piece, "done": False}))
+            line({**final(generation), "response": ""})
+
+    return Handler
+
+
+def serve(port: int = 8000, rpm: int = 30, tpm: int = 6000, error_rate: float = 0.0,
+          behavior: Behavior = None) -> ThreadingHTTPServer:
+    """Start the server on a background thread and return it (call ``shutdown()`` to stop).
+
+    ``port=0`` picks a free port (``server.server_address[1]``); ``server.stats``
+    counts the requests served.
+    """
+    behavior = behavior or Behavior(error_rate=error_rate)
+    stats = ServerStats()
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(QuotaWindow(rpm, tpm), behavior=behavior,
+                                                                   stats=stats))
+    server.daemon_threads = True
+    server.stats = stats
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Groq/Ollama endpoint with quota, latency and error injection.")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--rpm", type=int, default=30, help="requests per minute before 429")
+    parser.add_argument("--tpm", type=int, default=6000, help="tokens per minute before 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="extra random 429 probability")
+    parser.add_argument("--server-error-rate", type=float, default=0.0, help="random 500 probability")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before the first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=0.0, help="generation speed (0: instant)")
+    parser.add_argument("--load-sec", type=float, default=0.0, help="Ollama model load time on a cold start")
+    parser.add_argument("--reasoning-tokens", type=int, default=0,
+                        help="hidden gpt-oss reasoning tokens counted against max_tokens")
+    parser.add_argument("--fail-requests", type=int, default=0, help="the first N prompts answer 500")
+    args = parser.parse_args()
+
+    behavior = Behavior(args.latency, args.tokens_per_sec, args.load_sec, args.error_rate, args.server_error_rate,
+                        args.reasoning_tokens, args.fail_requests)
+    server = serve(args.port, args.rpm, args.tpm, behavior=behavior)
+    print(f"🧪 Mock Groq/Ollama server on http://127.0.0.1:{args.port} (rpm={args.rpm}, tpm={args.tpm}, "
+          f"latency={args.latency}s, {args.tokens_per_sec or 'instant'} tok/s)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,267 @@
+"""MinHash/LSH index of code snippets, to refactor near-duplicates only once.
+
+Forks and copy-pasted notebooks make many ``Cleaned Code`` cells nearly
+identical. Each snippet is normalized (comments, string and number literals
+dropped, identifiers lower-cased), cut into shingles of ``SHINGLE_SIZE``
+tokens and summarized by a MinHash signature. Signatures are banded into an
+LSH table so candidate pairs are found without comparing every pair, and the
+estimated Jaccard similarity of each pair is reported.
+
+Signatures persist in SQLite under ``.llm_cache``, so the index grows
+incrementally: rows already indexed are not hashed again.
+
+    index = MinHashIndex()
+    index.add_many((key, code) for key, code in rows)
+    for cluster in index.clusters(keys, threshold=0.9):
+        print(cluster.representative, cluster.members)  # members: [(key, similarity), ...]
+
+Run ``python -m pipeline.near_dup`` to cluster the ``instances_*.xlsx`` and
+split files and write a report with the similarity scores.
+"""
+
+import argparse
+import glob
+import hashlib
+import os
+import re
+import sqlite3
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from pipeline.cache import REPO_ROOT
+
+
+DEFAULT_INDEX_PATH = os.path.join(REPO_ROOT, ".llm_cache", "near_dup.sqlite")
+NUM_PERM = 128
+BANDS = 32  # 32 bands x 4 rows: pairs above ~0.45 Jaccard are likely to collide
+SHINGLE_SIZE = 5
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_COMMENT = re.compile(r"#[^\n]*")
+_STRING = re.compile(r"('''|\"\"\")[\s\S]*?\1|'[^'\n]*'|\"[^\"\n]*\"")
+_TOKEN = re.compile(r"[A-Za-z_]\w*|\d+(?:\.\d+)?|[^\s\w]")
+
+
+def normalize_tokens(code) -> list:
+    """Tokens of ``code`` with comments and literal values removed."""
+    if not isinstance(code, str):
+        return []
+    code = _STRING.sub(" STR ", _COMMENT.sub("", code))
+    return ["NUM" if token[0].isdigit() else token.lower() for token in _TOKEN.findall(code)]
+
+
+def shingles(code, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """32-bit hashes of the distinct token ``size``-grams."""
+    tokens = normalize_tokens(code)
+    if len(tokens) < size:
+        grams = {" ".join(tokens)} if tokens else set()
+    else:
+        grams = {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=4).digest(), "little") for g in grams],
+        dtype=np.uint64,
+    )
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, _MAX_HASH, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, _MAX_HASH, size=num_perm, dtype=np.uint64)
+
+    def signature(self, code) -> np.ndarray:
+        hashes = shingles(code)
+        if hashes.size == 0:
+            return np.full(len(self.a), _MAX_HASH, dtype=np.uint64)
+        # (a * x + b) mod p in uint64; the rare wrap-around only permutes hash values
+        values = (np.outer(self.a, hashes) + self.b[:, None]) % _MERSENNE_PRIME
+        return (values & _MAX_HASH).min(axis=1)
+
+
+def similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.mean(sig_a == sig_b))
+
+
+@dataclass
+class Cluster:
+    representative: str
+    members: list = field(default_factory=list)  # [(key, similarity to the representative)]
+
+
+class MinHashIndex:
+    def __init__(self, path: str = DEFAULT_INDEX_PATH, num_perm: int = NUM_PERM, bands: int = BANDS):
+        if num_perm % bands:
+            raise ValueError("❌ num_perm must be a multiple of bands")
+        self.hasher = MinHasher(num_perm)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.signatures = {}
+        self.buckets = {}
+
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._db = sqlite3.connect(path, isolation_level=None)
+            self._db.execute("CREATE TABLE IF NOT EXISTS signatures (key TEXT PRIMARY KEY, digest TEXT, sig BLOB)")
+            for key, digest, blob in self._db.execute("SELECT key, digest, sig FROM signatures"):
+                self._insert(key, np.frombuffer(blob, dtype=np.uint64), digest)
+
+    def add(self, key: str, code) -> np.ndarray:
+        """Index ``code`` under ``key``; unchanged rows are not re-hashed."""
+        digest = hashlib.sha256(str(code).encode("utf-8")).hexdigest()
+        known = self.signatures.get(key)
+        if known is not None and known[1] == digest:
+            return known[0]
+        if known is not None:
+            self._remove(key)
+        sig = self.hasher.signature(code)
+        self._insert(key, sig, digest)
+        if self._db is not None:
+            self._db.execute("INSERT OR REPLACE INTO signatures VALUES (?, ?, ?)", (key, digest, sig.tobytes()))
+        return sig
+
+    def add_many(self, items) -> None:
+        if self._db is not None:
+            self._db.execute("BEGIN")
+        try:
+            for key, code in items:
+                self.add(key, code)
+        finally:
+            if self._db is not None:
+                self._db.execute("COMMIT")
+
+    def candidates(self, key: str) -> set:
+        """Keys sharing at least one LSH band with ``key``."""
+        sig = self.signatures[key][0]
+        found = set()
+        for band in self._bands(sig):
+            found |= self.buckets.get(band, set())
+        found.discard(key)
+        return found
+
+    def similar(self, key: str, threshold: float = 0.0) -> list:
+        """``[(other_key, similarity), ...]`` above ``threshold``, most similar first."""
+        sig = self.signatures[key][0]
+        scored = [(other, similarity(sig, self.signatures[other][0])) for other in self.candidates(key)]
+        return sorted([pair for pair in scored if pair[1] >= threshold], key=lambda pair: -pair[1])
+
+    def clusters(self, keys=None, threshold: float = 0.9) -> list:
+        """Group ``keys`` (all indexed keys by default) into near-duplicate clusters.
+
+        Keys are taken in ``keys`` order: a key not yet in a cluster becomes a
+        representative, and every later unclustered key at or above
+        ``threshold`` to that representative joins it. Members are compared
+        with their representative itself, never chained through another member.
+        """
+        keys = list(keys) if keys is not None else list(self.signatures)
+        order = {key: i for i, key in enumerate(keys)}
+        clustered = set()
+        clusters = []
+        for key in keys:
+            if key in clustered:
+                continue
+            members = sorted(((other, score) for other, score in self.similar(key, threshold)
+                              if other in order and order[other] > order[key] and other not in clustered),
+                             key=lambda pair: order[pair[0]])
+            if members:
+                clustered.add(key)
+                clustered.update(member for member, _ in members)
+                clusters.append(Cluster(key, members))
+        return clusters
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+
+    def _bands(self, sig):
+        return [(i, sig[i * self.rows:(i + 1) * self.rows].tobytes()) for i in range(self.bands)]
+
+    def _insert(self, key, sig, digest):
+        self.signatures[key] = (sig, digest)
+        for band in self._bands(sig):
+            self.buckets.setdefault(band, set()).add(key)
+
+    def _remove(self, key):
+        sig = self.signatures.pop(key)[0]
+        for band in self._bands(sig):
+            self.buckets.get(band, set()).discard(key)
+
+
+def misuse_key(misuse) -> str:
+    """Misuse name with case and spacing normalized, for grouping rows."""
+    return " ".join(str(misuse).split()).lower()
+
+
+def plan_representatives(codes, threshold: float, index: "MinHashIndex" = None, namespace: str = "",
+                         misuses=None) -> dict:
+    """Map each near-duplicate position in ``codes`` to ``(representative_position, similarity)``.
+
+    Positions not in the result are representatives (or unique) and must be
+    run; the others can reuse their representative's result. A refactoring
+    only fits the misuse it was written for, so with ``misuses`` (one per
+    code) rows are clustered within their own misuse only.
+    """
+    index = index or MinHashIndex(path=None)
+    keys = [f"{namespace}#{i}" for i in range(len(codes))]
+    index.add_many(zip(keys, codes))
+    position = {key: i for i, key in enumerate(keys)}
+    groups = {}
+    for key, misuse in zip(keys, misuses if misuses is not None else [""] * len(keys)):
+        groups.setdefault(misuse_key(misuse), []).append(key)
+    plan = {}
+    for group in groups.values():
+        for cluster in index.clusters(group, threshold):
+            for member, score in cluster.members:
+                plan[position[member]] = (position[cluster.representative], round(score, 3))
+    return plan
+
+
+def default_sources() -> list:
+    return sorted(glob.glob(os.path.join(REPO_ROOT, "*", "instances_*.xlsx"))) + \
+        sorted(glob.glob(os.path.join(REPO_ROOT, "preprocessing", "split_files", "*.xlsx")))
+
+
+def main():
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Cluster near-duplicate snippets with MinHash/LSH.")
+    parser.add_argument("files", nargs="*", help="workbooks to index (default: instances_*.xlsx and split files)")
+    parser.add_argument("--threshold", type=float, default=0.9, help="minimum estimated Jaccard similarity")
+    parser.add_argument("--output", default=os.path.join(REPO_ROOT, "preprocessing", "near_duplicates.xlsx"))
+    args = parser.parse_args()
+
+    index = MinHashIndex()
+    keys_by_misuse, details = {}, {}
+    for path in args.files or default_sources():
+        df = pd.read_excel(path)
+        column = "Cleaned Code" if "Cleaned Code" in df.columns else "Code snippet"
+        source = os.path.relpath(path, REPO_ROOT)
+        rows = [(f"{source}#{idx}", code) for idx, code in df[column].items()]
+        index.add_many(rows)
+        for idx, (key, _) in enumerate(rows):
+            # A refactoring is only reusable for the same misuse, so cluster per misuse
+            keys_by_misuse.setdefault(misuse_key(df.at[idx, "Misuse"]), []).append(key)
+            details[key] = (source, idx + 1, df.at[idx, "Repository"], df.at[idx, "File"], df.at[idx, "Misuse"])
+
+    clusters = [cluster for keys in keys_by_misuse.values() for cluster in index.clusters(keys, args.threshold)]
+    report = []
+    for number, cluster in enumerate(clusters, start=1):
+        for key, score in [(cluster.representative, 1.0)] + cluster.members:
+            source, row, repo, file, misuse = details[key]
+            report.append({"Cluster": number, "Representative": key == cluster.representative,
+                           "Similarity": round(score, 3), "Source": source, "Row": row,
+                           "Repository": repo, "File": file, "Misuse": misuse})
+    pd.DataFrame(report).to_excel(args.output, index=False)
+
+    duplicates = sum(len(c.members) for c in clusters)
+    print(f"🔁 {len(details)} snippets, {len(clusters)} near-duplicate clusters, "
+          f"{duplicates} rows could reuse a representative (threshold {args.threshold})")
+    print(f"📄 Report saved to {args.output}")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Pooled, keep-alive client for the local Ollama server.
+
+One ``requests.Session`` per client reuses TCP connections across rows, every
+call pins the model in memory with ``keep_alive``, and ``warm_up`` loads the
+model before the first timed row. Ollama reports ``load_duration`` on each
+response, so calls that paid a model load are tracked apart from warm calls:
+
+    client = OllamaClient()
+    client.warm_up(model_name)
+    text = client.generate(model_name, prompt)["response"]
+    print(client.latency_summary())
+
+The server address comes from ``OLLAMA_HOST`` (default ``localhost:11434``).
+"""
+
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from pipeline.telemetry import emit, ollama_fields
+
+
+# A response whose model load took longer than this counts as a cold start.
+COLD_START_THRESHOLD_SEC = 0.5
+
+
+def ollama_base_url(host: str = None) -> str:
+    host = host or os.getenv("OLLAMA_HOST") or "localhost:11434"
+    if not host.startswith(("http://", "https://")):
+        host = "http://" + host
+    return host.rstrip("/")
+
+
+class OllamaClient:
+    def __init__(self, host: str = None, keep_alive: str = "30m",
+                 connect_timeout: float = 5.0, read_timeout: float = 900.0, pool_size: int = 8):
+        self.base_url = ollama_base_url(host)
+        self.keep_alive = keep_alive
+        self.timeout = (connect_timeout, read_timeout)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.cold_latencies = []
+        self.warm_latencies = []
+        self.load_durations = []
+        self._lock = threading.Lock()
+
+    def generate(self, model: str, prompt: str, options: dict = None, **extra) -> dict:
+        """Call ``/api/generate`` without streaming and return the decoded JSON.
+
+        The result gains ``latency_sec`` (wall clock) and ``load_sec`` (model
+        load reported by Ollama) so callers can keep them apart.
+        """
+        payload = {"model": model, "prompt": prompt, "stream": False, "keep_alive": self.keep_alive}
+        if options:
+            payload["options"] = options
+        payload.update(extra)
+
+        start = time.time()
+        try:
+            response = self.session.post(f"{self.base_url}/api/generate", json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            result = response.json()
+        except Exception as e:
+            emit(backend="ollama", model=model, latency_sec=round(time.time() - start, 3), retries=0, cache_hit=False,
+                 error=str(e))
+            raise
+        latency = time.time() - start
+
+        load = result.get("load_duration", 0) / 1e9
+        result["latency_sec"] = round(latency, 2)
+        result["load_sec"] = round(load, 2)
+        with self._lock:
+            self.load_durations.append(load)
+            if load > COLD_START_THRESHOLD_SEC:
+                self.cold_latencies.append(latency)
+            else:
+                self.warm_latencies.append(latency)
+        # Without streaming, the first token is due once the model is loaded and the prompt evaluated
+        first_token = (result.get("load_duration", 0) + result.get("prompt_eval_duration", 0)) / 1e9
+        emit(backend="ollama", model=model, latency_sec=round(latency, 3), ttft_sec=round(first_token, 3), retries=0,
+             cache_hit=False, **ollama_fields(result))
+        return result
+
+    def generate_stream(self, model: str, prompt: str, should_stop=None, options: dict = None, **extra) -> dict:
+        """Stream ``/api/generate`` and stop as soon as ``should_stop(text, tokens)`` is true.
+
+        Returns the accumulated ``response`` with ``eval_count``, ``load_sec``,
+        ``latency_sec`` and ``aborted`` (True when generation was cut short).
+        """
+        payload = {"model": model, "prompt": prompt, "stream": True, "keep_alive": self.keep_alive}
+        if options:
+            payload["options"] = options
+        payload.update(extra)
+
+        start = time.time()
+        text = ""
+        tokens = 0
+        final = {}
+        aborted = False
+        connect = first_token = None
+        try:
+            with self.session.post(f"{self.base_url}/api/generate", json=payload,
+                                   timeout=self.timeout, stream=True) as response:
+                connect = response.elapsed.total_seconds()  # until the response headers arrived
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    delta = chunk.get("response", "")
+                    if delta and first_token is None:
+                        first_token = time.time() - start
+                    text += delta
+                    tokens += 1
+                    if chunk.get("done"):
+                        final = chunk
+                        break
+                    if should_stop is not None and "\n" in delta and should_stop(text, tokens):
+                        # Closing the connection makes Ollama stop generating
+                        aborted = True
+                        break
+        except Exception as e:
+            emit(backend="ollama", model=model, latency_sec=round(time.time() - start, 3),
+                 connect_sec=connect, retries=0, cache_hit=False, error=str(e))
+            raise
+        latency = time.time() - start
+
+        load = final.get("load_duration", 0) / 1e9
+        with self._lock:
+            self.load_durations.append(load)
+            (self.cold_latencies if load > COLD_START_THRESHOLD_SEC else self.warm_latencies).append(latency)
+        fields = {**ollama_fields(final), "tokens_out": final.get("eval_count", tokens)}
+        emit(backend="ollama", model=model, latency_sec=round(latency, 3), retries=0, cache_hit=False,
+             connect_sec=round(connect, 3) if connect is not None else None,
+             ttft_sec=round(first_token, 3) if first_token is not None else None, **fields)
+        return {"response": text, "eval_count": final.get("eval_count", tokens), "aborted": aborted,
+                "load_sec": round(load, 2), "latency_sec": round(latency, 2)}
+
+    def preload(self, model: str, num_ctx: int = None) -> float:
+        """Load ``model`` into memory and pin it; return the load time in seconds.
+
+        Pass the ``num_ctx`` the rows will use: a different context size makes
+        Ollama load the model again on the first row.
+        """
+        start = time.time()
+        payload = {"model": model, "keep_alive": self.keep_alive}
+        if num_ctx:
+            payload["options"] = {"num_ctx": num_ctx}
+        response = self.session.post(f"{self.base_url}/api/generate", json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return round(time.time() - start, 2)
+
+    def warm_up(self, model: str, num_ctx: int = None) -> float:
+        """Preload ``model`` and run a one-token generation so the first row is warm."""
+        load_time = self.preload(model, num_ctx)
+        options = {"num_predict": 1, **({"num_ctx": num_ctx} if num_ctx else {})}
+        self.session.post(
+            f"{self.base_url}/api/generate",
+            json={"model": model, "prompt": "ok", "stream": False,
+                  "keep_alive": self.keep_alive, "options": options},
+            timeout=self.timeout,
+        ).raise_for_status()
+        print(f"🔥 Warmed up '{model}' (load {load_time} sec)")
+        return load_time
+
+    def unload(self, model: str) -> None:
+        """Release ``model`` from memory right away."""
+        self.session.post(
+            f"{self.base_url}/api/generate",
+            json={"model": model, "keep_alive": 0},
+            timeout=self.timeout,
+        ).raise_for_status()
+
+    def latency_summary(self) -> str:
+        def avg(values):
+            return sum(values) / len(values) if values else 0.0
+
+        return (
+            f"{len(self.warm_latencies)} warm calls (avg {avg(self.warm_latencies):.2f} sec), "
+            f"{len(self.cold_latencies)} cold starts (avg {avg(self.cold_latencies):.2f} sec, "
+            f"model load total {sum(self.load_durations):.2f} sec)"
+        )
+
+    def close(self) -> None:
+        self.session.close()
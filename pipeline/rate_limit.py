@@ -0,0 +1,202 @@
+"""Rate-limit-aware scheduling for Groq chat completions.
+
+Groq enforces per-model requests-per-minute and tokens-per-minute quotas and
+reports the live state in ``x-ratelimit-*`` response headers. ``GroqScheduler``
+keeps one token bucket for requests and one for tokens, charges each call its
+estimated prompt tokens up front, re-syncs both buckets from the headers of
+every response, and retries 429 / 5xx / connection errors with jittered
+exponential backoff (honouring ``retry-after``). Share one scheduler per model
+between all threads of a run:
+
+    scheduler = GroqScheduler(groq, requests_per_minute=30, tokens_per_minute=6000)
+    response = scheduler.create(model=model_name, messages=[...], temperature=0)
+
+Build the client with ``max_retries=0`` so the SDK does not retry on its own.
+"""
+
+import random
+import re
+import threading
+import time
+
+import groq as groq_sdk
+
+from pipeline.telemetry import current_context, emit, groq_usage_fields
+from pipeline.token_budget import CHARS_PER_TOKEN, count_tokens
+
+# Output tokens charged up front when the call sets no max_tokens.
+DEFAULT_EXPECTED_OUTPUT_TOKENS = 1024
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap prompt-size estimate used to pace calls before they are sent."""
+    return len(text or "") // CHARS_PER_TOKEN + 1
+
+
+def parse_reset(value) -> float:
+    """Parse Groq reset durations such as ``"2m59.56s"``, ``"7.66s"`` or ``"150ms"``."""
+    if value is None:
+        return 0.0
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    seconds = 0.0
+    for amount, unit in re.findall(r"([\d.]+)(ms|h|m|s)", value):
+        seconds += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return seconds
+
+
+class TokenBucket:
+    """Thread-safe token bucket that refills continuously up to ``capacity``."""
+
+    def __init__(self, capacity: float, per_minute: float):
+        self.capacity = capacity
+        self.rate = per_minute / 60.0
+        self.level = capacity
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount: float) -> float:
+        """Block until ``amount`` is available, take it, and return the time waited."""
+        amount = min(amount, self.capacity)
+        start = time.monotonic()
+        with self._cond:
+            while True:
+                self._refill()
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.level >= amount:
+                    self.level -= amount
+                    return time.monotonic() - start
+                else:
+                    wait = (amount - self.level) / self.rate
+                self._cond.wait(timeout=wait)
+
+    def debit(self, amount: float) -> None:
+        """Charge (or refund, if negative) the difference to the real usage."""
+        with self._cond:
+            self._refill()
+            self.level = min(self.capacity, self.level - amount)
+            self._cond.notify_all()
+
+    def sync(self, limit=None, remaining=None, reset_seconds: float = 0.0) -> None:
+        """Align the bucket with the server's view from the rate-limit headers."""
+        with self._cond:
+            self._refill()
+            if limit:
+                self.capacity = float(limit)
+                self.rate = self.capacity / 60.0
+            if remaining is not None:
+                remaining = float(remaining)
+                self.level = min(self.level, remaining)
+                if remaining <= 0 and reset_seconds:
+                    self.pause(reset_seconds)
+            self._cond.notify_all()
+
+    def pause(self, seconds: float) -> None:
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class GroqScheduler:
+    """Paces ``chat.completions.create`` calls to stay right under the quota."""
+
+    RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, client, requests_per_minute: int = 30, tokens_per_minute: int = 6000,
+                 max_retries: int = 6, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.client = client
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        self.throttled = 0
+        self._local = threading.local()
+
+    @property
+    def last_call(self) -> dict:
+        """``{"retries", "wait_sec"}`` of this thread's latest ``create`` (for telemetry)."""
+        return getattr(self._local, "call", {"retries": 0, "wait_sec": 0.0})
+
+    def create(self, **kwargs):
+        """Drop-in for ``client.chat.completions.create`` with pacing and retries.
+
+        Non-streaming calls are recorded in the telemetry here; streamed ones
+        by ``stream_groq``, which sees the first token.
+        """
+        prompt = "".join(str(m.get("content", "")) for m in kwargs.get("messages", []))
+        estimate = count_tokens(prompt) + (kwargs.get("max_tokens") or DEFAULT_EXPECTED_OUTPUT_TOKENS)
+
+        attempt = 0
+        waited = 0.0
+        start = time.time()
+        while True:
+            waited += self.requests.acquire(1)
+            waited += self.tokens.acquire(estimate)
+            self._local.call = {"retries": attempt, "wait_sec": waited}
+            try:
+                raw = self.client.chat.completions.with_raw_response.create(**kwargs)
+            except (groq_sdk.APIStatusError, groq_sdk.APIConnectionError) as e:
+                # The call never ran; give the token estimate back.
+                self.tokens.debit(-estimate)
+                status = getattr(e, "status_code", None)
+                if attempt >= self.max_retries or (status is not None and status not in self.RETRYABLE_STATUS):
+                    if not kwargs.get("stream"):
+                        self._record(kwargs, start, waited, attempt, error=str(e))
+                    raise
+                headers = e.response.headers if getattr(e, "response", None) is not None else {}
+                self._sync(headers)
+                delay = self._backoff(attempt, headers.get("retry-after"))
+                if status == 429:
+                    self.throttled += 1
+                    # Everyone waits out the server's window, not just this thread.
+                    self.requests.pause(delay)
+                self.retries += 1
+                attempt += 1
+                time.sleep(delay)
+                waited += delay
+                continue
+
+            self._sync(raw.headers)
+            response = raw.parse()
+            usage = getattr(response, "usage", None)
+            if usage is not None and getattr(usage, "total_tokens", None):
+                self.tokens.debit(usage.total_tokens - estimate)
+            if not kwargs.get("stream"):
+                self._record(kwargs, start, waited, attempt, usage=usage)
+            return response
+
+    def _record(self, kwargs, start, waited, attempt, usage=None, error=None) -> None:
+        queue_wait = (current_context().get("queue_wait_sec") or 0) + waited + (getattr(usage, "queue_time", None) or 0)
+        emit(backend="groq", model=kwargs.get("model"), latency_sec=round(time.time() - start - waited, 3),
+             queue_wait_sec=round(queue_wait, 3), retries=attempt, cache_hit=False, error=error,
+             **groq_usage_fields(usage))
+
+    def _sync(self, headers) -> None:
+        # Groq's request headers describe the daily quota, so they only ever
+        # pause the bucket; the token headers are the per-minute window.
+        self.requests.sync(
+            None,
+            headers.get("x-ratelimit-remaining-requests"),
+            parse_reset(headers.get("x-ratelimit-reset-requests")),
+        )
+        self.tokens.sync(
+            headers.get("x-ratelimit-limit-tokens"),
+            headers.get("x-ratelimit-remaining-tokens"),
+            parse_reset(headers.get("x-ratelimit-reset-tokens")),
+        )
+
+    def _backoff(self, attempt: int, retry_after=None) -> float:
+        """Full-jitter exponential backoff, never shorter than ``retry-after``."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(delay, parse_reset(retry_after))
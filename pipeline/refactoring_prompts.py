@@ -0,0 +1,253 @@
+"""Refactoring prompts of the seven misuse datasets, keyed by dataset folder.
+
+Each template takes ``{code_snippet}`` and asks for the
+``Refactored Code: ... Summary of Changes:`` layout the outputs are parsed by.
+``PROMPTS`` holds the texts of the Ollama scripts and ``GROQ_PROMPTS`` those
+of the deepseek scripts, character for character.
+"""
+
+BATCH_API_PROMPT = """
+You are a senior software engineer specializing in code quality, refactoring, and design patterns.
+
+I will provide you with a code snippet that contains the "Not using batch API for data processing" misuse.
+
+Here is a description of the misuse:
+Cloud providers offer batch processing APIs to optimize data loading performance by handling data in batches. However, developers sometimes fail to use these batch APIs, choosing instead to load data items individually or implement their own batch processing solutions. Not using a batch API can cause Out-Of-Memory (OOM) issues, excessive network traffic, and significant delays in data loading, ultimately slowing down model training and increasing operational costs.
+Your task is to refactor the code to eliminate the "Not using batch API for data processing" misuse, while preserving the original behavior.
+
+Be sure the refactored code follows best practices, is modular, and improves maintainability. 
+
+Do not make any other changes except those required to fix the described behavior.
+
+After refactoring, briefly list exactly what changes you made to fix the misuse.
+
+Code Snippet:
+
+{code_snippet}
+
+Please structure your response as follows:
+
+Refactored Code:
+[Refactored code]
+
+Summary of Changes:
+[Bullet-point list describing exactly what was changed]
+"""
+
+DATA_DRIFT_PROMPT = """
+You are a senior software engineer specializing in code quality, refactoring, and design patterns.
+
+I will provide you with a code snippet that contains the "Ignoring monitoring for data drift" misuse.
+
+Here is a description of the misuse:
+it refers to neglecting the continuous assessment of changes in statistical characteristics or data distributions, which is crucial for maintaining model performance.
+Data drift occurs when the incoming data distribution differs from the training data, leading to degraded model accuracy over time. Cloud providers recommend implementing skew and drift detection mechanisms to monitor these changes and alert developers when significant changes occur. By detecting data drift early, models can be retrained or adjusted to ensure they continue performing as expected in production environments.
+
+Your task is to refactor the code to eliminate the "Ignoring monitoring for data drift" misuse, while preserving the original behavior.
+
+Be sure the refactored code follows best practices, is modular, and improves maintainability.
+
+Do not make any other changes except those required to fix the described behavior.
+
+After refactoring, briefly list exactly what changes you made to fix the misuse.
+
+Code Snippet:
+
+{code_snippet}
+
+Please structure your response as follows:
+
+Refactored Code:
+[Refactored code]
+
+Summary of Changes:
+[Bullet-point list describing exactly what was changed]
+"""
+
+EARLY_STOPPING_PROMPT = """
+You are a senior software engineer specializing in code quality, refactoring, and design patterns.
+
+I will provide you with a code snippet that contains the "Non specification of early stopping criteria" misuse.
+
+Here is a description of the misuse:
+ML services typically offer options to set early stopping criteria, helping to avoid overfitting and unnecessary computational expenses. However, developers sometimes fail to specify these criteria, which allows the training to proceed for more epochs than necessary. This oversight can result in wasted computational resources, increased training duration, higher costs, and potential overfitting.
+
+Your task is to refactor the code to eliminate the "Non specification of early stopping criteria" misuse, while preserving the original behavior.
+
+Be sure the refactored code follows best practices, is modular, and improves maintainability.
+
+Do not make any other changes except those required to fix the described behavior.
+
+After refactoring, briefly list exactly what changes you made to fix the misuse.
+
+Code Snippet:
+
+{code_snippet}
+
+Please structure your response as follows:
+
+Refactored Code:
+[Refactored code]
+
+Summary of Changes:
+[Bullet-point list describing exactly what was changed]
+"""
+
+IMPROPER_ML_API_LIMIT_PROMPT = """
+You are a senior software engineer specializing in code quality, refactoring, and design patterns.
+
+I will provide you with a code snippet that contains the "Improper handling of ML API limits" misuse.
+
+Here is a description of the misuse:
+Failure to adhere to API request rate limits can compromise the stability and performance of the ML service. Developers may not adequately manage these limits, causing predictions to abruptly halt when the rate is exceeded. For instance, surpassing the maximum number of API calls within a set timeframe, such as requests per second defined by the Azure OpenAI service, can result in delayed or rejected requests until they conform to the permitted rate.
+
+Your task is to refactor the code to eliminate the "Improper handling of ML API limits" misuse, while preserving the original behavior.
+
+Be sure the refactored code follows best practices, is modular, and improves maintainability.
+
+Do not make any other changes except those required to fix the described behavior.
+
+After refactoring, briefly list exactly what changes you made to fix the misuse.
+
+Code Snippet:
+
+{code_snippet}
+
+Please structure your response as follows:
+
+Refactored Code:
+[Refactored code]
+
+Summary of Changes:
+[Bullet-point list describing exactly what was changed]
+"""
+
+# The deepseek script of this dataset had no blank line before "Your task"
+DEEPSEEK_IMPROPER_ML_API_LIMIT_PROMPT = """
+You are a senior software engineer specializing in code quality, refactoring, and design patterns.
+
+I will provide you with a code snippet that contains the "Improper handling of ML API limits" misuse.
+
+Here is a description of the misuse:
+Failure to adhere to API request rate limits can compromise the stability and performance of the ML service. Developers may not adequately manage these limits, causing predictions to abruptly halt when the rate is exceeded. For instance, surpassing the maximum number of API calls within a set timeframe, such as requests per second defined by the Azure OpenAI service, can result in delayed or rejected requests until they conform to the permitted rate.
+Your task is to refactor the code to eliminate the "Improper handling of ML API limits" misuse, while preserving the original behavior.
+
+Be sure the refactored code follows best practices, is modular, and improves maintainability.
+
+Do not make any other changes except those required to fix the described behavior.
+
+After refactoring, briefly list exactly what changes you made to fix the misuse.
+
+Code Snippet:
+
+{code_snippet}
+
+Please structure your response as follows:
+
+Refactored Code:
+[Refactored code]
+
+Summary of Changes:
+[Bullet-point list describing exactly what was changed]
+"""
+
+MISINTERPRETING_OUTPUT_PROMPT = """
+You are a senior software engineer specializing in code quality, refactoring, and design patterns.
+
+I will provide you with a code snippet that contains the "Misinterpreting output" misuse.
+
+Here is a description of the misuse:
+ML cloud services often provide pre-trained models that output simplified metrics derived from complex internal representations. However, developers may misinterpret these outputs by overlooking how multiple values should be combined or by misunderstanding their intended meaning. Misinterpreting output can lead to incorrect conclusions, faulty application logic, and subtle bugs.
+For example, Google’s NLP Sentiment Detection API returns both a score (sentiment polarity) and a magnitude (sentiment strength). Failing to interpret them together may result in an inaccurate sentiment assessment, ultimately reducing model reliability and decision-making quality.
+
+Be sure the refactored code follows best practices, is modular, and improves maintainability. 
+
+Do not make any other changes except those required to fix the described behavior.
+
+After refactoring, briefly list exactly what changes you made to fix the misuse.
+
+Code Snippet:
+
+{code_snippet}
+
+Please structure your response as follows:
+
+Refactored Code:
+[Refactored code]
+
+Summary of Changes:
+[Bullet-point list describing exactly what was changed]
+"""
+
+SCHEMA_MISMATCH_PROMPT = """
+You are a senior software engineer specializing in code quality, refactoring, and design patterns.
+
+I will provide you with a code snippet that contains the "Ignoring testing schema mismatch" misuse.
+
+Here is a description of the misuse:
+Cloud providers offer ML services to detect unmatched data schemas, which include feature or data distribution mismatches between training, testing, and production data, often by raising alerts. However, developers may ignore setting up these alerts or disable them. For example, Amazon ML displays alerts if the schemas for the training and evaluation data sources are not consistent. Disabling these alerts can result in missing discrepancies, such as features present in the training data but absent in the evaluation data, or detecting unexpected additional features. This oversight may weaken the model's accuracy and performance in the production environment.
+
+Your task is to refactor the code to eliminate the "Ignoring testing schema mismatch" misuse, while preserving the original behavior. 
+
+Be sure the refactored code follows best practices, is modular, and improves maintainability.
+
+Do not make any other changes except those required to fix the described behavior.
+
+After refactoring, briefly list exactly what changes you made to fix the misuse.
+
+Code Snippet:
+
+{code_snippet}
+
+Please structure your response as follows:
+
+Refactored Code:
+[Refactored code]
+
+Summary of Changes:
+[Bullet-point list describing exactly what was changed]
+"""
+
+TRAINING_CHECKPOINT_PROMPT = """
+You are a senior software engineer specializing in code quality, refactoring, and design patterns.
+
+I will provide you with a code snippet that contains the "Not using training checkpoints" misuse.
+
+Here is a description of the misuse:
+Cloud providers offer the ability to resume training from the most recent checkpoint, saving the current state of the experiment rather than starting from scratch. This can save significant time and computational resources, especially when training large and complex models. However, developers may neglect to save training checkpoints in cloud storage. If a model fails and checkpoints have not been saved, the entire training job or pipeline will terminate, resulting in a loss of data since the model's state is not preserved in memory.
+Your task is to refactor the code to eliminate the "Not using training checkpoints" misuse, while preserving the original behavior.
+
+Be sure the refactored code follows best practices, is modular, and improves maintainability.
+
+Do not make any other changes except those required to fix the described behavior.
+
+After refactoring, briefly list exactly what changes you made to fix the misuse.
+
+Code Snippet:
+
+{code_snippet}
+
+Please structure your response as follows:
+
+Refactored Code:
+[Refactored code]
+
+Summary of Changes:
+[Bullet-point list describing exactly what was changed]
+"""
+
+PROMPTS = {
+    "batch_api": BATCH_API_PROMPT,
+    "data_drift": DATA_DRIFT_PROMPT,
+    "early_stopping": EARLY_STOPPING_PROMPT,
+    "improper_ml_api_limit": IMPROPER_ML_API_LIMIT_PROMPT,
+    "misinterpreting_output": MISINTERPRETING_OUTPUT_PROMPT,
+    "schema_mismatch": SCHEMA_MISMATCH_PROMPT,
+    "training_checkpoint": TRAINING_CHECKPOINT_PROMPT,
+}
+
+# Groq (deepseek) scripts used the same prompts except where noted above
+GROQ_PROMPTS = {
+    **PROMPTS,
+    "improper_ml_api_limit": DEEPSEEK_IMPROPER_ML_API_LIMIT_PROMPT,
+}
@@ -0,0 +1,110 @@
+"""Resume the append-mode ``### Row:`` runners instead of starting over at row 1.
+
+The runners append one block per row to their output file and one entry per
+row to their timing file, so a restart used to pay for every finished row
+again and leave duplicate blocks behind. Before a run, ``prepare`` compacts
+both files and reports the rows that need no new call:
+
+    done, cumulative_time = prepare(output_file, timing_file)
+    ...  # skip rows whose number is in ``done``, append the others as before
+    finish(output_file, timing_file)  # put re-run rows back in row order
+
+A row counts as done when its last block is complete (the run got past
+writing it) and is not an ``[ERROR]``. Compaction keeps one block per row —
+the last successful one, else the last complete one — copied byte for byte
+in row order, drops blocks cut mid-write, and rewrites the timing file with
+one entry per row and a running total recomputed from the kept durations.
+"""
+
+import os
+import re
+
+from pipeline.row_index import RowIndex
+
+
+_TIMING_ENTRY = re.compile(r"^Row: (\d+), .*?Duration: ([\d.]+) sec.*$", re.M)
+
+
+def completed_rows(output_file: str) -> set:
+    """Row numbers whose last block is complete and not an ``[ERROR]``."""
+    if not os.path.exists(output_file):
+        return set()
+    with RowIndex(output_file) as index:
+        return {row for row in index.rows() if _done(index.get(row))}
+
+
+def compact_output(output_file: str) -> int:
+    """Keep one block per row in row order; return the number of blocks dropped."""
+    if not os.path.exists(output_file):
+        return 0
+    with RowIndex(output_file) as index:
+        blocks = index.blocks()
+    kept = {}
+    for block in blocks:
+        # A block cut mid-write is dropped, so its row runs again
+        if block.complete and (_done(block) or not _done(kept.get(block.row))):
+            kept[block.row] = block
+    ordered = [kept[row] for row in sorted(kept)]
+    if [b.offset for b in ordered] == [b.offset for b in blocks]:
+        return 0
+
+    with open(output_file, "rb") as f:
+        chunks = []
+        for block in ordered:
+            f.seek(block.offset)
+            chunks.append(f.read(block.length))
+    tmp_path = output_file + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.writelines(chunks)
+    os.replace(tmp_path, output_file)
+    RowIndex(output_file).close()  # re-index the rewritten file
+    return len(blocks) - len(ordered)
+
+
+def compact_timings(timing_file: str) -> float:
+    """Keep the last entry per row in row order and return the cumulative time."""
+    if not os.path.exists(timing_file):
+        return 0.0
+    with open(timing_file, encoding="utf-8") as f:
+        text = f.read()
+    entries = {}
+    for match in _TIMING_ENTRY.finditer(text):
+        entries[int(match.group(1))] = (match.group(0), float(match.group(2)))
+
+    cumulative = 0.0
+    lines = []
+    for row in sorted(entries):
+        line, duration = entries[row]
+        cumulative = round(cumulative + duration, 2)
+        lines.append(f"{line}\n  → Cumulative Time: {cumulative} sec\n\n")
+    compacted = "".join(lines)
+    if compacted != text:
+        _replace(timing_file, compacted)
+    return cumulative
+
+
+def prepare(output_file: str, timing_file: str):
+    """Compact both files and return ``(done_rows, cumulative_time)`` to resume from."""
+    dropped = compact_output(output_file)
+    cumulative = compact_timings(timing_file)
+    done = completed_rows(output_file)
+    if dropped:
+        print(f"🧹 Dropped {dropped} duplicate blocks from {output_file}")
+    return done, cumulative
+
+
+def finish(output_file: str, timing_file: str) -> float:
+    """Restore row order after re-run rows were appended; return the cumulative time."""
+    compact_output(output_file)
+    return compact_timings(timing_file)
+
+
+def _done(block) -> bool:
+    return block is not None and block.complete and not block.is_error
+
+
+def _replace(path: str, text: str) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
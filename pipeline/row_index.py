@@ -0,0 +1,209 @@
+"""Byte-offset index and memory-mapped reader for the ``### Row:`` text outputs.
+
+The per-misuse runners append one block per row to their output file:
+
+    ### Row: 12
+    ### Repository: https://github.com/...
+    ### File: Merged .py files
+    <model answer>
+
+Reading one row used to mean re-parsing the whole file. ``RowIndex`` records
+``row -> (offset, length, repository, file)`` in a sidecar under
+``.llm_cache/row_index`` and fetches any block straight from a memory map:
+
+    index = RowIndex("data_drift/refactored_code_outputs_deepseek.txt")
+    block = index.get(12)  # Block(row, repository, file, text, offset, length)
+
+Each open (and ``refresh()``) scans only the bytes appended since the last
+scan, starting at the last indexed block in case it was still being written.
+A file that shrank or was rewritten from the start is re-indexed in full. When
+a row appears more than once (a rerun appended it again), ``get`` returns the
+last block and ``blocks(row)`` returns all of them.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import mmap
+import os
+import re
+from dataclasses import dataclass
+
+from pipeline.cache import REPO_ROOT
+
+
+INDEX_DIR = os.path.join(REPO_ROOT, ".llm_cache", "row_index")
+
+# Bytes at the head of the file whose hash tells an append from a rewrite.
+HEAD_BYTES = 4096
+
+_HEADER = re.compile(rb"^### Row: (\d+)\r?\n### Repository: ([^\r\n]*)\r?\n### File: ([^\r\n]*)\r?\n", re.M)
+
+
+@dataclass
+class Block:
+    row: int
+    repository: str
+    file: str
+    text: str
+    offset: int
+    length: int
+    complete: bool = True  # ends with the blank line the runners write after each answer
+
+    @property
+    def is_error(self) -> bool:
+        return self.text.startswith("[ERROR]")
+
+
+def index_path_for(path: str) -> str:
+    key = hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(INDEX_DIR, f"{stem}-{key}.json")
+
+
+class RowIndex:
+    def __init__(self, path: str, index_path: str = None):
+        self.path = path
+        self.index_path = index_path or index_path_for(path)
+        self.entries = []  # [row, offset, length, repository, file] in file order
+        self.indexed_bytes = 0
+        self.head = ""
+        self._rows = {}
+        self._mm = None
+        self._mm_size = 0
+        self._load()
+        self.refresh()
+
+    def refresh(self) -> int:
+        """Index the bytes appended since the last scan; return the number of new blocks."""
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if size == self.indexed_bytes and self._head_matches():
+            return 0
+        if size < self.indexed_bytes or not self._head_matches():
+            self.entries, self.indexed_bytes = [], 0  # truncated or rewritten: start over
+
+        # The last block may have been cut mid-write; scan again from its header
+        before = len(self.entries)
+        start = self.entries.pop()[1] if self.entries else 0
+
+        mm = self._map(size)
+        if mm is not None:
+            matches = list(_HEADER.finditer(mm, start))
+            for i, match in enumerate(matches):
+                end = matches[i + 1].start() if i + 1 < len(matches) else size
+                self.entries.append([int(match.group(1)), match.start(), end - match.start(),
+                                     match.group(2).decode("utf-8", "replace"),
+                                     match.group(3).decode("utf-8", "replace")])
+            self.head = hashlib.sha256(mm[:min(size, HEAD_BYTES)]).hexdigest()
+        self.indexed_bytes = size
+        self._reindex_rows()
+        self._save()
+        return len(self.entries) - before
+
+    def rows(self) -> list:
+        """Distinct row numbers, in the order they first appear."""
+        return list(dict.fromkeys(entry[0] for entry in self.entries))
+
+    def get(self, row: int):
+        """Last block written for ``row``, or ``None``."""
+        positions = self._rows.get(row)
+        return self._block(self.entries[positions[-1]]) if positions else None
+
+    def blocks(self, row: int = None) -> list:
+        """Every block of ``row`` (all blocks when ``None``), in file order."""
+        positions = self._rows.get(row, []) if row is not None else range(len(self.entries))
+        return [self._block(self.entries[i]) for i in positions]
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _block(self, entry) -> Block:
+        row, offset, length, repository, file = entry
+        raw = self._map(self.indexed_bytes)[offset:offset + length].decode("utf-8", "replace")
+        text = raw.split("\n", 3)[3] if raw.count("\n") >= 3 else ""
+        return Block(row, repository, file, text.rstrip("\r\n"), offset, length,
+                     raw.endswith(("\n\n", "\r\n\r\n")))
+
+    def _map(self, size: int):
+        if size == 0:
+            return None
+        if self._mm is None or self._mm_size != size:
+            self.close()
+            with open(self.path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+            self._mm_size = size
+        return self._mm
+
+    def _head_matches(self) -> bool:
+        if not self.indexed_bytes:
+            return True
+        mm = self._map(os.path.getsize(self.path)) if os.path.exists(self.path) else None
+        if mm is None:
+            return False
+        return hashlib.sha256(mm[:min(self.indexed_bytes, HEAD_BYTES)]).hexdigest() == self.head
+
+    def _reindex_rows(self) -> None:
+        self._rows = {}
+        for position, entry in enumerate(self.entries):
+            self._rows.setdefault(entry[0], []).append(position)
+
+    def _load(self) -> None:
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.entries = saved.get("entries", [])
+        self.indexed_bytes = saved.get("indexed_bytes", 0)
+        self.head = saved.get("head", "")
+        self._reindex_rows()
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"path": os.path.abspath(self.path), "indexed_bytes": self.indexed_bytes,
+                       "head": self.head, "entries": self.entries}, f)
+        os.replace(tmp_path, self.index_path)
+
+
+def default_outputs() -> list:
+    return sorted(glob.glob(os.path.join(REPO_ROOT, "*", "refactored_code*.txt")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index the ### Row: text outputs and fetch single rows.")
+    parser.add_argument("files", nargs="*", help="output files (default: every */refactored_code*.txt)")
+    parser.add_argument("--row", type=int, help="print this row of each file")
+    args = parser.parse_args()
+
+    for path in args.files or default_outputs():
+        with RowIndex(path) as index:
+            if args.row is not None:
+                block = index.get(args.row)
+                if block is None:
+                    print(f"❌ Row {args.row} not found in {path}")
+                    continue
+                print(f"### Row: {block.row}\n### Repository: {block.repository}\n### File: {block.file}\n{block.text}\n")
+                continue
+            rows = index.rows()
+            errors = sum(1 for row in rows if index.get(row).is_error)
+            duplicates = len(index) - len(rows)
+            print(f"📇 {os.path.relpath(path, REPO_ROOT)}: {len(rows)} rows, {errors} errors, "
+                  f"{duplicates} duplicate blocks")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""Structured per-request telemetry for every model call.
+
+The ``model_timings*.txt`` files only keep a wall-clock duration per row;
+Ollama's ``prompt_eval_count``/``eval_count``/``load_duration``/
+``eval_duration`` and Groq's ``usage`` were thrown away. Every backend call
+now emits one record with the fields in ``FIELDS`` — queue wait, connect,
+time to first token, latency, model load, tokens in/out, tokens per second,
+retries and cache hit — tagged with the stage, misuse and row it served.
+
+Records are appended to ``.llm_cache/metrics/requests.jsonl`` as they happen
+(cheap, safe across threads and crashes) and ``compact()`` moves them into
+Parquet part files, the columnar store the reports read. Compaction first
+renames the JSONL file aside, so runs still appending in other processes
+reopen a fresh file instead of writing into one that is being compacted:
+
+    set_defaults(stage="refactor")
+    with context(misuse=misuse_name, row=idx + 1):
+        ...  # OllamaClient, GroqScheduler, stream_groq and ResponseCache emit records
+
+    python -m pipeline.telemetry --compact  # per model/misuse summary
+
+The clients in ``pipeline`` emit on their own; raw SDK calls go through
+``groq_call``, which records the retries the SDK made. Set ``LLM_TELEMETRY=0`` to turn recording off.
+"""
+
+import argparse
+import glob
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks; a write may race a compaction
+    fcntl = None
+
+
+METRICS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".llm_cache", "metrics")
+
+FIELDS = [
+    "ts", "run_id", "stage", "backend", "model", "misuse", "row",
+    "queue_wait_sec", "connect_sec", "ttft_sec", "latency_sec", "load_sec",
+    "tokens_in", "tokens_out", "tokens_per_sec", "retries", "cache_hit", "error",
+]
+
+_defaults = {}
+_local = threading.local()
+_telemetry = None
+_telemetry_lock = threading.Lock()
+_parts = itertools.count(1)  # keeps part names unique within a process
+
+
+class Telemetry:
+    def __init__(self, directory: str = METRICS_DIR, run_id: str = None):
+        self.directory = directory
+        self.path = os.path.join(directory, "requests.jsonl")
+        self.run_id = run_id or f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self.records = 0
+        self._lock = threading.Lock()
+        self._file = None
+
+    def emit(self, **fields) -> dict:
+        """Append one record; unknown fields are ignored, missing ones are ``None``."""
+        record = dict.fromkeys(FIELDS)
+        record.update(ts=round(time.time(), 3), run_id=self.run_id)
+        record.update({k: v for k, v in {**current_context(), **fields}.items() if k in record})
+        if record["tokens_per_sec"] is None and record["tokens_out"] and record["latency_sec"]:
+            generating = record["latency_sec"] - (record["ttft_sec"] or 0)
+            record["tokens_per_sec"] = round(record["tokens_out"] / generating, 1) if generating > 0 else None
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            self._write(line + "\n")
+            self.records += 1
+        return record
+
+    def compact(self):
+        """Move the JSONL records into a new Parquet part file; return its path (``None`` if empty)."""
+        stamp = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_parts)}"
+        pending = os.path.join(self.directory, f"requests-{stamp}.jsonl.compacting")
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if not os.path.exists(self.path):
+                return None
+            # Writers that see the file renamed reopen requests.jsonl; wait out the ones mid-write
+            os.replace(self.path, pending)
+        with open(pending, "a", encoding="utf-8") as f:
+            _lock(f, exclusive=True)
+
+        frame = _read_jsonl(pending)
+        if frame.empty:
+            os.remove(pending)
+            return None
+        part = os.path.join(self.directory, f"requests-{stamp}.parquet")
+        frame.to_parquet(part + ".tmp", index=False)
+        os.replace(part + ".tmp", part)
+        os.remove(pending)
+        return part
+
+    def _write(self, line: str) -> None:
+        while True:
+            if self._file is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+            _lock(self._file, exclusive=False)
+            try:
+                if _is_current(self._file, self.path):
+                    self._file.write(line)
+                    self._file.flush()
+                    return
+            finally:
+                _unlock(self._file)
+            # Renamed by a compaction (maybe in another process): append to the new file
+            self._file.close()
+            self._file = None
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def get_telemetry():
+    """Process-wide recorder, or ``None`` when ``LLM_TELEMETRY=0``."""
+    global _telemetry
+    if os.getenv("LLM_TELEMETRY", "1") == "0":
+        return None
+    with _telemetry_lock:
+        if _telemetry is None:
+            _telemetry = Telemetry()
+        return _telemetry
+
+
+def emit(**fields) -> None:
+    telemetry = get_telemetry()
+    if telemetry is not None:
+        telemetry.emit(**fields)
+
+
+def set_defaults(**fields) -> None:
+    """Fields added to every record of this process (e.g. ``stage``)."""
+    _defaults.update(fields)
+
+
+@contextmanager
+def context(**fields):
+    """Tag the records emitted by this thread inside the block (misuse, row, queue wait, ...)."""
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    stack.append(fields)
+    try:
+        yield
+    finally:
+        stack.pop()
+
+
+def current_context() -> dict:
+    merged = dict(_defaults)
+    for fields in getattr(_local, "stack", []):
+        merged.update(fields)
+    return merged
+
+
+def ollama_fields(result: dict) -> dict:
+    """Record fields from an Ollama ``/api/generate`` response (durations are in ns)."""
+    eval_sec = result.get("eval_duration", 0) / 1e9
+    fields = {
+        "tokens_in": result.get("prompt_eval_count"),
+        "tokens_out": result.get("eval_count"),
+        "load_sec": round(result.get("load_duration", 0) / 1e9, 3),
+    }
+    if eval_sec and result.get("eval_count"):
+        fields["tokens_per_sec"] = round(result["eval_count"] / eval_sec, 1)
+    return fields
+
+
+def groq_usage_fields(usage) -> dict:
+    """Record fields from a Groq ``usage`` object (``None`` gives no fields)."""
+    if usage is None:
+        return {}
+    fields = {"tokens_in": getattr(usage, "prompt_tokens", None),
+              "tokens_out": getattr(usage, "completion_tokens", None)}
+    completion_time = getattr(usage, "completion_time", None)
+    if completion_time and fields["tokens_out"]:
+        fields["tokens_per_sec"] = round(fields["tokens_out"] / completion_time, 1)
+    return {k: v for k, v in fields.items() if v is not None}
+
+
+def groq_call(client, **kwargs):
+    """Call ``client.chat.completions.create(**kwargs)`` on a raw SDK client and record it.
+
+    The SDK's own retries (``max_retries``) are kept and recorded: taken from
+    the response, or all of them when a retryable error still ends the call.
+    """
+    start = time.time()
+    try:
+        raw = client.chat.completions.with_raw_response.create(**kwargs)
+    except Exception as e:
+        emit(backend="groq", model=kwargs.get("model"), latency_sec=round(time.time() - start, 3),
+             retries=client.max_retries if _sdk_retries(e) else 0, cache_hit=False, error=str(e))
+        raise
+    response = raw.parse()
+    usage = getattr(response, "usage", None)
+    emit(backend="groq", model=kwargs.get("model"), latency_sec=round(time.time() - start, 3),
+         retries=raw.retries_taken, cache_hit=False,
+         queue_wait_sec=_plus(current_context().get("queue_wait_sec"), getattr(usage, "queue_time", None)),
+         **groq_usage_fields(usage))
+    return response
+
+
+def _sdk_retries(error) -> bool:
+    """True for errors the Groq SDK retries before raising (timeouts, connection errors, 408/409/429/5xx)."""
+    import groq as groq_sdk
+
+    if isinstance(error, groq_sdk.APIConnectionError):
+        return True
+    status = getattr(error, "status_code", None)
+    return status is not None and (status in (408, 409, 429) or status >= 500)
+
+
+def load_metrics(directory: str = METRICS_DIR):
+    """Every record so far (Parquet parts plus the pending JSONL) as one DataFrame."""
+    import pandas as pd
+
+    frames = [pd.read_parquet(path) for path in sorted(glob.glob(os.path.join(directory, "requests-*.parquet")))]
+    # Records being compacted (or left by a compaction that crashed) are still counted
+    frames += [_read_jsonl(path) for path in sorted(glob.glob(os.path.join(directory, "requests-*.jsonl.compacting")))]
+    frames.append(_read_jsonl(os.path.join(directory, "requests.jsonl")))
+    frames = [frame for frame in frames if not frame.empty]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=FIELDS)
+
+
+def summarize(frame, by=("backend", "model", "misuse")):
+    """Per-group requests, latency/TTFT percentiles, throughput, tokens, retries and cache hits."""
+    frame = frame.copy()
+    frame["cache_hit"] = frame["cache_hit"].fillna(False).astype(bool)
+    frame["failed"] = frame["error"].notna()
+    calls = frame[~frame["cache_hit"]]
+    grouped = calls.groupby(list(by), dropna=False)
+    summary = grouped.agg(
+        requests=("latency_sec", "size"),
+        errors=("failed", "sum"),
+        latency_p50=("latency_sec", "median"),
+        latency_p95=("latency_sec", lambda s: s.quantile(0.95)),
+        ttft_p50=("ttft_sec", "median"),
+        queue_wait_p50=("queue_wait_sec", "median"),
+        tokens_in=("tokens_in", "sum"),
+        tokens_out=("tokens_out", "sum"),
+        tokens_per_sec=("tokens_per_sec", "median"),
+        retries=("retries", "sum"),
+    )
+    hits = frame.groupby(list(by), dropna=False)["cache_hit"].agg(["sum", "size"])
+    summary["cache_hit_rate"] = (hits["sum"] / hits["size"]).reindex(summary.index)
+    return summary.reset_index()
+
+
+def _plus(*values):
+    present = [v for v in values if v is not None]
+    return round(sum(present), 3) if present else None
+
+
+def _lock(f, exclusive: bool) -> None:
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+
+def _unlock(f) -> None:
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _is_current(f, path: str) -> bool:
+    """True while the open file ``f`` is still the file at ``path``."""
+    try:
+        return os.path.samestat(os.fstat(f.fileno()), os.stat(path))
+    except FileNotFoundError:
+        return False
+
+
+def _read_jsonl(path: str):
+    import pandas as pd
+
+    rows = []
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    continue  # a line cut by a crash
+    return pd.DataFrame(rows, columns=FIELDS)
+
+
+def main():
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Summarize the per-request telemetry.")
+    parser.add_argument("--compact", action="store_true", help="move pending JSONL records into Parquet first")
+    parser.add_argument("--by", nargs="+", default=["backend", "model", "misuse"], choices=FIELDS)
+    parser.add_argument("--output", help="also write the summary to this .xlsx/.csv file")
+    args = parser.parse_args()
+
+    if args.compact:
+        part = Telemetry().compact()
+        print(f"🗜️ Compacted records into {part}" if part else "🗜️ No pending records")
+    frame = load_metrics()
+    if frame.empty:
+        print("❌ No telemetry recorded yet")
+        return
+    summary = summarize(frame, args.by)
+    with pd.option_context("display.max_columns", None, "display.width", 200):
+        print(summary.round(3).to_string(index=False))
+    if args.output:
+        (summary.to_csv if args.output.endswith(".csv") else summary.to_excel)(args.output, index=False)
+        print(f"📄 Summary saved to {args.output}")
+    print(f"📈 {len(frame)} records, {frame['run_id'].nunique()} runs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Per-request token budgets: ``max_tokens`` and Ollama ``num_ctx`` sized to the prompt.
+
+A fixed ``max_tokens=2000`` truncates the answers for large repositories, and
+Ollama's default context silently cuts long prompts while small prompts
+reserve more KV cache than they need. ``plan`` counts the prompt with a local
+tokenizer (tiktoken when installed, a characters-per-token heuristic
+otherwise), sizes the output from the code being sent, and picks the smallest
+power-of-two ``num_ctx`` that holds both. A prompt that cannot fit the
+model's context raises ``BudgetError`` before any call is made.
+
+Ollama reloads the model whenever ``num_ctx`` changes, so a run picks one
+``num_ctx`` per model up front with ``run_num_ctx`` and only ``num_predict``
+follows each request:
+
+    num_ctx = run_num_ctx(model_name, (prompt, expected) for ...)
+    budget = plan(model_name, prompt, expected_output_tokens("refactor", code))
+    client.generate(model_name, prompt, options=budget.ollama_options(num_ctx))
+    groq.chat.completions.create(..., **budget.groq_kwargs())
+"""
+
+import functools
+from dataclasses import dataclass
+
+
+# Rough characters-per-token ratio for code and English prose.
+CHARS_PER_TOKEN = 4
+
+# Context windows of the models the scripts use (Ollama entries are the model defaults).
+CONTEXT_WINDOWS = {
+    "openai/gpt-oss-120b": 131072,
+    "openai/gpt-oss-20b": 131072,
+    "qwen/qwen3-32b": 131072,
+    "deepseek-r1-distill-llama-70b": 131072,
+    "llama-3.3-70b-versatile": 131072,
+    "llama-3.1-8b-instant": 131072,
+    "codellama": 16384,
+    "llama3": 8192,
+    "gemma": 8192,
+    "mistral": 32768,
+    "qwen": 32768,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+MIN_NUM_CTX = 2048
+MIN_OUTPUT_TOKENS = 256
+
+# A refactoring re-emits the code plus a summary; an extraction returns at most the code.
+OUTPUT_MARGIN = 1.25
+SUMMARY_TOKENS = 512
+
+
+class BudgetError(ValueError):
+    """Raised when a prompt leaves no room for an answer in the model's context."""
+
+
+@functools.lru_cache(maxsize=1)
+def _encoder():
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text) -> int:
+    """Prompt tokens with tiktoken if available, else ``len(text) / CHARS_PER_TOKEN``."""
+    text = text if isinstance(text, str) else ""
+    encoder = _encoder()
+    if encoder is None:
+        return len(text) // CHARS_PER_TOKEN + 1
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+def context_window(model: str) -> int:
+    """Context size of ``model``; Ollama tags (``llama3:8b``) match their family."""
+    if model in CONTEXT_WINDOWS:
+        return CONTEXT_WINDOWS[model]
+    family = model.split(":")[0]
+    for name, size in sorted(CONTEXT_WINDOWS.items(), key=lambda item: -len(item[0])):
+        if family.startswith(name):
+            return size
+    return DEFAULT_CONTEXT_WINDOW
+
+
+def expected_output_tokens(kind: str, code) -> int:
+    """Expected answer size for a ``"refactor"`` or ``"extract"`` request over ``code``."""
+    code_tokens = count_tokens(code)
+    if kind == "refactor":
+        return int(code_tokens * OUTPUT_MARGIN) + SUMMARY_TOKENS
+    if kind == "extract":
+        return int(code_tokens * OUTPUT_MARGIN) + MIN_OUTPUT_TOKENS
+    raise ValueError(f"❌ Unknown request kind: {kind}")
+
+
+@dataclass
+class Budget:
+    model: str
+    prompt_tokens: int
+    max_tokens: int
+    num_ctx: int
+    context_window: int
+
+    def groq_kwargs(self) -> dict:
+        return {"max_tokens": self.max_tokens}
+
+    def ollama_options(self, num_ctx: int = None) -> dict:
+        """Ollama options; pass the run's shared ``num_ctx`` so the loaded model is kept."""
+        return {"num_ctx": num_ctx or self.num_ctx, "num_predict": self.max_tokens}
+
+
+def plan(model: str, prompt: str, expected_output: int, ceiling: int = None, quota: int = None) -> Budget:
+    """Budget for one request; ``ceiling`` caps ``max_tokens`` (e.g. a policy limit).
+
+    ``quota`` is an opt-in cap on one request, prompt plus ``max_tokens``,
+    for account tiers that reject larger requests outright; leave it unset
+    to check the context window only. Per-minute pacing is the scheduler's job.
+    """
+    window = context_window(model)
+    prompt_tokens = count_tokens(prompt)
+    limit = min(window, quota) if quota else window
+    room = limit - prompt_tokens
+    if room < MIN_OUTPUT_TOKENS:
+        what = f"{model} ({window}-token context)" if limit == window else f"the {quota}-token request quota of {model}"
+        raise BudgetError(f"❌ Prompt of {prompt_tokens} tokens does not fit {what}")
+    wanted = max(expected_output, MIN_OUTPUT_TOKENS)
+    if ceiling is not None:
+        wanted = min(wanted, ceiling)
+    max_tokens = min(wanted, room)
+
+    num_ctx = MIN_NUM_CTX
+    while num_ctx < prompt_tokens + max_tokens:
+        num_ctx *= 2
+    return Budget(model, prompt_tokens, max_tokens, min(num_ctx, window), window)
+
+
+def run_num_ctx(model: str, requests, ceiling: int = None) -> int:
+    """One ``num_ctx`` for a whole run of ``model``: the largest any request needs.
+
+    ``requests`` yields ``(prompt, expected_output)``. Prompts that cannot fit
+    are skipped here; they are rejected when their row runs.
+    """
+    num_ctx = MIN_NUM_CTX
+    for prompt, expected_output in requests:
+        try:
+            num_ctx = max(num_ctx, plan(model, prompt, expected_output, ceiling).num_ctx)
+        except BudgetError:
+            continue
+    return min(num_ctx, context_window(model))
+
+
+def fitting_models(prompt: str, expected_output: int, models) -> list:
+    """The subset of ``models`` whose context can hold ``prompt`` and some answer."""
+    fits = []
+    for model in models:
+        try:
+            plan(model, prompt, expected_output)
+        except BudgetError:
+            continue
+        fits.append(model)
+    return fits
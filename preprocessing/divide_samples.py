@@ -1,6 +1,16 @@
 import pandas as pd
+import hashlib
+import json
 import os
 import re
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline.blob_store import BlobStore
+
+
+# Partition hashes from the last run; partitions whose hash is unchanged are not rewritten
+MANIFEST_NAME = "_partitions.json"
 
 
 def clean_misuse_name(name: str) -> str:
@@ -20,33 +30,80 @@ def to_title_case(text: str) -> str:
     return text.title()
 
 
-def split_excel_by_misuse(input_file: str, output_dir: str = "preprocessing/split_files") -> None:
+def normalize_misuse_column(misuse: pd.Series) -> pd.Series:
+    """Vectorized ``clean_misuse_name`` + ``to_title_case`` through a lookup of the unique values."""
+    lookup = {name: to_title_case(clean_misuse_name(name)) for name in misuse.dropna().unique() if isinstance(name, str)}
+    return misuse.map(lookup)
+
+
+def partition_hash(subset: pd.DataFrame) -> str:
+    """Stable content hash of a partition, used to skip rewriting unchanged files."""
+    row_hashes = pd.util.hash_pandas_object(subset.astype(str), index=False).to_numpy()
+    columns = "\x1f".join(map(str, subset.columns)).encode("utf-8")
+    return hashlib.sha256(columns + row_hashes.tobytes()).hexdigest()
+
+
+def split_excel_by_misuse(input_file: str, output_dir: str = "preprocessing/split_files",
+                          export_xlsx: bool = True, force: bool = False) -> None:
     df = pd.read_excel(input_file)
 
     if "Misuse" not in df.columns:
         raise ValueError("❌ The column 'Misuse' is missing in the Excel file.")
 
     # === Clean and normalize the Misuse column ===
-    df["Misuse"] = df["Misuse"].apply(clean_misuse_name)
-    df["Misuse"] = df["Misuse"].apply(to_title_case)
+    df["Misuse"] = normalize_misuse_column(df["Misuse"])
+
+    # === Reference the shared code blob so partitions of one repository share its artifacts ===
+    if "Cleaned Code" in df.columns:
+        store = BlobStore()
+        df["Blob_ID"] = [store.put(code) for code in df["Cleaned Code"]]
+        print(f"🗃️ {df['Blob_ID'].nunique()} unique code blobs across {len(df)} rows")
+        store.close()
 
     # === Create output directory ===
     os.makedirs(output_dir, exist_ok=True)
-
-    # === Get unique misuses ===
-    misuses = sorted(df["Misuse"].dropna().unique())
-
-    print(f"\n🔍 Found {len(misuses)} unique cleaned misuse types:\n")
-    for i, misuse in enumerate(misuses, start=1):
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = {}
+    if os.path.exists(manifest_path) and not force:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+    try:
+        import pyarrow  # noqa: F401
+        write_parquet = True
+    except ImportError:
+        print("⚠️ pyarrow is not installed; writing xlsx partitions only.")
+        write_parquet, export_xlsx = False, True
+
+    # === One groupby pass over the cleaned misuses ===
+    groups = list(df.groupby("Misuse", sort=True, dropna=True))
+
+    print(f"\n🔍 Found {len(groups)} unique cleaned misuse types:\n")
+    for i, (misuse, _) in enumerate(groups, start=1):
         print(f"{i}. {misuse}")
 
     print("\n--- Generating split files ---\n")
 
-    for i, misuse in enumerate(misuses, start=1):
-        subset = df[df["Misuse"] == misuse]
-        output_path = os.path.join(output_dir, f"{i}_{misuse}.xlsx")
-        subset.to_excel(output_path, index=False)
-        print(f"✅ [{i}] Saved {len(subset)} rows for '{misuse}' → {output_path}")
+    new_manifest = {}
+    for i, (misuse, subset) in enumerate(groups, start=1):
+        stem = os.path.join(output_dir, f"{i}_{misuse}")
+        targets = ([stem + ".parquet"] if write_parquet else []) + ([stem + ".xlsx"] if export_xlsx else [])
+        digest = partition_hash(subset)
+        new_manifest[os.path.basename(stem)] = digest
+
+        if manifest.get(os.path.basename(stem)) == digest and all(os.path.exists(t) for t in targets):
+            print(f"⏭️ [{i}] '{misuse}' unchanged ({len(subset)} rows), skipped")
+            continue
+
+        for target in targets:
+            if target.endswith(".parquet"):
+                subset.to_parquet(target, index=False)
+            else:
+                subset.to_excel(target, index=False)
+        print(f"✅ [{i}] Saved {len(subset)} rows for '{misuse}' → {', '.join(targets)}")
+
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(new_manifest, f, indent=2, ensure_ascii=False)
 
     print("\n🎯 All misuse files have been generated successfully!")
 
@@ -33,8 +33,20 @@ import pandas as pd
 from dotenv import load_dotenv
 from groq import Groq
 import os
+import sys
 import json
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline.rate_limit import GroqScheduler
+from pipeline.cache import ResponseCache
+from pipeline.journal import RowJournal, journal_path_for, apply_journal, compact
+from pipeline.excel_stream import read_columns
+from pipeline.token_budget import BudgetError, expected_output_tokens, plan
+from pipeline.blob_store import BlobStore
+from pipeline.telemetry import context, set_defaults
+from preprocessing.static_slicer import slice_many, is_relevant_file, artifact_name
+from preprocessing.merged_files import fan_out
+
 # === Load environment variables ===
 load_dotenv()
 groq_api_key = os.getenv("GROQ_API_KEY")
@@ -42,10 +54,15 @@ if not groq_api_key:
     raise ValueError("❌ GROQ_API_KEY not found. Update your .env file with a valid key.")
 
 # === Initialize Groq client ===
-groq = Groq(api_key=groq_api_key)
+groq = Groq(api_key=groq_api_key, max_retries=0)  # retries are owned by the scheduler
+
+# Groq quota for openai/gpt-oss-120b; 429s are retried with backoff
+scheduler = GroqScheduler(groq, requests_per_minute=30, tokens_per_minute=8000)
+cache = ResponseCache()
+set_defaults(stage="preprocess")  # tags every request record of this run
 
 # === Load the data ===
-df = pd.read_excel("preprocessing/cleaned_code_python(colab).xlsx")
+df = read_columns("preprocessing/cleaned_code_python(colab).xlsx")
 
 # === Load prompts from external file ===
 with open("preprocessing/prompts.json", "r", encoding="utf-8") as f:
@@ -59,42 +76,111 @@ def extract_relevant_code(code_snippet: str, misuse_type: str) -> str:
     prompt = PROMPTS[misuse_type].format(code_snippet=code_snippet)
 
     try:
-        response = groq.chat.completions.create(
+        # The extracted code is at most the input, so size max_tokens from it
+        budget = plan("openai/gpt-oss-120b", prompt, expected_output_tokens("extract", code_snippet))
+    except BudgetError as e:
+        print(f"⛔ Not sent: {e}")
+        return code_snippet
+
+    def call_model():
+        response = scheduler.create(
             model="openai/gpt-oss-120b",
             messages=[{"role": "user", "content": prompt}],
             temperature=0,
-            max_tokens=2000
+            **budget.groq_kwargs()
         )
         return response.choices[0].message.content.strip()
+
+    try:
+        with context(misuse=misuse_type):
+            return cache.get_or_call("groq", "openai/gpt-oss-120b", prompt,
+                                     {"temperature": 0, **budget.groq_kwargs()}, call_model)
     except Exception as e:
         print(f"⚠️ Error calling Groq API: {e}")
         return code_snippet
 
 
+# === One LLM call per file; files with no relevant code are never sent ===
+file_concurrency = 4
+
+def extract_relevant_files(merged_code: str, misuse_type: str) -> str:
+    return fan_out(
+        merged_code,
+        lambda source: extract_relevant_code(source, misuse_type),
+        keep=lambda part: is_relevant_file(part.source, misuse_type),
+        concurrency=file_concurrency,
+    )
+
+
 # === Apply only where needed with incremental saving ===
+output_excel = "preprocessing/LLM_Preprocessed.xlsx"
+
+# Slice locally with the AST slicer and call the LLM only for rows it cannot parse
+static_first = True
+
 if "LLM_Process" not in df.columns:
     df["LLM_Process"] = None
+if "Process_Method" not in df.columns:
+    df["Process_Method"] = None
+
+# Each distinct code blob is stored once and shared by every misuse row that uses it
+store = BlobStore()
+df["Blob_ID"] = [store.put(code) for code in df["Cleaned Code"]]
+
+# Pick up rows journaled by an interrupted run
+journal = RowJournal(journal_path_for(output_excel))
+apply_journal(df, journal.path)
 
 # Find last processed row to resume if needed
 last_processed = df[df["LLM_Process"].notna()].index.max() if df["LLM_Process"].notna().any() else -1
 
+# === Static slices for the pending rows, computed on all cores up front ===
+pending = df.iloc[last_processed + 1:]
+pending = pending[pending["LLM_Process"].isna() & pending["Misuse"].str.strip().isin(PROMPTS)]
+static_slices = {}
+if static_first and len(pending):
+    # Slices already stored for a blob (by an earlier run or partition) are reused
+    for idx, row in pending.iterrows():
+        stored = store.get_artifact(row["Blob_ID"], artifact_name(row["Misuse"]))
+        if stored is not None:
+            static_slices[idx] = stored
+    todo = pending.drop(index=list(static_slices))
+    slices = slice_many(todo["Cleaned Code"].tolist(), todo["Misuse"].str.strip().tolist())
+    for idx, blob, misuse, code in zip(todo.index, todo["Blob_ID"], todo["Misuse"], slices):
+        if code is not None:
+            static_slices[idx] = code
+            store.put_artifact(blob, artifact_name(misuse), code)
+    sliced = sum(len(code) for code in static_slices.values())
+    original = sum(len(pending.at[idx, "Cleaned Code"]) for idx in static_slices)
+    print(f"🧩 Static slicer handled {len(static_slices)}/{len(pending)} rows; "
+          f"{len(pending) - len(static_slices)} go to the LLM; slices keep {sliced / max(original, 1):.1%} of the code")
+
 # Start processing
 for idx, row in df.iloc[last_processed + 1:].iterrows():
     if pd.isna(row["LLM_Process"]):
         processed = None
+        method = None
         misuse = row["Misuse"].strip()
 
-        if misuse == "Improper handling of ml api limits":
-            processed = extract_relevant_code(row["Cleaned Code"], "Improper handling of ml api limits")
+        if idx in static_slices:
+            processed, method = static_slices[idx], "static"
+
+        elif misuse == "Improper handling of ml api limits":
+            processed, method = extract_relevant_files(row["Cleaned Code"], "Improper handling of ml api limits"), "llm"
 
         elif misuse == "Ignoring monitoring data drift":
-            processed = extract_relevant_code(row["Cleaned Code"], "Ignoring monitoring data drift")
+            processed, method = extract_relevant_files(row["Cleaned Code"], "Ignoring monitoring data drift"), "llm"
 
         elif misuse == "Ignoring testing schema mismatch":
-            processed = extract_relevant_code(row["Cleaned Code"], "Ignoring testing schema mismatch")
+            processed, method = extract_relevant_files(row["Cleaned Code"], "Ignoring testing schema mismatch"), "llm"
         
         df.at[idx, "LLM_Process"] = processed
+        df.at[idx, "Process_Method"] = method
 
         if processed is not None:
-            print(f"✅ Processed row {idx + 1}/{len(df)} and saved")
-            df.to_excel("preprocessing/LLM_Preprocessed.xlsx", index=False)
+            journal.append(idx, LLM_Process=processed, Process_Method=method)
+            print(f"✅ Processed row {idx + 1}/{len(df)} ({method}) and saved")
+
+journal.close()
+compact(df, journal.path, output_excel)
+print(f"🗃️ Blob store: {store.summary()}")
@@ -0,0 +1,72 @@
+"""Split and reassemble merged repositories on their ``# ===== File:`` markers.
+
+A ``Cleaned Code`` cell for a multi-file repository is the concatenation of
+its ``.py`` files, each introduced by a ``# ===== File: <path> =====`` line.
+Single-file rows have no marker and come back as one part with ``marker=None``.
+
+``fan_out`` runs a per-file function (an LLM call) over the files of one cell
+in parallel, skipping files that ``keep`` rejects, and reassembles the results
+in the original marker order.
+"""
+
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+
+MARKER = re.compile(r"^# ===== File: (.*?) =====\s*$", re.MULTILINE)
+
+
+@dataclass
+class FilePart:
+    marker: str  # the full marker line, or None for text before the first marker
+    path: str
+    source: str
+
+
+def split_files(code: str) -> list:
+    """Return the cell as ``FilePart`` objects in their original order."""
+    code = code if isinstance(code, str) else ""
+    parts = []
+    matches = list(MARKER.finditer(code))
+    head = code[:matches[0].start()] if matches else code
+    if head.strip() or not matches:
+        parts.append(FilePart(None, "", head.strip("\n")))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(code)
+        parts.append(FilePart(match.group(0).rstrip(), match.group(1), code[match.end():end].strip("\n")))
+    return parts
+
+
+def join_files(parts) -> str:
+    """Inverse of ``split_files``: marker lines followed by each file's source."""
+    chunks = []
+    for part in parts:
+        if part.marker is None:
+            if part.source:
+                chunks.append(part.source)
+            continue
+        chunks.append(f"{part.marker}\n{part.source}" if part.source else part.marker)
+    return "\n\n".join(chunks)
+
+
+def fan_out(code: str, process_file, keep=None, concurrency: int = 4) -> str:
+    """Apply ``process_file(source)`` to each file of ``code`` and rejoin them.
+
+    Files for which ``keep(part)`` is false are not sent anywhere and keep only
+    their marker line. Marker lines echoed back by ``process_file`` are dropped
+    so every file keeps exactly one marker.
+    """
+    selected = []
+    parts = split_files(code)
+    for part in parts:
+        if part.source.strip() and (keep is None or keep(part)):
+            selected.append(part)
+        else:
+            part.source = ""
+    if selected:
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(selected)))) as pool:
+            results = list(pool.map(lambda part: process_file(part.source), selected))
+        for part, result in zip(selected, results):
+            part.source = MARKER.sub("", result or "").strip("\n")
+    return join_files(parts)
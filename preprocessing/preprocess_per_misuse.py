@@ -2,6 +2,13 @@ import pandas as pd
 from dotenv import load_dotenv
 from groq import Groq
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from preprocessing.merged_files import fan_out
+from preprocessing.static_slicer import is_relevant_file
+from pipeline.token_budget import expected_output_tokens, plan
+from pipeline.telemetry import groq_call, set_defaults
 
 # Load environment variables
 load_dotenv()
@@ -11,6 +18,7 @@ if not groq_api_key:
 
 # Initialize Groq client
 groq = Groq(api_key=groq_api_key)
+set_defaults(stage="preprocess")  # tags every request record of this run
 
 # === Load the data ===
 df = pd.read_excel("preprocessing/cleaned_code_python(colab).xlsx")
@@ -39,11 +47,13 @@ Task:
 """
 
     try:
-        response = groq.chat.completions.create(
+        budget = plan("openai/gpt-oss-120b", prompt, expected_output_tokens("extract", code_snippet))
+        response = groq_call(
+            groq,
             model="openai/gpt-oss-120b",
             messages=[{"role": "user", "content": prompt}],
             temperature=0,
-            max_tokens=2000
+            **budget.groq_kwargs()
         )
         return response.choices[0].message.content.strip()
     except Exception as e:
@@ -74,11 +84,13 @@ Task:
 """
 
     try:
-        response = groq.chat.completions.create(
+        budget = plan("openai/gpt-oss-120b", prompt, expected_output_tokens("extract", code_snippet))
+        response = groq_call(
+            groq,
             model="openai/gpt-oss-120b",
             messages=[{"role": "user", "content": prompt}],
             temperature=0,
-            max_tokens=2000
+            **budget.groq_kwargs()
         )
         return response.choices[0].message.content.strip()
     except Exception as e:
@@ -110,11 +122,13 @@ Task:
 """
 
     try:
-        response = groq.chat.completions.create(
+        budget = plan("openai/gpt-oss-120b", prompt, expected_output_tokens("extract", code_snippet))
+        response = groq_call(
+            groq,
             model="openai/gpt-oss-120b",
             messages=[{"role": "user", "content": prompt}],
             temperature=0,
-            max_tokens=2000
+            **budget.groq_kwargs()
         )
         return response.choices[0].message.content.strip()
     except Exception as e:
@@ -123,6 +137,11 @@ Task:
 
 
 
+# === Send each file of a merged repository on its own, skipping irrelevant files ===
+def extract_per_file(merged_code: str, extract, misuse_type: str) -> str:
+    return fan_out(merged_code, extract, keep=lambda part: is_relevant_file(part.source, misuse_type))
+
+
 # === Apply only where needed with incremental saving ===
 # Initialize the new column if it doesn't exist
 if "LLM_Process" not in df.columns:
@@ -136,11 +155,11 @@ for idx, row in df.iloc[last_processed + 1:].iterrows():
     if pd.isna(row["LLM_Process"]):
         processed = None  # default
         if row["Misuse"] == "Improper handling of ML API limits":
-            processed = extract_ml_api_relevant_code(row["Cleaned Code"])
+            processed = extract_per_file(row["Cleaned Code"], extract_ml_api_relevant_code, row["Misuse"])
         elif row["Misuse"] == "Ignoring monitoring data drift":
-            processed = extract_data_drift_relevant_code(row["Cleaned Code"])
+            processed = extract_per_file(row["Cleaned Code"], extract_data_drift_relevant_code, row["Misuse"])
         elif row["Misuse"] == " Ignoring testing schema mismatch":
-            processed = extract_schema_mismatch_relevant_code(row["Cleaned Code"])
+            processed = extract_per_file(row["Cleaned Code"], extract_schema_mismatch_relevant_code, row["Misuse"])
         
         df.at[idx, "LLM_Process"] = processed
         if processed is not None:
@@ -0,0 +1,301 @@
+"""Local, AST-based relevance slicer for the preprocessing stage.
+
+``main_processing.py`` used to send every ``Cleaned Code`` cell to
+``openai/gpt-oss-120b`` only to keep the lines relevant to a misuse, and the
+LLM tends to over-prune (see the notes at the top of ``main_processing.py``).
+This module does the same job statically, in milliseconds per repository:
+
+1. Split the cell on its ``# ===== File:`` markers and cut every file into
+   top-level units (imports, assignments, functions, classes, other statements).
+2. Seed the slice with units that touch an ML SDK (boto3/SageMaker, Azure ML and
+   Azure AI clients, Google Cloud / Vertex AI, OpenAI) or the SDK calls and
+   settings the misuse is about (retries for API limits, model monitors for
+   data drift, checkpoint settings for checkpoints, ...).
+3. Close the slice backwards: any unit that defines a name used by a kept unit
+   (import, assignment, helper function or class) is kept too.
+
+Kept units are emitted verbatim, in their original order, and a file with
+nothing relevant keeps only its marker line, as the LLM prompts require. Many
+cleaned cells are not valid Python (stripped quotes, Python 2 prints), so
+files that do not parse as a whole are parsed block by block, and blocks that
+still fail are matched textually. A cell whose files are mostly unparseable
+returns ``None`` so the caller can fall back to the LLM.
+
+``python -m preprocessing.static_slicer`` reports, per misuse, how much of the
+original code the slices keep.
+"""
+
+import argparse
+import ast
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from pipeline.blob_store import blob_id
+from preprocessing.merged_files import FilePart, join_files, split_files
+
+
+# ML SDK entry points: module roots, client/credential classes and well-known factories.
+SDK_PATTERN = re.compile(
+    r"\b(boto3|botocore|sagemaker|azureml|azure\.\w+|openai|AzureOpenAI|OpenAI|ChatCompletion|"
+    r"aiplatform|vertexai|google\.cloud|automl|\w+Client|\w+Credentials?|MLClient|Workspace)\b"
+)
+
+# Extra seeds per misuse (lower-cased keys, as in prompts.json and the split files): the SDK/API
+# calls and settings the misuse is about, not generic data-science words, which match every file.
+MISUSE_KEYWORDS = {
+    "improper handling of ml api limits":
+        r"\b(?:retry|retries|max_retries|backoff|throttl\w*|rate_?limit\w*|quota\w*|RateLimitError|"
+        r"ThrottlingException|ClientError|ResourceExhausted|TooManyRequests|Retry|time\.sleep|timeout)\b",
+    "ignoring monitoring data drift":
+        r"\b(?:\w*ModelMonitor|DataCaptureConfig|data_capture\w*|\w*monitoring_schedule\w*|suggest_baseline|"
+        r"baseline_\w+|DataDriftDetector|\w*[Dd]rift\w*|ModelDataCollector|enable_app_insights|"
+        r"deploy|invoke_endpoint|\w*Predictor|create_endpoint\w*|Webservice|deploy_model)\b",
+    "ignoring testing schema mismatch":
+        r"\b(?:\w*[Ss]chema\w*|tfdv|great_expectations|validate_\w+|\w*Validator|TabularDataset\w*|"
+        r"from_delimited_files|from_parquet_files|register_pandas_dataframe|create_dataset|import_data|"
+        r"ContentType|content_type|input_example|signature)\b",
+    "misinterpreting output":
+        r"\b(?:analyze_\w+|detect_\w+|classify_text|annotate_\w+|recognize_\w+|extract_\w+|moderations?|"
+        r"invoke_endpoint|completions?|ChatCompletion|choices|score|scores|confidence|sentiment|magnitude|"
+        r"salience|probabilit\w*|logprobs)\b",
+    "not using batch api for data processing":
+        r"\b(?:\w*[Bb]atch\w*|bulk\w*|\w*Transformer|transform_job\w*|create_transform_job|"
+        r"invoke_endpoint|analyze_\w+|detect_\w+|annotate_\w+|classify_text|embeddings?)\b",
+    "not using training checkpoints":
+        r"\b(?:\w*checkpoint\w*|ModelCheckpoint|use_spot_instances|max_wait|save_weights|\w*Estimator|"
+        r"create_training_job)\b",
+    "non specification of early stopping criteria":
+        r"\b(?:early_?stop\w*|EarlyStopping|patience|\w*HyperparameterTuner|\w*Estimator|"
+        r"create_training_job|create_hyper_parameter_tuning_job|StoppingCondition|max_runtime_in_seconds|"
+        r"n_iter_no_change|num_boost_round|early_stopping_rounds)\b",
+}
+
+# Bumped whenever the seeds change, so slices stored in the blob store are recomputed.
+SLICE_VERSION = 2
+
+# A cell falls back to the LLM when more than this share of its lines cannot be parsed.
+MAX_UNPARSED_SHARE = 0.5
+
+_CONTINUATION = re.compile(r"^(?:[)\]}]|else\b|elif\b|except\b|finally\b)")
+_OPAQUE_DEFINES = re.compile(r"^\s*(?:def|class)\s+(\w+)|^([A-Za-z_]\w*)\s*(?:,\s*[A-Za-z_]\w*\s*)*=(?!=)", re.M)
+_IDENTIFIER = re.compile(r"[A-Za-z_]\w*")
+
+
+@dataclass
+class Unit:
+    start: int  # first line (0-based) within the file
+    end: int    # one past the last line
+    text: str
+    defines: set = field(default_factory=set)
+    uses: set = field(default_factory=set)
+    parsed: bool = True
+
+
+def normalize_misuse(misuse: str) -> str:
+    return re.sub(r"\s+", " ", str(misuse)).strip().lower()
+
+
+def artifact_name(misuse: str) -> str:
+    """Blob-store artifact name of a slice for ``misuse``."""
+    return f"static_slice:v{SLICE_VERSION}:{normalize_misuse(misuse)}"
+
+
+def seed_pattern(misuse: str):
+    """SDK pattern plus the misuse's keywords, as one compiled regex."""
+    keywords = MISUSE_KEYWORDS.get(normalize_misuse(misuse))
+    return re.compile(f"{SDK_PATTERN.pattern}|{keywords}" if keywords else SDK_PATTERN.pattern)
+
+
+def is_relevant_file(source: str, misuse: str) -> bool:
+    """True if a file imports or touches an ML SDK or the misuse's seeds at all."""
+    return bool(seed_pattern(misuse).search(source or ""))
+
+
+def slice_code(code: str, misuse: str):
+    """Return the relevant slice of a ``Cleaned Code`` cell, or ``None`` if it does not parse."""
+    return slice_blob(code, [misuse])[0]
+
+
+def slice_blob(code: str, misuses) -> list:
+    """Slice one cell for several misuses, parsing its files only once."""
+    parts = split_files(code)
+    units_per_part = [file_units(part.source) for part in parts]
+    total_lines = sum(u.end - u.start for units in units_per_part for u in units)
+    unparsed_lines = sum(u.end - u.start for units in units_per_part for u in units if not u.parsed)
+    if total_lines and unparsed_lines / total_lines > MAX_UNPARSED_SHARE:
+        return [None] * len(misuses)
+
+    slices = []
+    for misuse in misuses:
+        seed = seed_pattern(misuse)
+        sliced = [FilePart(part.marker, part.path, "\n\n".join(u.text for u in backward_slice(units, seed)))
+                  for part, units in zip(parts, units_per_part)]
+        slices.append(join_files(sliced))
+    return slices
+
+
+def slice_many(codes, misuses, workers: int = None) -> list:
+    """``slice_code`` over many cells, each distinct cell parsed once.
+
+    Rows sharing the same code (one repository under several misuses) are
+    grouped by blob id. Groups run on a process pool, serially where fork is
+    unavailable.
+    """
+    groups = {}
+    codes, misuses = list(codes), list(misuses)
+    for i, code in enumerate(codes):
+        groups.setdefault(blob_id(code), []).append(i)
+    jobs = [(codes[rows[0]], [misuses[i] for i in rows]) for rows in groups.values()]
+
+    if "fork" not in multiprocessing.get_all_start_methods():
+        # Spawned workers would re-run the unguarded runner scripts on import.
+        results = [slice_blob(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork")) as pool:
+            results = list(pool.map(_slice_job, jobs, chunksize=4))
+
+    slices = [None] * len(codes)
+    for rows, result in zip(groups.values(), results):
+        for i, sliced in zip(rows, result):
+            slices[i] = sliced
+    return slices
+
+
+def backward_slice(units, seed) -> list:
+    """Seed units plus everything they transitively depend on, in source order."""
+    kept = {i for i, unit in enumerate(units) if seed.search(unit.text)}
+    needed = set().union(*(units[i].uses for i in kept)) if kept else set()
+    changed = True
+    while changed:
+        changed = False
+        for i, unit in enumerate(units):
+            if i not in kept and unit.defines & needed:
+                kept.add(i)
+                needed |= unit.uses
+                changed = True
+    return [units[i] for i in sorted(kept)]
+
+
+def file_units(source: str) -> list:
+    """Cut one file into top-level units, parsing block by block if needed."""
+    lines = source.split("\n")
+    try:
+        return _ast_units(ast.parse(source), lines, 0)
+    except (SyntaxError, ValueError):
+        pass
+
+    units = []
+    for start, end in _top_level_blocks(lines):
+        block = "\n".join(lines[start:end])
+        try:
+            units.extend(_ast_units(ast.parse(block), lines, start))
+        except (SyntaxError, ValueError):
+            units.append(_opaque_unit(block, start, end))
+    return units
+
+
+def _ast_units(tree, lines, offset) -> list:
+    units = []
+    for node in tree.body:
+        first = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])]) - 1 + offset
+        last = node.end_lineno + offset
+        defines, uses = _names(node)
+        units.append(Unit(first, last, "\n".join(lines[first:last]), defines, uses))
+    return units
+
+
+def _names(node):
+    defines, uses = set(), set()
+    is_def = isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+    if is_def:
+        defines.add(node.name)
+    for child in ast.walk(node):
+        if isinstance(child, (ast.Import, ast.ImportFrom)) and not is_def:  # local imports stay local
+            for alias in child.names:
+                defines.add(alias.asname or alias.name.split(".")[0])
+        elif isinstance(child, ast.Name):
+            if isinstance(child.ctx, ast.Store) and child.col_offset == getattr(node, "col_offset", -1):
+                defines.add(child.id)
+            elif isinstance(child.ctx, ast.Load):
+                uses.add(child.id)
+    if isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign, ast.For, ast.With)):
+        for child in ast.walk(node):
+            if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Store):
+                defines.add(child.id)
+    return defines, uses
+
+
+def _top_level_blocks(lines):
+    """Line ranges of top-level statements, found by indentation alone."""
+    starts = []
+    pending_decorator = False
+    for i, line in enumerate(lines):
+        if not line.strip() or line[0] in " \t#" or _CONTINUATION.match(line):
+            continue
+        if not pending_decorator:
+            starts.append(i)
+        pending_decorator = line.startswith("@")
+    if not starts:
+        return []
+    bounds = starts[1:] + [len(lines)]
+    return [(start, _trim_blank(lines, start, end)) for start, end in zip(starts, bounds)]
+
+
+def _trim_blank(lines, start, end):
+    while end > start + 1 and not lines[end - 1].strip():
+        end -= 1
+    return end
+
+
+def _opaque_unit(block, start, end) -> Unit:
+    defines = {name for pair in _OPAQUE_DEFINES.findall(block) for name in pair if name}
+    return Unit(start, end, block, defines, set(_IDENTIFIER.findall(block)) - defines, parsed=False)
+
+
+def _slice_job(job):
+    return slice_blob(*job)
+
+
+def size_report(codes, misuses, slices) -> list:
+    """Per misuse: rows, rows left to the LLM and the sliced/original size ratio of the others."""
+    totals = {}
+    for code, misuse, sliced in zip(codes, misuses, slices):
+        entry = totals.setdefault(normalize_misuse(misuse), {"rows": 0, "to_llm": 0, "chars": 0, "sliced_chars": 0})
+        entry["rows"] += 1
+        if sliced is None:
+            entry["to_llm"] += 1
+        else:
+            entry["chars"] += len(code)
+            entry["sliced_chars"] += len(sliced)
+    return [{"misuse": misuse, **entry,
+             "ratio": round(entry["sliced_chars"] / entry["chars"], 3) if entry["chars"] else None}
+            for misuse, entry in sorted(totals.items())]
+
+
+def main():
+    import pandas as pd
+
+    from pipeline.cache import REPO_ROOT
+
+    parser = argparse.ArgumentParser(description="Measure how much of each file the static slicer keeps.")
+    parser.add_argument("workbook", nargs="?",
+                        default=os.path.join(REPO_ROOT, "preprocessing", "cleaned_code_python(colab).xlsx"))
+    args = parser.parse_args()
+
+    df = pd.read_excel(args.workbook)
+    codes = [code if isinstance(code, str) else "" for code in df["Cleaned Code"]]
+    misuses = df["Misuse"].str.strip().tolist()
+    report = size_report(codes, misuses, slice_many(codes, misuses))
+    for row in report:
+        print(f"🧩 {row['misuse']}: {row['rows']} rows, {row['to_llm']} to the LLM, "
+              f"slice/file size {row['ratio']}")
+    kept = sum(row["sliced_chars"] for row in report)
+    total = sum(row["chars"] for row in report)
+    print(f"📏 Slices keep {kept / total:.1%} of the code they cover" if total else "📏 Nothing sliced")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline.benchmark import SCRIPTS, make_sandbox
+from pipeline.mock_server import Behavior, serve
+
+
+@pytest.fixture
+def mock_server():
+    server = serve(0, rpm=100000, tpm=100000000, behavior=Behavior())
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def sandbox():
+    """``make(script, rows)`` builds a throwaway tree for one runner; removed afterwards."""
+    made = []
+
+    def make(name: str, rows: int = 3) -> str:
+        directory, _ = make_sandbox(SCRIPTS[name], rows)
+        made.append(directory)
+        return directory
+
+    yield make
+    for directory in made:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def runner_env(server) -> dict:
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    return {**os.environ, "GROQ_API_KEY": "mock-key", "GROQ_BASE_URL": url, "OLLAMA_HOST": url,
+            "LLM_TELEMETRY": "0", "PYTHONDONTWRITEBYTECODE": "1", "PYTHONUNBUFFERED": "1"}
+
+
+def run_runner(name: str, directory: str, server) -> subprocess.CompletedProcess:
+    """Run one runner script in ``directory`` against the mock server."""
+    return subprocess.run([sys.executable, SCRIPTS[name]], cwd=directory, env=runner_env(server),
+                          capture_output=True, text=True)
+
+
+def start_runner(name: str, directory: str, server) -> subprocess.Popen:
+    """Start one runner script in the background; its stdout is a line-by-line text pipe."""
+    return subprocess.Popen([sys.executable, SCRIPTS[name]], cwd=directory, env=runner_env(server),
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
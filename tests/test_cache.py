@@ -0,0 +1,57 @@
+import pytest
+
+from pipeline.cache import ResponseCache
+from pipeline.generation_policy import GenerationPolicy
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"))
+    yield cache
+    cache.close()
+
+
+def test_second_identical_call_is_a_hit(cache):
+    calls = []
+    call = lambda: calls.append(1) or "answer"
+    assert cache.get_or_call("ollama", "gemma", "prompt", {"temperature": 0}, call) == "answer"
+    assert cache.get_or_call("ollama", "gemma", "prompt", {"temperature": 0}, call) == "answer"
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+@pytest.mark.parametrize("change", [
+    {"backend": "groq"}, {"model": "codellama"}, {"prompt": "other prompt"}, {"options": {"temperature": 0.8}},
+])
+def test_any_change_to_the_request_is_a_miss(cache, change):
+    request = {"backend": "ollama", "model": "gemma", "prompt": "prompt", "options": {"temperature": 0}}
+    cache.get_or_call(**request, call=lambda: "first")
+    assert cache.get_or_call(**{**request, **change}, call=lambda: "second") == "second"
+    assert cache.misses == 2
+
+
+def test_errors_are_not_cached(cache):
+    def fail():
+        raise ValueError("Empty response")
+
+    with pytest.raises(ValueError):
+        cache.get_or_call("ollama", "gemma", "prompt", {}, fail)
+    assert cache.get_or_call("ollama", "gemma", "prompt", {}, lambda: "answer") == "answer"
+
+
+def test_least_recently_used_answers_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"), max_bytes=25)
+    cache.get_or_call("ollama", "gemma", "a", {}, lambda: "x" * 10)
+    cache.get_or_call("ollama", "gemma", "b", {}, lambda: "y" * 10)
+    cache.get_or_call("ollama", "gemma", "a", {}, lambda: "unused")  # refreshes "a"
+    cache.get_or_call("ollama", "gemma", "c", {}, lambda: "z" * 10)
+    assert cache.get_or_call("ollama", "gemma", "a", {}, lambda: "called") == "x" * 10
+    assert cache.get_or_call("ollama", "gemma", "b", {}, lambda: "called") == "called"
+    cache.close()
+
+
+def test_ollama_calls_are_greedy_and_keyed_on_it():
+    policy = GenerationPolicy()
+    assert policy.ollama_kwargs("gemma")["options"]["temperature"] == 0
+    assert policy.cache_options()["temperature"] == 0
+    assert GenerationPolicy(temperature=0.8).cache_options() != policy.cache_options()
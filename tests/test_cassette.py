@@ -0,0 +1,66 @@
+import json
+
+import pytest
+import requests
+
+from pipeline import cassette as cassette_module
+from pipeline.cassette import Cassette, request_key
+
+
+def url(server) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+@pytest.fixture
+def cassette(tmp_path):
+    cassette = Cassette(str(tmp_path / "run.sqlite"))
+    yield cassette
+    cassette.close()
+
+
+def serve(cassette, mode, upstream="http://127.0.0.1:9"):
+    """Recorder/player forwarding both APIs to ``upstream`` (unreachable by default)."""
+    return cassette_module.serve(cassette, mode, groq_url=upstream, ollama_url=upstream)
+
+
+def test_request_key_ignores_json_key_order():
+    assert request_key("POST", "/api/generate", b'{"model": "gemma", "prompt": "p"}') == \
+        request_key("POST", "/api/generate", b'{"prompt": "p", "model": "gemma"}')
+    assert request_key("POST", "/api/generate", b'{"prompt": "p"}') != \
+        request_key("POST", "/api/generate", b'{"prompt": "q"}')
+
+
+def test_recorded_answers_replay_without_the_upstream(cassette, mock_server):
+    body = {"model": "gemma", "prompt": "Code Snippet:\nx = 1\nResponse Format:", "stream": False}
+    chat = {"model": "qwen/qwen3-32b", "messages": [{"role": "user", "content": "hello"}]}
+
+    recorder = serve(cassette, "record", url(mock_server))
+    try:
+        recorded = requests.post(f"{url(recorder)}/api/generate", json=body).json()["response"]
+        requests.post(f"{url(recorder)}/openai/v1/chat/completions", json=chat,
+                      headers={"Authorization": "Bearer secret-key"}).raise_for_status()
+    finally:
+        recorder.shutdown()
+        recorder.server_close()
+    assert cassette.recorded == 2
+
+    player = serve(cassette, "replay")
+    try:
+        assert requests.post(f"{url(player)}/api/generate", json=body).json()["response"] == recorded
+        replayed = requests.post(f"{url(player)}/openai/v1/chat/completions", json=chat)
+        assert replayed.headers["x-ratelimit-remaining-requests"] == "1000000"
+        missing = requests.post(f"{url(player)}/api/generate", json={**body, "prompt": "changed"})
+        assert missing.status_code == 404
+    finally:
+        player.shutdown()
+        player.server_close()
+    assert (cassette.hits, cassette.misses) == (2, 1)
+
+    # Request headers, API keys included, are never stored
+    rows = cassette._db.execute("SELECT headers FROM interactions").fetchall()
+    assert not any("secret-key" in headers or "authorization" in json.loads(headers) for headers, in rows)
+
+
+def test_unknown_mode_is_rejected(cassette):
+    with pytest.raises(ValueError, match="mode must be"):
+        serve(cassette, "rewind")
@@ -0,0 +1,76 @@
+import glob
+import os
+
+import pandas as pd
+import pytest
+
+from pipeline.cache import REPO_ROOT
+from pipeline.compaction import compact_code, compact_response
+
+
+def corpus() -> list:
+    paths = [os.path.join(REPO_ROOT, "preprocessing", "cleaned_code_python(colab).xlsx")] + \
+        sorted(glob.glob(os.path.join(REPO_ROOT, "*", "instances_*.xlsx")))
+    codes = []
+    for path in paths:
+        df = pd.read_excel(path)
+        for column in [c for c in ("Cleaned Code", "Code snippet") if c in df.columns]:
+            codes += [code for code in df[column] if isinstance(code, str)]
+    return codes
+
+
+def edit_one_line(compacted):
+    """Append a comment to a middle one-line statement; return the edit and the expected source."""
+    lines = compacted.text.split("\n")
+    for i in range(len(lines) // 2, len(lines)):
+        start, end = compacted.spans[i]
+        if end == start + 1 and "__" not in lines[i] and lines.count(lines[i]) == 1:
+            edited = lines[:i] + [lines[i] + "  # edited"] + lines[i + 1:]
+            original = compacted.original.split("\n")
+            expected = original[:start] + [original[start] + "  # edited"] + original[end:]
+            return "\n".join(edited), "\n".join(expected)
+    return None
+
+
+def test_corpus_round_trips_with_and_without_edits():
+    codes = corpus()
+    if not codes:
+        pytest.skip("corpus workbooks not available")
+    edited = 0
+    for code in codes:
+        compacted = compact_code(code)
+        assert compacted.expand(compacted.text) == code
+        edit = edit_one_line(compacted)
+        if edit:
+            edited += 1
+            # Comments and blank lines around the edited line are kept
+            assert compacted.expand(edit[0]) == edit[1]
+    assert edited > len(codes) // 2
+
+
+def test_blank_lines_before_an_edited_line_are_kept():
+    code = "import os\n\n# load the data\ndata = load()\n\nmodel.fit(data)\n"
+    compacted = compact_code(code)
+    assert compacted.text == "import os\ndata = load()\nmodel.fit(data)"
+    restored = compacted.expand("import os\ndata = load()\nmodel.fit(data, epochs=3)")
+    assert restored == "import os\n\n# load the data\ndata = load()\n\nmodel.fit(data, epochs=3)\n"
+
+
+def test_response_keeps_its_fences_and_prose():
+    code = "# setup\nimport os\n\nclient.call()\n"
+    compacted = compact_code(code)
+    answer = ("### Refactored Code:\n```python\nimport os\nclient.call(timeout=5)\n```\n"
+              "### Summary of Changes\n- Added a 'timeout'.")
+    assert compacted.expand_response(answer) == (
+        "### Refactored Code:\n```python\n# setup\nimport os\n\nclient.call(timeout=5)\n\n```\n"
+        "### Summary of Changes\n- Added a 'timeout'.")
+
+
+def test_judge_side_compacts_only_the_code():
+    long_text = "x" * 80
+    answer = (f"### Note: see '{long_text}'\n\n```python\n# comment\nname = '{long_text}'\n\nrun(name)\n```\n"
+              "Done, it's fixed.")
+    text, saved = compact_response(answer)
+    assert text == f"### Note: see '{long_text}'\n\n```python\nname = '__S1__'\nrun(name)\n```\nDone, it's fixed."
+    assert saved > 0
+    assert compact_response("No code here # at all") == ("No code here # at all", 0)
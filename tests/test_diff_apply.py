@@ -0,0 +1,50 @@
+import pytest
+
+from pipeline.diff_apply import HunkError, rebuild_refactored
+
+SOURCE = "client = Client()\nresult = client.predict(data)\nprint(result)"
+
+EDIT = """<<<<<<< SEARCH
+result = client.predict(data)
+=======
+result = client.predict(data, timeout=30)
+>>>>>>> REPLACE
+"""
+
+
+@pytest.mark.parametrize("heading", ["Summary of Changes:", "**Summary of Changes:**", "### Summary of Changes",
+                                     "## **Summary of Changes**"])
+def test_summary_is_split_off_under_any_heading_style(heading):
+    response = f"{EDIT}\n{heading}\n- added a timeout to predict"
+    rebuilt = rebuild_refactored(SOURCE, response)
+    assert rebuilt == ("Refactored Code:\nclient = Client()\nresult = client.predict(data, timeout=30)\n"
+                       "print(result)\n\nSummary of Changes:\n- added a timeout to predict")
+
+
+def test_unified_diff_hunks_are_applied():
+    response = """```diff
+@@ -2,1 +2,2 @@
+-result = client.predict(data)
++result = client.predict(data, timeout=30)
++client.close()
+```
+Summary of Changes:
+- added a timeout and closed the client"""
+    rebuilt = rebuild_refactored(SOURCE, response)
+    assert "result = client.predict(data, timeout=30)\nclient.close()\nprint(result)" in rebuilt
+    assert rebuilt.endswith("- added a timeout and closed the client")
+
+
+@pytest.mark.parametrize("response", [
+    "Refactored Code:\nclient = Client()\n\nSummary of Changes:\n- none",  # full output, no edits
+    EDIT.replace("result = client.predict(data)\n=", "result = client.fit(data)\n="),  # SEARCH not in the code
+    EDIT.replace("result = client.predict(data)\n=", "\n="),  # empty SEARCH
+])
+def test_edits_that_do_not_apply_raise_hunk_error(response):
+    with pytest.raises(HunkError):
+        rebuild_refactored(SOURCE, response)
+
+
+def test_ambiguous_search_raises_hunk_error():
+    with pytest.raises(HunkError, match="matches 2 places"):
+        rebuild_refactored(SOURCE + "\nresult = client.predict(data)", EDIT)
@@ -0,0 +1,53 @@
+import os
+
+import pandas as pd
+import pytest
+
+from pipeline import excel_stream
+from pipeline.excel_stream import count_rows, iter_rows, read_columns
+
+
+@pytest.fixture
+def workbook(tmp_path, monkeypatch):
+    monkeypatch.setattr(excel_stream, "PARQUET_CACHE_DIR", str(tmp_path / "parquet"))
+    path = str(tmp_path / "instances.xlsx")
+    pd.DataFrame({
+        "Repository": ["a/one", None, "c/three"],
+        "File": ["one.py", None, "three.py"],
+        "Code snippet": ["x = 1", None, "z = 3"],
+    }).to_excel(path, index=False)
+    return path
+
+
+def test_iter_rows_projects_columns_and_keeps_row_positions(workbook):
+    rows = list(iter_rows(workbook, columns=["Code snippet", "File"]))
+    assert rows == [(0, {"Code snippet": "x = 1", "File": "one.py"}),
+                    (1, {"Code snippet": None, "File": None}),
+                    (2, {"Code snippet": "z = 3", "File": "three.py"})]
+    assert [idx for idx, _ in rows] == list(pd.read_excel(workbook).index)
+
+
+def test_iter_rows_rejects_unknown_columns(workbook):
+    with pytest.raises(ValueError, match="Cleaned Code"):
+        list(iter_rows(workbook, columns=["Cleaned Code"]))
+
+
+def test_count_rows(workbook):
+    assert count_rows(workbook) == 3
+
+
+def test_read_columns_projects_through_the_parquet_cache(workbook):
+    first = read_columns(workbook, columns=["File", "Code snippet"])
+    assert list(first.columns) == ["File", "Code snippet"]
+    assert os.listdir(excel_stream.PARQUET_CACHE_DIR)
+
+    again = read_columns(workbook, columns=["Repository"])
+    assert again["Repository"].tolist()[::2] == ["a/one", "c/three"]
+    pd.testing.assert_frame_equal(read_columns(workbook), pd.read_excel(workbook))
+
+
+def test_read_columns_sees_a_rewritten_workbook(workbook):
+    read_columns(workbook, columns=["File"])
+    pd.DataFrame({"File": ["new.py"]}).to_excel(workbook, index=False)
+    os.utime(workbook, ns=(0, os.stat(workbook).st_mtime_ns + 1))
+    assert read_columns(workbook, columns=["File"])["File"].tolist() == ["new.py"]
@@ -0,0 +1,57 @@
+import json
+import os
+import time
+
+import pandas as pd
+
+from conftest import run_runner, start_runner
+from pipeline.benchmark import SCRIPTS, input_workbook
+from pipeline.journal import journal_path_for, read_journal
+from pipeline.mock_server import Behavior, serve
+
+
+def test_refactoring_recovers_an_interrupted_journal(mock_server, sandbox):
+    directory = sandbox("refactoring_groq", rows=3)
+    misuse = pd.read_excel(os.path.join(directory, input_workbook(SCRIPTS["refactoring_groq"])))["Misuse"][0]
+    output = os.path.join(directory, "ScalableRefactoring", f"refactored_results_qwen_qwen3-32b_{misuse}.xlsx")
+
+    # An interrupted run finished row 1 and crashed while writing row 2
+    with open(journal_path_for(output), "w", encoding="utf-8") as f:
+        f.write(json.dumps({"row": 0, "values": {"Refactored_Code": "recovered answer", "Row_Duration_sec": 1.5}}))
+        f.write('\n{"row": 1, "values": {"Refactored_Co')
+
+    result = run_runner("refactoring_groq", directory, mock_server)
+    assert result.returncode == 0, result.stderr
+    assert "♻️ Recovered 1 finished rows from an interrupted run" in result.stdout
+    assert "Processed row 1/" not in result.stdout and "Processed row 3/3" in result.stdout
+
+    df = pd.read_excel(output)
+    assert df["Refactored_Code"][0] == "recovered answer"
+    assert df["Row_Duration_sec"][0] == 1.5
+    assert df["Refactored_Code"][2].startswith("Refactored Code:")
+    assert not os.path.exists(journal_path_for(output))
+
+
+def test_recovered_rows_survive_a_second_interruption(sandbox):
+    directory = sandbox("refactoring_groq", rows=3)
+    misuse = pd.read_excel(os.path.join(directory, input_workbook(SCRIPTS["refactoring_groq"])))["Misuse"][0]
+    output = os.path.join(directory, "ScalableRefactoring", f"refactored_results_qwen_qwen3-32b_{misuse}.xlsx")
+    journal = journal_path_for(output)
+    with open(journal, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"row": 0, "values": {"Refactored_Code": "recovered answer", "Row_Duration_sec": 1.5}}) + "\n")
+
+    # The resumed run is killed while its first requests are still in flight
+    server = serve(0, rpm=100000, tpm=100000000, behavior=Behavior(latency=30))
+    try:
+        process = start_runner("refactoring_groq", directory, server)
+        for line in process.stdout:
+            if line.startswith("♻️ Recovered"):
+                break
+        time.sleep(2)  # the new journal is written right after this line
+        process.kill()
+        process.wait()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert read_journal(journal)[0] == {"Refactored_Code": "recovered answer", "Row_Duration_sec": 1.5}
@@ -0,0 +1,50 @@
+import os
+import shutil
+
+import pandas as pd
+
+from conftest import run_runner
+from pipeline.journal import journal_path_for
+
+
+def test_judge_resumes_over_blank_verdict_columns(mock_server, sandbox):
+    directory = sandbox("judge")
+    first = run_runner("judge", directory, mock_server)
+    assert first.returncode == 0, first.stderr
+
+    # "Yes" answers leave Valid_reason blank in every row, so it reloads as float64
+    output = os.path.join(directory, "ScalableRefactoring", "validation_results_openai_gpt-oss-120b.xlsx")
+    assert pd.read_excel(output)["Valid_reason"].dtype == "float64"
+
+    resumed = run_runner("judge", directory, mock_server)
+    assert resumed.returncode == 0, resumed.stderr
+    assert "3 rows already validated, 0 to go" in resumed.stdout
+    assert pd.read_excel(output)["Valid_fix"].tolist() == ["YES"] * 3
+
+
+def test_evaluation_resumes_a_judge_column_left_blank(mock_server, sandbox):
+    directory = sandbox("evaluation")
+    assert run_runner("evaluation", directory, mock_server).returncode == 0
+
+    # Blank one judge entirely, as after a run that never reached it (so nothing is cached either)
+    output = os.path.join(directory, "Evaluation", "validation_results.xlsx")
+    df = pd.read_excel(output)
+    for col in ["Gemma", "Gemma_fix", "Gemma_extent", "Gemma_reason"]:
+        df[col] = None
+    df.to_excel(output, index=False)
+    shutil.rmtree(os.path.join(directory, ".llm_cache"))
+
+    # No journal is left behind to refill the blanked cells with stale verdicts
+    assert not os.path.exists(journal_path_for(output))
+    before = mock_server.stats.snapshot()["requests"]
+
+    resumed = run_runner("evaluation", directory, mock_server)
+    assert resumed.returncode == 0, resumed.stderr
+    assert "Judging 3 rows with Gemma" in resumed.stdout
+    # The judge is asked again: 3 verdicts on top of the warm-up and unload calls
+    assert "Response cache: 0 hits, 3 misses" in resumed.stdout
+    assert mock_server.stats.snapshot()["requests"] - before >= 3 + 3
+    assert not os.path.exists(journal_path_for(output))
+    df = pd.read_excel(output)
+    assert df["Gemma_fix"].tolist() == ["YES"] * 3
+    assert df["Gemma_reason"].tolist() == ["mock verdict"] * 3
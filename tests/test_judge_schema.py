@@ -0,0 +1,45 @@
+import os
+
+import pandas as pd
+import pytest
+
+from conftest import run_runner
+from pipeline.benchmark import SCRIPTS
+from pipeline.judge_schema import JUDGE_MAX_TOKENS, groq_request, parse_verdict
+from pipeline.mock_server import Behavior, serve
+
+
+@pytest.fixture
+def reasoning_server():
+    # gpt-oss spends a few hundred hidden reasoning tokens out of max_tokens before answering
+    server = serve(0, rpm=100000, tpm=100000000, behavior=Behavior(reasoning_tokens=400))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_reasoning_models_get_room_for_their_trace():
+    assert groq_request("llama-3.3-70b-versatile")["max_tokens"] == JUDGE_MAX_TOKENS
+    assert groq_request("openai/gpt-oss-120b")["max_tokens"] > JUDGE_MAX_TOKENS + 400
+
+
+def test_parse_verdict_reads_json_and_legacy_answers():
+    assert parse_verdict('{"fix": "partial", "extent": "80%", "reason": "ok"}') == \
+        {"fix": "PARTIAL", "extent": 80, "reason": "ok"}
+    assert parse_verdict("No: the retry loop is still unbounded")["fix"] == "NO"
+    assert parse_verdict("[ERROR] timeout") == {"fix": None, "extent": None, "reason": ""}
+
+
+def test_structured_judge_verdicts_survive_reasoning(reasoning_server, sandbox):
+    directory = sandbox("judge")
+    script = os.path.join(directory, SCRIPTS["judge"])
+    with open(script, encoding="utf-8") as f:
+        source = f.read()
+    with open(script, "w", encoding="utf-8") as f:
+        f.write(source.replace("structured_output = False", "structured_output = True", 1))
+
+    result = run_runner("judge", directory, reasoning_server)
+    assert result.returncode == 0, result.stderr
+    df = pd.read_excel(os.path.join(directory, "ScalableRefactoring", "validation_results_openai_gpt-oss-120b.xlsx"))
+    assert df["Valid_fix"].tolist() == ["YES"] * 3
+    assert df["Valid_reason"].tolist() == ["mock verdict"] * 3
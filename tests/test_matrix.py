@@ -0,0 +1,95 @@
+import json
+import os
+import re
+
+import pandas as pd
+import pytest
+
+from pipeline import matrix
+from pipeline.cache import REPO_ROOT
+from pipeline.excel_stream import count_rows
+from pipeline.matrix import DATASETS, build_jobs, output_paths, resolve_model, run_matrix
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def script_settings(script: str):
+    with open(os.path.join(REPO_ROOT, script), encoding="utf-8") as f:
+        source = f.read()
+    misuse = re.search(r"""^misuse = ["']([^"']+)["']""", source, re.MULTILINE).group(1)
+    model = re.search(r"""^model_name = ["']([^"']+)["']""", source, re.MULTILINE).group(1)
+    return misuse, model
+
+
+def test_every_prompt_matches_its_original_script():
+    with open(os.path.join(FIXTURES, "original_prompts.json"), encoding="utf-8") as f:
+        originals = json.load(f)  # prompt_template of each per-misuse script before the matrix engine
+    assert len(originals) == 2 * len(DATASETS)
+    for script, original in originals.items():
+        misuse, model = script_settings(script)
+        backend, _ = resolve_model(model)
+        assert DATASETS[misuse].prompt_template(backend) == original, script
+
+
+def test_models_resolve_to_their_backend():
+    assert resolve_model("codellama") == ("ollama", "codellama")
+    assert resolve_model("deepseek-r1-distill-llama-70b") == ("groq", "deepseek-r1-distill-llama-70b")
+    assert resolve_model("groq:some-new-model") == ("groq", "some-new-model")
+    assert resolve_model("ollama:qwen/qwen3-32b") == ("ollama", "qwen/qwen3-32b")
+
+
+def test_output_files_keep_the_legacy_names():
+    def names(misuse, backend, model):
+        return [os.path.relpath(path, REPO_ROOT) for path in output_paths(DATASETS[misuse], backend, model)]
+
+    assert names("batch_api", "groq", "deepseek-r1-distill-llama-70b") == [
+        "batch_api/refactored_code_outputs_deepseek.txt", "batch_api/model_timings_deepseek.txt"]
+    assert names("data_drift", "ollama", "codellama") == [
+        "data_drift/refactored_code_data_drift_outputs1_codellama.txt", "data_drift/model_timings1_codellama.txt"]
+    assert names("misinterpreting_output", "ollama", "llama3")[0] == \
+        "misinterpreting_output/refactored_code_outputs1_codellama3.txt"
+
+
+def test_unknown_datasets_are_rejected():
+    with pytest.raises(ValueError, match="Unknown misuse datasets"):
+        build_jobs(["not_a_dataset"], ["codellama"])
+
+
+@pytest.fixture
+def matrix_root(tmp_path, monkeypatch, mock_server):
+    """Two small datasets (up to 3 rows each) under a throwaway root, served by the mock server."""
+    for misuse in ("batch_api", "data_drift"):
+        dataset = DATASETS[misuse]
+        os.makedirs(tmp_path / misuse)
+        source = pd.read_excel(os.path.join(REPO_ROOT, misuse, dataset.instances)).head(3)
+        source.to_excel(tmp_path / misuse / dataset.instances, index=False)
+    url = f"http://127.0.0.1:{mock_server.server_address[1]}"
+    monkeypatch.setattr(matrix, "REPO_ROOT", str(tmp_path))
+    monkeypatch.setenv("OLLAMA_HOST", url)
+    monkeypatch.setenv("GROQ_BASE_URL", url)
+    monkeypatch.setenv("GROQ_API_KEY", "mock-key")
+    monkeypatch.setenv("LLM_TELEMETRY", "0")
+    return tmp_path
+
+
+def test_matrix_writes_every_pair_in_row_order_and_resumes(matrix_root, mock_server):
+    models = ["codellama", "deepseek-r1-distill-llama-70b"]
+    stats = run_matrix(["batch_api", "data_drift"], models)
+    assert sorted(stats) == ["groq", "ollama"]
+    assert all(backend_stats.errors == 0 for backend_stats in stats.values())
+    assert mock_server.stats.snapshot()["loads"] == 1  # one num_ctx for all codellama rows
+
+    for misuse in ("batch_api", "data_drift"):
+        for model in models:
+            output_file, timing_file = output_paths(DATASETS[misuse], *resolve_model(model))
+            with open(output_file, encoding="utf-8") as f:
+                text = f.read()
+            rows = count_rows(os.path.join(matrix_root, misuse, DATASETS[misuse].instances))
+            assert re.findall(r"^### Row: (\d+)", text, re.MULTILINE) == [str(row) for row in range(1, rows + 1)]
+            assert "Could not process this row" not in text
+            assert os.path.exists(timing_file)
+
+    requests = mock_server.stats.snapshot()["requests"]
+    run_matrix(["batch_api", "data_drift"], models)
+    # Only the warm-up calls go out again; every row is already done
+    assert mock_server.stats.snapshot()["requests"] - requests == 2
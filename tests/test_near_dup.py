@@ -0,0 +1,120 @@
+import glob
+import os
+
+import pandas as pd
+
+from conftest import run_runner
+from pipeline.benchmark import SCRIPTS, input_workbook
+from pipeline.cache import REPO_ROOT
+from pipeline.excel_stream import read_columns
+from pipeline.mock_server import Behavior, serve
+from pipeline.near_dup import MinHashIndex, plan_representatives
+
+
+def snippet(n_steps: int, extra: int = 0) -> str:
+    lines = [f"step_{i} = model.fit(data_{i}, labels_{i})" for i in range(n_steps)]
+    return "\n".join(lines + [f"other_{i} = evaluate(x_{i})" for i in range(extra)])
+
+
+def test_members_are_similar_to_their_representative_itself():
+    # a ~ b and b ~ c, but a and c are too far apart to share a refactoring
+    a, b, c = snippet(40), snippet(40, 8), snippet(40, 16)
+    index = MinHashIndex(path=None)
+    index.add_many([("a", a), ("b", b), ("c", c)])
+    threshold = 0.8
+    assert index.similar("a", threshold) and index.similar("b", threshold)
+    assert "c" not in dict(index.similar("a", threshold))
+
+    clusters = index.clusters(["a", "b", "c"], threshold)
+    assert [cluster.representative for cluster in clusters] == ["a"]
+    assert [member for member, _ in clusters[0].members] == ["b"]
+    assert all(score >= threshold for cluster in clusters for _, score in cluster.members)
+
+
+def test_plan_keeps_the_earliest_row_as_representative():
+    codes = [snippet(30), "print('unrelated')", snippet(30), snippet(30)]
+    assert plan_representatives(codes, 0.95) == {2: (0, 1.0), 3: (0, 1.0)}
+    assert plan_representatives(codes, 0.95, namespace="x") == plan_representatives(codes, 0.95)
+
+
+def test_plan_never_clusters_rows_of_different_misuses():
+    codes = [snippet(30)] * 4
+    misuses = ["Not Using Training Checkpoints", "Improper Handling Of Ml Api Limits",
+               "not using  training checkpoints", "Improper Handling Of Ml Api Limits"]
+    assert plan_representatives(codes, 0.95, misuses=misuses) == {2: (0, 1.0), 3: (1, 1.0)}
+
+
+def test_plan_reuses_the_persistent_index(tmp_path):
+    path = str(tmp_path / "near_dup.sqlite")
+    codes = [snippet(30), snippet(30), "print('unrelated')"]
+    first = MinHashIndex(path=path)
+    planned = plan_representatives(codes, 0.95, index=first, namespace="run")
+    first.close()
+
+    reopened = MinHashIndex(path=path)
+    assert {f"run#{i}" for i in range(3)} <= set(reopened.signatures)
+    assert plan_representatives(codes, 0.95, index=reopened, namespace="run") == planned == {1: (0, 1.0)}
+
+
+def refactoring_sandbox(sandbox, misuses: list) -> str:
+    """Ollama runner sandbox where every row holds the same code, with near-dup reuse on."""
+    directory = sandbox("refactoring_ollama", rows=len(misuses))
+    workbook = os.path.join(directory, input_workbook(SCRIPTS["refactoring_ollama"]))
+    df = pd.read_excel(workbook)
+    df["Cleaned Code"] = df.at[0, "Cleaned Code"]
+    df["Misuse"] = misuses
+    df.to_excel(workbook, index=False)
+
+    script = os.path.join(directory, SCRIPTS["refactoring_ollama"])
+    with open(script, encoding="utf-8") as f:
+        source = f.read()
+    with open(script, "w", encoding="utf-8") as f:
+        f.write(source.replace("near_dup_threshold = None", "near_dup_threshold = 0.95", 1))
+    return directory
+
+
+def refactored(directory: str) -> pd.DataFrame:
+    return pd.read_excel(glob.glob(os.path.join(directory, "ScalableRefactoring", "refactored_results_*.xlsx"))[0])
+
+
+def test_near_duplicates_reuse_the_representative(mock_server, sandbox):
+    misuse = read_columns(os.path.join(REPO_ROOT, input_workbook(SCRIPTS["refactoring_ollama"])), ["Misuse"])["Misuse"][0]
+    directory = refactoring_sandbox(sandbox, [misuse] * 3)
+    result = run_runner("refactoring_ollama", directory, mock_server)
+    assert result.returncode == 0, result.stderr
+
+    df = refactored(directory)
+    assert df["Output_Mode"].tolist() == ["full", "near-duplicate", "near-duplicate"]
+    assert df["Near_Dup_Of"].tolist()[1:] == [1, 1]
+    assert df["Refactored_Code"].nunique() == 1
+
+
+def test_identical_code_with_another_misuse_is_refactored_on_its_own(mock_server, sandbox):
+    misuse = read_columns(os.path.join(REPO_ROOT, input_workbook(SCRIPTS["refactoring_ollama"])), ["Misuse"])["Misuse"][0]
+    other = "Not Using Training Checkpoints" if misuse != "Not Using Training Checkpoints" else "Misinterpreting Output"
+    directory = refactoring_sandbox(sandbox, [misuse, other, misuse])
+    result = run_runner("refactoring_ollama", directory, mock_server)
+    assert result.returncode == 0, result.stderr
+
+    df = refactored(directory)
+    assert df["Output_Mode"].tolist() == ["full", "full", "near-duplicate"]
+    assert df["Near_Dup_Of"].tolist()[2] == 1
+
+
+def test_failed_representative_is_never_copied(sandbox):
+    misuse = read_columns(os.path.join(REPO_ROOT, input_workbook(SCRIPTS["refactoring_ollama"])), ["Misuse"])["Misuse"][0]
+    directory = refactoring_sandbox(sandbox, [misuse] * 3)
+    # The warm-up and then the representative's own call fail
+    server = serve(0, rpm=100000, tpm=100000000, behavior=Behavior(fail_requests=2))
+    try:
+        result = run_runner("refactoring_ollama", directory, server)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert result.returncode == 0, result.stderr
+    assert "2 near-duplicates of failed rows are refactored on their own" in result.stdout
+
+    df = refactored(directory)
+    assert df["Refactored_Code"][0].startswith("[ERROR]")
+    assert not any(str(code).startswith("[ERROR]") for code in df["Refactored_Code"][1:])
+    assert "near-duplicate" not in df["Output_Mode"].tolist()
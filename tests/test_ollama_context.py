@@ -0,0 +1,10 @@
+from conftest import run_runner
+
+
+def test_refactoring_loads_the_model_once(mock_server, sandbox):
+    # Rows of different sizes share one num_ctx, so the pinned model is never reloaded
+    directory = sandbox("refactoring_ollama", rows=4)
+    result = run_runner("refactoring_ollama", directory, mock_server)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.count("✅ Processed row") == 4
+    assert mock_server.stats.snapshot()["loads"] == 1
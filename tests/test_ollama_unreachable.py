@@ -0,0 +1,20 @@
+import glob
+import os
+import subprocess
+import sys
+
+import pandas as pd
+
+from pipeline.benchmark import SCRIPTS
+
+
+def test_refactoring_ollama_survives_an_unreachable_server(sandbox):
+    directory = sandbox("refactoring_ollama", rows=2)
+    env = {**os.environ, "OLLAMA_HOST": "http://127.0.0.1:9", "LLM_TELEMETRY": "0", "PYTHONDONTWRITEBYTECODE": "1"}
+    result = subprocess.run([sys.executable, SCRIPTS["refactoring_ollama"]], cwd=directory, env=env,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert "⚠️ Could not preload gemma" in result.stdout
+
+    output = glob.glob(os.path.join(directory, "ScalableRefactoring", "refactored_results_*.xlsx"))[0]
+    assert pd.read_excel(output)["Refactored_Code"].str.startswith("[ERROR]").all()
@@ -0,0 +1,96 @@
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import pytest
+from groq import Groq
+
+from pipeline.mock_server import Behavior, QuotaWindow, ServerStats, make_handler
+from pipeline.rate_limit import GroqScheduler
+
+
+class ScriptedQuota(QuotaWindow):
+    """Groq-shaped quota headers, with scripted 429s and drained windows that reset in a fraction of a second."""
+
+    def __init__(self, rejections: int = 0, drained: int = 0, reset_sec: float = 0.3):
+        super().__init__(rpm=100000, tpm=100000000)
+        self.rejections = rejections
+        self.drained = drained
+        self.reset_sec = reset_sec
+
+    def charge(self, tokens: int):
+        allowed, headers = super().charge(tokens)
+        if self.rejections:
+            self.rejections -= 1
+            return False, {**headers, "retry-after": str(self.reset_sec)}
+        if self.drained:
+            self.drained -= 1
+            headers.update({"x-ratelimit-remaining-tokens": "0", "x-ratelimit-reset-tokens": f"{self.reset_sec}s"})
+        return allowed, headers
+
+
+@pytest.fixture
+def groq_server(monkeypatch):
+    monkeypatch.setenv("LLM_TELEMETRY", "0")
+    servers = []
+
+    def start(quota: QuotaWindow):
+        stats = ServerStats()
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(quota, behavior=Behavior(), stats=stats))
+        server.daemon_threads = True
+        server.stats = stats
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        client = Groq(api_key="mock-key", base_url=f"http://127.0.0.1:{server.server_address[1]}", max_retries=0)
+        return server, GroqScheduler(client, requests_per_minute=600, tokens_per_minute=600000, base_delay=0.01)
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def ask(scheduler):
+    return scheduler.create(model="mock", messages=[{"role": "user", "content": "hi"}], temperature=0)
+
+
+def test_429s_are_retried_after_retry_after(groq_server):
+    server, scheduler = groq_server(ScriptedQuota(rejections=2, reset_sec=0.3))
+    start = time.monotonic()
+    response = ask(scheduler)
+    elapsed = time.monotonic() - start
+
+    assert response.choices[0].message.content
+    assert (scheduler.throttled, scheduler.retries) == (2, 2)
+    assert server.stats.snapshot()["errors"] == 2
+    assert scheduler.last_call["retries"] == 2
+    assert elapsed >= 0.6  # both retry-after windows were waited out
+
+
+def test_429_pauses_every_thread(groq_server):
+    server, scheduler = groq_server(ScriptedQuota(rejections=1, reset_sec=0.5))
+    first = threading.Thread(target=ask, args=(scheduler,))
+    first.start()
+    while server.stats.snapshot()["errors"] == 0:
+        time.sleep(0.005)
+    throttled_at = time.monotonic()
+
+    # Threads arriving during the pause wait it out too, instead of collecting their own 429s
+    others = [threading.Thread(target=ask, args=(scheduler,)) for _ in range(3)]
+    for thread in others:
+        thread.start()
+    for thread in [first] + others:
+        thread.join()
+
+    later = [start for start, _ in server.stats.snapshot()["intervals"] if start > throttled_at]
+    assert len(later) == 4 and min(later) >= throttled_at + 0.4
+    assert server.stats.snapshot()["errors"] == 1
+
+
+def test_drained_token_window_paces_the_next_call(groq_server):
+    server, scheduler = groq_server(ScriptedQuota(drained=1, reset_sec=0.4))
+    ask(scheduler)
+    start = time.monotonic()
+    ask(scheduler)
+    assert time.monotonic() - start >= 0.35  # waited for the reset the headers announced
+    assert scheduler.throttled == 0 and server.stats.snapshot()["errors"] == 0
@@ -0,0 +1,54 @@
+import pytest
+
+from pipeline import row_index
+from pipeline.resume import finish, prepare
+from pipeline.row_index import RowIndex
+
+
+def block(row: int, answer: str) -> str:
+    return f"### Row: {row}\n### Repository: repo{row}\n### File: Merged .py files\n{answer}\n\n"
+
+
+def timing(row: int, duration: float) -> str:
+    return f"Row: {row}, Repo: repo{row}, File: Merged .py files, Duration: {duration} sec\n  → Cumulative Time: 0 sec\n\n"
+
+
+@pytest.fixture(autouse=True)
+def sidecars(tmp_path, monkeypatch):
+    monkeypatch.setattr(row_index, "INDEX_DIR", str(tmp_path / "row_index"))
+
+
+def test_prepare_keeps_one_good_block_per_row_and_drops_partial_ones(tmp_path):
+    output, timings = tmp_path / "out.txt", tmp_path / "timings.txt"
+    output.write_text(
+        block(1, "one")
+        + block(2, "[ERROR] Could not process this row: 429")
+        + block(3, "three")
+        + block(1, "[ERROR] Could not process this row: rerun failed")  # must not replace the good answer
+        + block(2, "two")
+        + block(4, "four, cut mid-write")[:-2]
+    )
+    timings.write_text(timing(1, 1.5) + timing(2, 0.5) + timing(3, 2.0) + timing(2, 3.0))
+
+    done, cumulative = prepare(str(output), str(timings))
+    assert done == {1, 2, 3}
+    assert output.read_text() == block(1, "one") + block(2, "two") + block(3, "three")
+    assert cumulative == 6.5
+    assert timings.read_text().count("Row: 2,") == 1
+
+    # Already compact: a second prepare changes nothing
+    assert prepare(str(output), str(timings)) == (done, cumulative)
+    assert output.read_text() == block(1, "one") + block(2, "two") + block(3, "three")
+
+
+def test_finish_puts_rerun_rows_back_in_order(tmp_path):
+    output, timings = tmp_path / "out.txt", tmp_path / "timings.txt"
+    output.write_text(block(1, "one") + block(3, "three") + block(2, "two, rerun"))
+    timings.write_text(timing(1, 1.0) + timing(3, 1.0) + timing(2, 1.0))
+
+    assert finish(str(output), str(timings)) == 3.0
+    assert output.read_text() == block(1, "one") + block(2, "two, rerun") + block(3, "three")
+    with RowIndex(str(output)) as index:
+        assert index.rows() == [1, 2, 3]
+    assert [line.split(",")[0] for line in timings.read_text().split("\n") if line.startswith("Row:")] == \
+        ["Row: 1", "Row: 2", "Row: 3"]
@@ -0,0 +1,56 @@
+from pipeline.row_index import RowIndex
+
+
+def block(row: int, answer: str) -> str:
+    return f"### Row: {row}\n### Repository: https://github.com/o/r{row}\n### File: Merged .py files\n{answer}\n\n"
+
+
+def open_index(tmp_path, name="out.txt"):
+    return RowIndex(str(tmp_path / name), index_path=str(tmp_path / "index.json"))
+
+
+def test_refresh_picks_up_appended_and_completed_blocks(tmp_path):
+    output = tmp_path / "out.txt"
+    output.write_text(block(1, "first") + block(2, "second"))
+    index = open_index(tmp_path)
+    assert index.rows() == [1, 2]
+
+    # Row 3 is still being written when the index refreshes
+    full = block(3, "third line one\nthird line two")
+    cut = full.index("third line two")
+    with open(output, "a") as f:
+        f.write(full[:cut])
+    assert index.refresh() == 1
+    assert not index.get(3).complete and index.get(3).text == "third line one"
+
+    with open(output, "a") as f:
+        f.write(full[cut:] + block(2, "[ERROR] retried"))
+    assert index.refresh() == 1  # row 3 re-scanned from its header, plus the new row 2
+    assert index.get(3).complete and index.get(3).text == "third line one\nthird line two"
+    assert index.get(2).is_error
+    assert [b.text for b in index.blocks(2)] == ["second", "[ERROR] retried"]
+    assert index.get(1).repository == "https://github.com/o/r1"
+    index.close()
+
+    # The sidecar is reused: nothing new to scan on reopen
+    reopened = open_index(tmp_path)
+    assert reopened.refresh() == 0 and len(reopened) == 4
+    reopened.close()
+
+
+def test_rewritten_or_truncated_file_is_reindexed(tmp_path):
+    output = tmp_path / "out.txt"
+    output.write_text(block(1, "a") + block(2, "b") + block(3, "c"))
+    index = open_index(tmp_path)
+    assert index.rows() == [1, 2, 3]
+
+    # Rewritten from the start, longer than before: an append would keep rows 1-3
+    output.write_text(block(7, "rewritten " * 20) + block(8, "x") + block(9, "y"))
+    index.refresh()
+    assert index.rows() == [7, 8, 9]
+    assert index.get(1) is None
+
+    output.write_text(block(7, "short"))
+    index.refresh()
+    assert index.rows() == [7] and index.get(7).text == "short"
+    index.close()
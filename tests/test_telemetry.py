@@ -0,0 +1,67 @@
+import multiprocessing
+
+import pytest
+from groq import Groq
+
+from pipeline import telemetry
+from pipeline.mock_server import Behavior, serve
+from pipeline.telemetry import Telemetry, groq_call, load_metrics
+
+
+def write_records(directory: str, count: int) -> None:
+    recorder = Telemetry(directory)
+    for i in range(count):
+        recorder.emit(backend="groq", row=i)
+    recorder.close()
+
+
+def test_compaction_keeps_records_appended_by_other_processes(tmp_path):
+    if "fork" not in multiprocessing.get_all_start_methods():
+        pytest.skip("needs fork")
+    context = multiprocessing.get_context("fork")
+    writers = [context.Process(target=write_records, args=(str(tmp_path), 3000)) for _ in range(3)]
+    for writer in writers:
+        writer.start()
+
+    compactor = Telemetry(str(tmp_path))
+    while any(writer.is_alive() for writer in writers):
+        compactor.compact()
+    for writer in writers:
+        writer.join()
+    compactor.compact()
+
+    frame = load_metrics(str(tmp_path))
+    assert len(frame) == 9000
+    assert not frame.duplicated(["run_id", "row"]).any()
+    assert not list(tmp_path.glob("*.compacting"))
+
+
+@pytest.fixture
+def recorder(tmp_path, monkeypatch):
+    monkeypatch.delenv("LLM_TELEMETRY", raising=False)
+    recorder = Telemetry(str(tmp_path))
+    monkeypatch.setattr(telemetry, "_telemetry", recorder)
+    yield recorder
+    recorder.close()
+
+
+def test_groq_call_records_the_sdk_retries(recorder):
+    server = serve(0, rpm=100000, tpm=100000000, behavior=Behavior(server_error_rate=1.0))
+    client = Groq(api_key="mock-key", base_url=f"http://127.0.0.1:{server.server_address[1]}", max_retries=2)
+    try:
+        with pytest.raises(Exception):
+            groq_call(client, model="mock", messages=[{"role": "user", "content": "hi"}])
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert server.stats.snapshot()["requests"] == 3
+    assert load_metrics(recorder.directory)["retries"].tolist() == [2]
+
+
+def test_groq_call_records_no_retries_on_success(recorder, mock_server):
+    client = Groq(api_key="mock-key", base_url=f"http://127.0.0.1:{mock_server.server_address[1]}")
+    response = groq_call(client, model="mock", messages=[{"role": "user", "content": "hi"}])
+    assert response.choices[0].message.content
+    records = load_metrics(recorder.directory)
+    assert records["retries"].tolist() == [0]
+    assert records["tokens_in"].tolist()[0] > 0
@@ -0,0 +1,52 @@
+import pytest
+
+from pipeline.token_budget import (DEFAULT_CONTEXT_WINDOW, MIN_NUM_CTX, BudgetError, context_window, count_tokens,
+                                   expected_output_tokens, plan, run_num_ctx)
+
+
+def test_prompt_larger_than_a_minute_of_quota_still_fits_the_window():
+    prompt = "x = 1\n" * 20000
+    assert count_tokens(prompt) > 6000
+    budget = plan("qwen/qwen3-32b", prompt, 4096, ceiling=4096)
+    assert budget.max_tokens == 4096
+
+
+def test_quota_is_opt_in():
+    prompt = "x = 1\n" * 20000
+    with pytest.raises(BudgetError, match="request quota"):
+        plan("qwen/qwen3-32b", prompt, 4096, quota=6000)
+
+
+def test_prompt_over_the_context_window_is_rejected():
+    with pytest.raises(BudgetError, match="context"):
+        plan("llama3", "x = 1\n" * 40000, 512)
+
+
+def test_ceiling_caps_the_output():
+    budget = plan("codellama", "print('hi')", 10000, ceiling=1024)
+    assert budget.max_tokens == 1024
+    assert budget.num_ctx >= MIN_NUM_CTX
+
+
+def test_run_num_ctx_fits_the_largest_request():
+    small, large = "x = 1\n", "x = 1\n" * 3000
+    num_ctx = run_num_ctx("codellama", [(small, 100), (large, 1000)])
+    assert num_ctx == plan("codellama", large, 1000).num_ctx
+    assert num_ctx > plan("codellama", small, 100).num_ctx
+
+
+def test_run_num_ctx_skips_prompts_that_do_not_fit():
+    assert run_num_ctx("llama3", [("x = 1\n" * 40000, 512)]) == MIN_NUM_CTX
+
+
+def test_ollama_tags_match_their_family_window():
+    assert context_window("codellama:13b") == 16384
+    assert context_window("llama3.1:8b") == 8192
+    assert context_window("unknown-model") == DEFAULT_CONTEXT_WINDOW
+
+
+def test_expected_output_covers_the_code_and_a_summary():
+    code = "x = 1\n" * 100
+    assert expected_output_tokens("refactor", code) > count_tokens(code)
+    with pytest.raises(ValueError, match="Unknown request kind"):
+        expected_output_tokens("translate", code)